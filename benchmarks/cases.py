@@ -0,0 +1,664 @@
+import asyncio
+import email.utils
+import functools
+import hashlib
+import http.server
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .catalogs import FILES, with_updates, write
+
+# Catalog lookups timed per show_data case
+LOOKUPS = 200
+# Queries timed per pick_query case
+QUERIES = 100
+# Selections resolved per filter_resolve case
+SELECTIONS = 100
+# Observers looked up per sky_look case
+OBSERVERS = 100
+# Frames decoded per client_decode case
+DECODE_REPEATS = 100
+# Frames computed per playback case
+PLAYBACK_FRAMES = 100
+# Simulated sessions of the load cases
+LOAD_SESSIONS = (1, 10, 100)
+# Interval of the heartbeat that measures event loop stalls, in seconds
+HEARTBEAT_S = 0.002
+# Daily refreshes in the archive of the archive_snapshot case
+ARCHIVE_DAYS = 30
+# Minutes of the catalog screened per conjunctions case
+CONJUNCTION_MINUTES = 30
+# Outputs checked against a reference before timing: objects, grid cells, pick queries and
+# encounters, and the hours averaged by the coverage_average check
+REFERENCE_OBJECTS = 20
+REFERENCE_CELLS = 200
+REFERENCE_QUERIES = 20
+REFERENCE_ENCOUNTERS = 20
+REFERENCE_HOURS = 1.0
+# Largest accepted position difference from the reference, in km
+REFERENCE_KM = 1e-5
+
+def skynet(module):
+    return importlib.import_module(f"skynet-web.{module}")
+
+class Skip(Exception):
+    """A case that does not apply to this catalog or environment."""
+
+class Mismatch(Exception):
+    """A case whose output differs from its reference, checked once before timing."""
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    make: object
+    repeats: int = 3
+    max_size: int | None = None
+
+CASES = []
+
+# Register a benchmark. The function gets the Context and returns run(), or (setup, run)
+# when state has to be reset before every timed run; run() may return extra metrics
+def case(name, repeats=3, max_size=None):
+    def register(make):
+        CASES.append(Case(name, make, repeats, max_size))
+        return make
+    return register
+
+# =============================
+# Context: one catalog size, written out like databases/ in a scratch directory, with the
+# derived objects cases share built on first use.
+# =============================
+class Context:
+    """Everything the cases need for one catalog."""
+
+    def __init__(self, label, frames, directory, t):
+        self.label = label
+        self.frames = frames
+        self.size = sum(len(frame) for frame in frames.values())
+        self.directory = directory
+        self.paths = write(frames, directory / "databases")
+        self.t = t
+
+    @functools.cached_property
+    def compiled(self):
+        read_catalog = skynet("catalog_cache").read_catalog
+        return {typ: read_catalog(path) for typ, path in self.paths.items()}
+
+    @functools.cached_property
+    def catalog(self):
+        return skynet("catalog").build_catalog(self.compiled, 1)
+
+    @functools.cached_property
+    def updated(self):
+        return with_updates(self.compiled)
+
+    @functools.cached_property
+    def snapshot(self):
+        lat, lon, alt = self.catalog.propagator.geodetic_at(self.t)
+        return skynet("ticker").Snapshot(catalog=self.catalog, t=self.t, lat=lat, lon=lon, alt=alt)
+
+    # Figure groups as create_map builds them with every toggle on
+    @functools.cached_property
+    def groups(self):
+        catalog, snapshot = self.catalog, self.snapshot
+        groups = []
+        for typ in FILES:
+            rows = catalog.types == typ
+            groups.append((typ, catalog.names[rows], catalog.ids[rows], snapshot.lat[rows], snapshot.lon[rows]))
+        return groups
+
+    # The app's database only keys catalog objects below the custom satellite ids
+    def require_db(self):
+        if self.size >= skynet("ingest").CUSTOM_ID_START:
+            raise Skip("NORAD ids of this catalog run into the custom satellite range")
+
+    # Make this catalog the process-wide one, with a ticker snapshot at the benchmark time
+    def publish(self):
+        catalog = skynet("catalog").publish_catalog(self.compiled)
+        skynet("ticker").ticker.tick(self.t)
+        return catalog
+
+# Runs the coroutine function `work` on a fresh event loop next to a heartbeat task, and
+# returns the longest the heartbeat was held up past its time, in milliseconds
+def loop_stall_ms(work):
+    async def run():
+        worst = 0.0
+        async def heartbeat():
+            nonlocal worst
+            while True:
+                before = time.perf_counter()
+                await asyncio.sleep(HEARTBEAT_S)
+                worst = max(worst, time.perf_counter() - before - HEARTBEAT_S)
+        beat = asyncio.create_task(heartbeat())
+        await asyncio.sleep(0)
+        try:
+            await work()
+        finally:
+            beat.cancel()
+        return worst * 1e3
+    return asyncio.run(run())
+
+# =============================
+# Reference checks: a case that computes the wrong thing fast is not an improvement, so the
+# engines are compared with a slower, independent path once before their timed runs.
+# =============================
+def expect_close(what, difference, tolerance):
+    worst = float(np.max(np.abs(difference), initial=0.0))
+    if not worst <= tolerance:
+        raise Mismatch(f"{what} differs from its reference by {worst:.3g} (tolerance {tolerance:g})")
+
+def reference_rows(ctx, count):
+    return np.sort(np.random.default_rng(0).choice(len(ctx.catalog), min(count, len(ctx.catalog)), replace=False))
+
+# Skyfield's per-object EarthSatellite.at() path for the given catalog rows
+def skyfield_geodetic(ctx, rows, t):
+    from skyfield.api import EarthSatellite, wgs84
+    lat, lon, alt = [], [], []
+    for row in rows.tolist():
+        position = EarthSatellite.from_omm(t.ts, ctx.catalog.elements.iloc[row].to_dict()).at(t)
+        point = wgs84.latlon_of(position)
+        lat.append(point[0].degrees)
+        lon.append(point[1].degrees)
+        alt.append(wgs84.height_of(position).km)
+    return np.array(lat), np.array(lon), np.array(alt)
+
+# Both lat/lon/alt triples have to be the same objects, at most tolerance km apart
+def expect_geodetic(what, actual, expected, tolerance=REFERENCE_KM):
+    geodetic_to_itrs = skynet("propagation").geodetic_to_itrs
+    finite = np.isfinite(expected[2])
+    if not np.array_equal(finite, np.isfinite(actual[2])):
+        raise Mismatch(f"{what} fails to propagate other objects than its reference")
+    distance = np.linalg.norm(geodetic_to_itrs(*(a[finite] for a in actual)) - geodetic_to_itrs(*(e[finite] for e in expected)), axis=-1)
+    expect_close(f"{what} (km)", distance, tolerance)
+
+# nearest() and near() of a pick index against distances to every object
+def expect_picks(index, snapshot, points):
+    pick = skynet("pick")
+    xyz = pick._unit_vectors(snapshot.lat, snapshot.lon)
+    for lat, lon in points:
+        distance = np.degrees(np.arccos(np.clip(xyz @ pick._unit_vectors(lat, lon), -1.0, 1.0)))
+        finite = np.flatnonzero(np.isfinite(distance))
+        closest = np.sort(distance[finite])[:pick.NEAREST_COUNT]
+        rows, found = index.nearest(lat, lon)
+        if len(found) != len(closest):
+            raise Mismatch(f"nearest() found {len(found)} objects instead of {len(closest)}")
+        expect_close("nearest() distances (degrees)", found - closest, 1e-9)
+        rows, found = index.near(lat, lon)
+        if set(rows.tolist()) != set(finite[distance[finite] <= pick.NEAR_RADIUS_DEGREES].tolist()):
+            raise Mismatch(f"near() misses objects around ({lat:.2f}, {lon:.2f})")
+
+def app():
+    try:
+        return skynet("skynet-web")
+    except Exception as error:
+        raise Skip(f"the app module does not import here: {type(error).__name__}: {error}")
+
+def engine():
+    from reflex.model import get_engine
+    return get_engine()
+
+def store(elements, removed=None):
+    from sqlmodel import Session
+    with Session(engine()) as session:
+        report = skynet("ingest").ingest_catalog(session, elements, removed)
+        session.commit()
+    return report
+
+def clear_db():
+    import sqlalchemy
+    with engine().begin() as connection:
+        connection.execute(sqlalchemy.text("DELETE FROM db"))
+
+# =============================
+# Loading: CSV parsing, the original per-row EarthSatellite.from_omm() path, the compiled
+# catalog cache and Satrec initialization.
+# =============================
+@case("csv_parse")
+def csv_parse(ctx):
+    return lambda: [pd.read_csv(path) for path in ctx.paths.values()]
+
+# The loading path before the vectorized catalog, kept as the reference point
+@case("from_omm", repeats=1, max_size=13000)
+def from_omm(ctx):
+    from skyfield.api import EarthSatellite, load
+    ts = load.timescale()
+    def run():
+        for path in ctx.paths.values():
+            frame = pd.read_csv(path)
+            [EarthSatellite.from_omm(ts, row.to_dict()) for _, row in frame.iterrows()]
+    return run
+
+@case("read_catalog_cold")
+def read_catalog_cold(ctx):
+    read_catalog = skynet("catalog_cache").read_catalog
+    return (
+        lambda: shutil.rmtree(ctx.directory / "databases" / ".cache", ignore_errors=True),
+        lambda: [read_catalog(path) for path in ctx.paths.values()],
+    )
+
+@case("read_catalog_warm")
+def read_catalog_warm(ctx):
+    read_catalog = skynet("catalog_cache").read_catalog
+    return (
+        lambda: ctx.compiled,
+        lambda: [read_catalog(path) for path in ctx.paths.values()],
+    )
+
+@case("build_catalog")
+def build_catalog(ctx):
+    build = skynet("catalog").build_catalog
+    return lambda: build(ctx.compiled, 1)
+
+# Rebuild after a refresh that changed 1% of the element sets
+@case("build_catalog_delta")
+def build_catalog_delta(ctx):
+    build = skynet("catalog").build_catalog
+    return lambda: build(ctx.updated, 2, previous=ctx.catalog)
+
+# =============================
+# Database ingestion and the refresh pipeline, against a scratch SQLite database and a
+# local HTTP stand-in for CelesTrak.
+# =============================
+@case("ingest_full")
+def ingest_full(ctx):
+    ctx.require_db()
+    return clear_db, lambda: {"rows": store(ctx.catalog.elements).inserted}
+
+@case("ingest_unchanged")
+def ingest_unchanged(ctx):
+    ctx.require_db()
+    return lambda: store(ctx.catalog.elements), lambda: store(ctx.catalog.elements)
+
+@case("ingest_delta")
+def ingest_delta(ctx):
+    ctx.require_db()
+    delta = skynet("catalog").build_catalog(ctx.updated, 2, previous=ctx.catalog)
+    return (
+        lambda: store(ctx.catalog.elements),
+        lambda: {"rows": store(delta.elements.iloc[delta.diff.rows], delta.diff.removed_ids).updated},
+    )
+
+class _StandIn(http.server.BaseHTTPRequestHandler):
+    """CelesTrak's gp.php for the files in `root`, with ETag and Last-Modified."""
+    root = None
+
+    def do_GET(self):
+        group = self.path.split("GROUP=")[1].split("&")[0]
+        name = next(filename for group_name, filename in skynet("refresh").GROUPS.values() if group_name == group)
+        path = self.root / name
+        body = path.read_bytes()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", email.utils.formatdate(os.stat(path).st_mtime, usegmt=True))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+# Serve `root` on a free loopback port; returns the base URL and the server
+def stand_in(root):
+    handler = type("StandIn", (_StandIn,), {"root": root})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/gp.php", server
+
+# Hourly refresh when nothing changed upstream: one conditional request per group
+@case("refresh_unchanged")
+def refresh_unchanged(ctx):
+    refresh = skynet("refresh")
+    base, server = stand_in(ctx.directory / "databases")
+    client = ctx.directory / "client"
+    shutil.copytree(ctx.directory / "databases", client, dirs_exist_ok=True)
+    refresh.DATABASE = client
+    refresh.refresh_files(0, base)
+    return lambda: {"changed": refresh.refresh_files(0, base)}
+
+# Refresh in which 1% of the element sets changed upstream: fetch, diffed rebuild and
+# publish. The database write of the same delta is ingest_delta
+@case("refresh_delta")
+def refresh_delta(ctx):
+    refresh = skynet("refresh")
+    upstream = ctx.directory / "upstream"
+    write(ctx.updated, upstream)
+    base, server = stand_in(upstream)
+    client = ctx.directory / "client"
+
+    def setup():
+        shutil.rmtree(client, ignore_errors=True)
+        shutil.copytree(ctx.directory / "databases", client)
+        refresh.DATABASE = client
+        ctx.publish()
+        # As load_frames() leaves it: the published catalog is the one on disk
+        refresh._applied = refresh.file_fingerprints()
+
+    def run():
+        catalog = refresh.refresh_catalog(lambda elements, removed=None: None, 0, base)
+        return {"changed": catalog.diff.changed}
+    return setup, run
+
+# =============================
+# Drawing: propagation of the whole catalog, the figure skeleton and coordinates, what they
+# weigh on the wire, and create_map itself.
+# =============================
+@case("propagate")
+def propagate(ctx):
+    rows = reference_rows(ctx, REFERENCE_OBJECTS)
+    lat, lon, alt = ctx.catalog.propagator.geodetic_at(ctx.t)
+    expect_geodetic("geodetic_at()", (lat[rows], lon[rows], alt[rows]), skyfield_geodetic(ctx, rows, ctx.t))
+    return lambda: ctx.catalog.propagator.geodetic_at(ctx.t)
+
+# The window holding the benchmark time; checked against SGP4 between two of its samples
+@case("ephemeris_window", repeats=1, max_size=70000)
+def ephemeris_window(ctx):
+    ephemeris = skynet("ephemeris")
+    cache = ephemeris.EphemerisCache()
+    seconds, index = cache._locate(ctx.t)
+    window = cache.build(ctx.catalog, index)
+    t = ctx.t.ts.tt_jd(ctx.t.tt + (window.start + 0.37 * (window.end - window.start) - seconds) / 86400.0)
+    # Interpolated objects are within TOLERANCE_KM at the interval midpoints, where the error peaks
+    expect_geodetic("EphemerisCache.geodetic_at()", cache.geodetic_at(ctx.catalog, t), ctx.catalog.propagator.geodetic_at(t), ephemeris.TOLERANCE_KM)
+    return lambda: ephemeris.EphemerisCache().build(ctx.catalog, index)
+
+# The ticker's rolling extension of the ephemeris, with a heartbeat on the event loop
+@case("ephemeris_extend", repeats=1, max_size=70000)
+def ephemeris_extend(ctx):
+    ephemeris = skynet("ephemeris")
+    return lambda: {"max_stall_ms": loop_stall_ms(lambda: ephemeris.EphemerisCache().extend_async(ctx.catalog, ctx.t))}
+
+# The first PLAYBACK_FRAMES frames of a playback of the whole catalog, with a heartbeat on
+# the event loop
+@case("playback", repeats=1, max_size=70000)
+def playback(ctx):
+    Playback = skynet("playback").Playback
+    satrecs = ctx.catalog.propagator.satrecs
+    async def play():
+        playback = await asyncio.to_thread(Playback, satrecs, ctx.t, 6.0, PLAYBACK_FRAMES)
+        async for frame, lat, lon in playback.frames():
+            pass
+    return lambda: {"frames": PLAYBACK_FRAMES, "max_stall_ms": loop_stall_ms(play)}
+
+@case("figure_build")
+def figure_build(ctx):
+    build_figure = skynet("figure").build_figure
+    return lambda: build_figure(ctx.groups)
+
+@case("coordinates")
+def coordinates(ctx):
+    figure = skynet("figure")
+    viewport = skynet("viewport").Viewport()
+    return lambda: figure.coordinates(ctx.groups, viewport)
+
+# The skeleton as Reflex sends it when it changes
+@case("serialize_figure")
+def serialize_figure(ctx):
+    from reflex.utils.serializers import serialize
+    fig = skynet("figure").build_figure(ctx.groups)
+    return lambda: {"bytes": len(json.dumps(serialize(fig)))}
+
+# The coordinate arrays Reflex sends on every redraw
+@case("serialize_coords")
+def serialize_coords(ctx):
+    coords = skynet("figure").coordinates(ctx.groups, skynet("viewport").Viewport())
+    return lambda: {"bytes": len(json.dumps(coords))}
+
+# Decoding the packed coordinates in the browser, timed in Node with the Globe component's
+# own decoder; the metric is the per-frame decode time inside Node, without its startup
+@case("client_decode", repeats=1)
+def client_decode(ctx):
+    node = shutil.which("node")
+    if node is None:
+        raise Skip("node is not installed")
+    figure = skynet("figure")
+    coords = figure.coordinates(ctx.groups, skynet("viewport").Viewport())
+    script = f"const decode = {skynet('globe')._DECODE_COORDS};\n" + """
+const coords = JSON.parse(require("fs").readFileSync(0, "utf8"));
+const start = performance.now();
+for (let r = 0; r < REPEATS; r++) coords.forEach((c) => decode(c, {}));
+console.log((performance.now() - start) / REPEATS);
+""".replace("REPEATS", str(DECODE_REPEATS))
+    def run():
+        result = subprocess.run([node, "-e", script], input=json.dumps(coords), capture_output=True, text=True, check=True)
+        return {"decode_ms": float(result.stdout)}
+    return run
+
+# create_map when the skeleton has to be rebuilt (first draw, toggles)
+@case("create_map_first")
+def create_map_first(ctx):
+    state = app().State(_reflex_internal_init=True)
+    ctx.publish()
+    def setup():
+        state._figure_key = ()
+    return setup, state.create_map
+
+# create_map on a plain redraw: coordinates only
+@case("create_map_redraw")
+def create_map_redraw(ctx):
+    state = app().State(_reflex_internal_init=True)
+    ctx.publish()
+    state.create_map()
+    return state.create_map
+
+# =============================
+# Load: one tick interval of propagation with LOAD_SESSIONS simulated sessions redrawing at
+# once, each either propagating the catalog itself (the path before the ticker) or reading
+# the ticker's shared snapshot. cpu_seconds is the process CPU time of the interval, which
+# stays flat with the ticker as sessions are added.
+# =============================
+def _interval(tick, redraw, sessions):
+    async def run():
+        await tick()
+        await asyncio.gather(*(redraw() for _ in range(sessions)))
+    start = time.process_time()
+    asyncio.run(run())
+    return {"sessions": sessions, "cpu_seconds": time.process_time() - start}
+
+def _load_cases(sessions):
+    @case(f"load_per_session_{sessions}", repeats=1, max_size=13000)
+    def per_session(ctx):
+        propagator = ctx.catalog.propagator
+        async def idle():
+            pass
+        return lambda: _interval(idle, lambda: propagator.geodetic_at_async(ctx.t), sessions)
+
+    @case(f"load_shared_{sessions}", repeats=1, max_size=13000)
+    def shared(ctx):
+        ticker = skynet("ticker").PropagationTicker()
+        ctx.publish()
+        return lambda: _interval(lambda: ticker.tick_async(ctx.t), ticker.current_async, sessions)
+
+for sessions in LOAD_SESSIONS:
+    _load_cases(sessions)
+
+# =============================
+# Lookups: show_data() on clicked objects and the pick index behind cluster clicks.
+# =============================
+@case("show_data")
+def show_data(ctx):
+    ctx.require_db()
+    state = app().State(_reflex_internal_init=True)
+    ctx.publish()
+    store(ctx.catalog.elements)
+    ids = np.random.default_rng(0).choice(ctx.catalog.ids, LOOKUPS).tolist()
+    def run():
+        for norad_id in ids:
+            state.show_data(norad_id)
+        return {"lookups": LOOKUPS}
+    return run
+
+@case("pick_build")
+def pick_build(ctx):
+    PickIndex = skynet("pick").PickIndex
+    rng = np.random.default_rng(1)
+    points = np.column_stack([np.degrees(np.arcsin(rng.uniform(-1, 1, REFERENCE_QUERIES))), rng.uniform(-180, 180, REFERENCE_QUERIES)]).tolist()
+    expect_picks(PickIndex(ctx.snapshot), ctx.snapshot, points)
+    return lambda: PickIndex(ctx.snapshot)
+
+@case("pick_query")
+def pick_query(ctx):
+    index = skynet("pick").PickIndex(ctx.snapshot)
+    rng = np.random.default_rng(0)
+    points = np.column_stack([np.degrees(np.arcsin(rng.uniform(-1, 1, QUERIES))), rng.uniform(-180, 180, QUERIES)]).tolist()
+    expect_picks(index, ctx.snapshot, points[:REFERENCE_QUERIES])
+    def run():
+        for lat, lon in points:
+            index.nearest(lat, lon)
+        return {"queries": QUERIES}
+    return run
+
+# =============================
+# Filters: building the category bitmaps of a catalog, and resolving selections that miss
+# the mask cache.
+# =============================
+@case("filter_build")
+def filter_build(ctx):
+    filters = skynet("filters")
+    return lambda: filters.FilterIndex.from_elements(ctx.catalog.elements, ctx.catalog.types)
+
+@case("filter_resolve")
+def filter_resolve(ctx):
+    filters = skynet("filters")
+    index = filters.FilterIndex.from_elements(ctx.catalog.elements, ctx.catalog.types)
+    rng = np.random.default_rng(0)
+    selections = [
+        filters.Selection(
+            regimes=frozenset(rng.choice(filters.REGIMES, 2, replace=False).tolist()),
+            bands=frozenset(rng.choice(filters.BANDS, 2, replace=False).tolist()),
+            years=(int(year), int(year) + 5),
+            constellations=frozenset(index.constellations[:1]),
+        )
+        for year in rng.integers(1990, 2025, SELECTIONS)
+    ]
+    def run():
+        for selection in selections:
+            index._resolve(selection, ("Satellite", "Station"))
+        return {"selections": SELECTIONS}
+    return run
+
+# =============================
+# Sky view: what OBSERVERS observers spread over the globe see in one snapshot, with the
+# snapshot's Earth-fixed positions already shared.
+# =============================
+@case("sky_look")
+def sky_look(ctx):
+    sky = skynet("sky")
+    Observer = skynet("passes").Observer
+    rng = np.random.default_rng(0)
+    observers = [Observer(float(lat), float(lon)) for lat, lon in zip(np.degrees(np.arcsin(rng.uniform(-1, 1, OBSERVERS))), rng.uniform(-180, 180, OBSERVERS))]
+    sky.positions_for(ctx.snapshot)
+    def run():
+        seen = sum(len(sky.look(ctx.snapshot, observer)) for observer in observers)
+        return {"observers": OBSERVERS, "objects_seen": seen}
+    return run
+
+# Every rise, culmination and set of the catalog over a day for one observer, in process
+@case("passes", repeats=1, max_size=13000)
+def passes(ctx):
+    predict = skynet("passes")
+    observer = predict.Observer(51.4769, -0.0005, 46.0)
+    end = ctx.t.ts.tt_jd(ctx.t.tt + 1.0)
+    def run():
+        found = predict.predict_passes(ctx.catalog, observer, ctx.t, end, skynet("sky").SKY_MIN_ELEVATION)
+        return {"events": len(found), "passes": len(found.passes())}
+    return run
+
+# =============================
+# Conjunction screening: CONJUNCTION_MINUTES of the whole catalog in process, checked against
+# the separation of the reported pairs propagated directly at the reported times.
+# =============================
+@case("conjunctions", repeats=1, max_size=13000)
+def conjunctions(ctx):
+    screen = skynet("conjunctions")
+    propagation = skynet("propagation")
+    end = ctx.t.ts.tt_jd(ctx.t.tt + CONJUNCTION_MINUTES / 1440.0)
+    found = screen.screen_conjunctions(ctx.catalog, ctx.t, end)
+    first = slice(0, REFERENCE_ENCOUNTERS)
+    if len(found):
+        jd, fr_utc, _ = propagation.time_arrays(found.times(ctx.t.ts)[first])
+        _, a, _ = ctx.catalog.propagator.propagate_pairs(found.rows_a[first], jd, fr_utc)
+        _, b, _ = ctx.catalog.propagator.propagate_pairs(found.rows_b[first], jd, fr_utc)
+        expect_close("screen_conjunctions() miss distances (km)", np.linalg.norm(a - b, axis=1) - found.miss_km[first], REFERENCE_KM)
+    # Run as UpcomingConjunctions runs it for the app: in a worker thread next to the event loop
+    def run():
+        found = []
+        async def work():
+            found.append(await asyncio.to_thread(screen.screen_conjunctions, ctx.catalog, ctx.t, end))
+        stall = loop_stall_ms(work)
+        return {"encounters": len(found[0]), "max_stall_ms": stall}
+    return run
+
+# =============================
+# Element set archive: a full-catalog snapshot at a past time from an archive holding
+# ARCHIVE_DAYS daily refreshes of the catalog, each with every element set changed.
+# =============================
+@case("archive_snapshot", max_size=13000)
+def archive_snapshot(ctx):
+    archive = skynet("archive").ElementArchive(ctx.directory / "archive" / f"{ctx.label}.sqlite")
+    elements = ctx.catalog.elements
+    epoch = elements["EPOCH"].to_numpy(dtype="datetime64[us]")
+    for day in range(ARCHIVE_DAYS - 1, -1, -1):
+        archive.append(elements.assign(
+            EPOCH=np.datetime_as_string(epoch - np.timedelta64(day, "D"), unit="us"),
+            MEAN_ANOMALY=(elements["MEAN_ANOMALY"] + day) % 360.0,
+        ))
+    t = ctx.t.ts.tt_jd(ctx.t.tt - ARCHIVE_DAYS / 2)
+    return lambda: {"objects": len(archive.snapshot_at(t).catalog), "days": ARCHIVE_DAYS}
+
+# =============================
+# Coverage heatmap: the grid of one snapshot, and an averaged run over the default window.
+# =============================
+@case("coverage_counts")
+def coverage_counts(ctx):
+    coverage = skynet("coverage")
+    pick = skynet("pick")
+    snapshot = ctx.snapshot
+    # Reference: every object tested against sampled cell centers, one by one
+    counts = coverage.coverage_counts(snapshot.lat, snapshot.lon, snapshot.alt)
+    rng = np.random.default_rng(0)
+    cells = np.column_stack([rng.integers(0, coverage.GRID.rows, REFERENCE_CELLS), rng.integers(0, coverage.GRID.cols, REFERENCE_CELLS)])
+    objects = pick._unit_vectors(snapshot.lat, snapshot.lon)
+    radius = coverage.footprint_radii(snapshot.alt)
+    expected = [
+        int(np.sum(np.arccos(np.clip(objects @ pick._unit_vectors(coverage.GRID.lat[row], coverage.GRID.lon[col]), -1.0, 1.0)) <= radius))
+        for row, col in cells.tolist()
+    ]
+    expect_close("coverage_counts() (objects)", counts[cells[:, 0], cells[:, 1]] - np.array(expected), 0)
+    return lambda: {"mean_in_view": round(float(coverage.coverage_counts(snapshot.lat, snapshot.lon, snapshot.alt).mean()), 1)}
+
+@case("coverage_average", repeats=1, max_size=70000)
+def coverage_average(ctx):
+    coverage = skynet("coverage")
+    rows = np.arange(len(ctx.catalog))
+    # Reference: REFERENCE_HOURS of snapshots propagated at once and averaged
+    start = np.floor(ctx.t.tt * 24.0) / 24.0
+    times = ctx.t.ts.tt_jd(start + np.arange(0.0, REFERENCE_HOURS * 60.0, coverage.AVERAGE_STEP_MINUTES) / 1440.0)
+    lat, lon, alt = ctx.catalog.propagator.geodetic_at(times)
+    expected = np.mean([coverage.coverage_counts(lat[:, k], lon[:, k], alt[:, k]) for k in range(len(times))], axis=0)
+    expect_close("average_for() (objects)", coverage.average_for(ctx.catalog, rows, ctx.t, REFERENCE_HOURS) - expected, 1e-9)
+    # Run as the app runs it: in a worker thread next to the event loop
+    def run():
+        average = []
+        async def work():
+            average.append(await asyncio.to_thread(coverage.average_for, ctx.catalog, rows, ctx.t))
+        stall = loop_stall_ms(work)
+        return {
+            "samples": int(coverage.AVERAGE_HOURS * 60 / coverage.AVERAGE_STEP_MINUTES),
+            "mean_in_view": round(float(average[0].mean()), 1),
+            "max_stall_ms": stall,
+        }
+    return coverage._averages.clear, run
@@ -0,0 +1,64 @@
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+# Checked-in element sets everything is measured on or scaled from
+SOURCE = pathlib.Path(__file__).resolve().parent.parent / "databases"
+# Catalog type -> file name, as the app lays them out
+FILES = {
+    "Satellite": "active_satellites.csv",
+    "Station": "stations.csv",
+}
+# Synthetic catalog sizes by label
+SIZES = {
+    "1k": 1000,
+    "12k": 12000,
+    "60k": 60000,
+    "200k": 200000,
+}
+SEED = 2025
+
+def checked_in():
+    return {typ: pd.read_csv(SOURCE / name) for typ, name in FILES.items()}
+
+# A catalog of `size` objects tiled from the checked-in element sets. Copies after the first
+# are spread along their orbits and nodes so they do not sit on the originals, and every
+# object gets a fresh NORAD id 1..size
+def synthetic(size, seed=SEED):
+    frames = checked_in()
+    base = pd.concat([frame.assign(type=typ) for typ, frame in frames.items()], ignore_index=True)
+    copy = np.arange(size) // len(base)
+    shifted = copy > 0
+    rng = np.random.default_rng(seed)
+
+    elements = base.iloc[np.arange(size) % len(base)].reset_index(drop=True)
+    elements.loc[shifted, "MEAN_ANOMALY"] = (elements.loc[shifted, "MEAN_ANOMALY"] + rng.uniform(0.0, 360.0, shifted.sum())) % 360.0
+    elements.loc[shifted, "RA_OF_ASC_NODE"] = (elements.loc[shifted, "RA_OF_ASC_NODE"] + rng.uniform(-5.0, 5.0, shifted.sum())) % 360.0
+    elements.loc[shifted, "OBJECT_NAME"] = elements.loc[shifted, "OBJECT_NAME"] + " #" + copy[shifted].astype(str)
+    elements["NORAD_CAT_ID"] = np.arange(1, size + 1)
+    return {
+        typ: elements[elements["type"] == typ].drop(columns="type").reset_index(drop=True)
+        for typ in FILES
+    }
+
+# The same catalog after a refresh in which every 1/fraction-th object got a new element set
+def with_updates(frames, fraction=0.01):
+    updated = {}
+    for typ, frame in frames.items():
+        frame = frame.copy()
+        rows = np.arange(0, len(frame), max(1, int(round(1.0 / fraction))))
+        frame.loc[rows, "ELEMENT_SET_NO"] = frame.loc[rows, "ELEMENT_SET_NO"] + 1
+        frame.loc[rows, "MEAN_ANOMALY"] = (frame.loc[rows, "MEAN_ANOMALY"] + 0.1) % 360.0
+        updated[typ] = frame
+    return updated
+
+# Write frames as CSV files laid out like databases/; returns {type: path}
+def write(frames, directory):
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for typ, frame in frames.items():
+        paths[typ] = directory / FILES[typ]
+        frame.to_csv(paths[typ], index=False)
+    return paths
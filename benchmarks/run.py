@@ -0,0 +1,191 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+# Stored results new runs are checked against
+BASELINE = pathlib.Path(__file__).resolve().parent / "baseline.json"
+OUTPUT = pathlib.Path(__file__).resolve().parent / "results.json"
+# A case regresses when it is this many times slower than the baseline, and slower by more
+# than the floor (timer and scheduler noise dominates below it)
+TIME_TOLERANCE = 1.5
+TIME_FLOOR_S = 0.005
+# Same for peak memory and for the size of serialized payloads
+MEMORY_TOLERANCE = 1.25
+MEMORY_FLOOR_MB = 1.0
+BYTES_TOLERANCE = 1.05
+# Cases that report max_stall_ms fail outright when they held the event loop up for longer
+# than this at once: every connected session freezes meanwhile
+STALL_LIMIT_MS = 50.0
+
+# =============================
+# Measurement: best and median wall time over the case's repeats, then one more run under
+# tracemalloc for the peak Python/NumPy heap it allocates.
+# =============================
+def measure(case, ctx):
+    made = case.make(ctx)
+    setup, run = made if isinstance(made, tuple) else (None, made)
+    times = []
+    metrics = None
+    for _ in range(case.repeats):
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        metrics = run()
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        "seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "repeats": case.repeats,
+        "peak_mb": peak / 2**20,
+    }
+    if isinstance(metrics, dict):
+        result.update(metrics)
+    return result
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _environment():
+    import numpy
+    import pandas
+    import sgp4
+    return {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "sgp4": sgp4.__version__,
+    }
+
+# =============================
+# Baseline check: every case present in both runs is compared on time, peak memory and
+# payload size. Cases missing from either side are listed but never fail the run on those;
+# event loop stalls are checked against STALL_LIMIT_MS, and outputs that differ from their
+# reference fail, whatever the baseline.
+# =============================
+def regressions(results, baseline):
+    failed = []
+    for key, result in results.items():
+        if "skipped" in result:
+            continue
+        if "mismatch" in result:
+            failed.append(f"{key}: {result['mismatch']}")
+            continue
+        if result.get("max_stall_ms", 0.0) > STALL_LIMIT_MS:
+            failed.append(f"{key}: event loop stalled for {result['max_stall_ms']:.0f} ms")
+        if key not in baseline or "seconds" not in baseline[key]:
+            continue
+        base = baseline[key]
+        if result["seconds"] > base["seconds"] * TIME_TOLERANCE and result["seconds"] - base["seconds"] > TIME_FLOOR_S:
+            failed.append(f"{key}: {result['seconds']:.4f} s vs {base['seconds']:.4f} s")
+        if result["peak_mb"] > base["peak_mb"] * MEMORY_TOLERANCE and result["peak_mb"] - base["peak_mb"] > MEMORY_FLOOR_MB:
+            failed.append(f"{key}: peak {result['peak_mb']:.1f} MB vs {base['peak_mb']:.1f} MB")
+        if "bytes" in base and result.get("bytes", 0) > base["bytes"] * BYTES_TOLERANCE:
+            failed.append(f"{key}: {result.get('bytes')} bytes vs {base['bytes']} bytes")
+    return failed
+
+def _contexts(labels, scratch, t):
+    from .cases import Context
+    from .catalogs import SIZES, checked_in, synthetic
+    for label in labels:
+        frames = checked_in() if label == "checked-in" else synthetic(SIZES[label])
+        yield Context(label, frames, scratch / label, t)
+
+# Fixed propagation time: the newest epoch of the checked-in catalog, so runs do not depend
+# on the day they are made
+def _benchmark_time():
+    import pandas as pd
+    from skyfield.api import load
+    from .catalogs import checked_in
+    epoch = max(pd.to_datetime(frame["EPOCH"], format="ISO8601").max() for frame in checked_in().values())
+    return load.timescale().from_datetime(epoch.tz_localize("UTC").to_pydatetime())
+
+def main(argv=None):
+    from .catalogs import SIZES
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the Skynet hot paths without network access.")
+    parser.add_argument("--sizes", nargs="+", default=["checked-in", *SIZES], choices=["checked-in", *SIZES])
+    parser.add_argument("--cases", nargs="+", help="only run these cases")
+    parser.add_argument("--output", type=pathlib.Path, default=OUTPUT)
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="skynet-bench-") as scratch:
+        scratch = pathlib.Path(scratch)
+        # A scratch database, set before anything reads the Reflex config
+        os.environ["REFLEX_DB_URL"] = f"sqlite:///{scratch / 'bench.db'}"
+        sys.path.insert(0, str(ROOT))
+        from .cases import CASES, Mismatch, Skip, engine, skynet
+        # reflex has to be imported before reflex.model
+        skynet("models")
+        import sqlmodel
+        sqlmodel.SQLModel.metadata.create_all(engine())
+
+        cases = [case for case in CASES if not args.cases or case.name in args.cases]
+        results = {}
+        for ctx in _contexts(args.sizes, scratch, _benchmark_time()):
+            for case in cases:
+                key = f"{case.name}@{ctx.label}"
+                try:
+                    if case.max_size is not None and ctx.size > case.max_size:
+                        raise Skip(f"only run up to {case.max_size} objects")
+                    results[key] = measure(case, ctx)
+                except Skip as reason:
+                    results[key] = {"skipped": str(reason)}
+                except Mismatch as reason:
+                    results[key] = {"mismatch": str(reason)}
+                result = results[key]
+                if "skipped" in result:
+                    print(f"{key:<36} skipped: {result['skipped']}", flush=True)
+                elif "mismatch" in result:
+                    print(f"{key:<36} MISMATCH: {result['mismatch']}", flush=True)
+                else:
+                    extra = f"  {result['bytes'] / 1e6:.2f} MB sent" if "bytes" in result else ""
+                    if "max_stall_ms" in result:
+                        extra += f"  loop stalled {result['max_stall_ms']:.1f} ms"
+                    print(f"{key:<36} {result['seconds'] * 1e3:10.2f} ms  peak {result['peak_mb']:8.1f} MB{extra}", flush=True)
+
+    report = {"environment": _environment(), "results": results}
+    args.output.write_text(json.dumps(report, indent=1))
+    print(f"Results written to {args.output}")
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=1))
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print("No baseline to compare against")
+        return 0
+
+    failed = regressions(results, json.loads(args.baseline.read_text())["results"])
+    for line in failed:
+        print(f"REGRESSION {line}")
+    return 1 if failed else 0
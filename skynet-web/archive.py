@@ -0,0 +1,197 @@
+import collections
+import contextlib
+import itertools
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+from reflex.utils import console
+from skyfield.api import load
+
+from .catalog import build_catalog
+from .ticker import Snapshot
+
+# Every element set the app has served is appended here (SKYNET_ARCHIVE_PATH overrides)
+ARCHIVE_PATH = pathlib.Path(os.environ.get("SKYNET_ARCHIVE_PATH", "databases/archive.sqlite"))
+# Element sets further than this many days from the asked time are not used: the object had
+# not been launched yet, or had decayed (SKYNET_ARCHIVE_MAX_GAP_DAYS overrides)
+MAX_GAP_DAYS = float(os.environ.get("SKYNET_ARCHIVE_MAX_GAP_DAYS", "14"))
+# Whole-archive snapshots kept for the sessions looking at past times, least recently used
+# out first (SKYNET_ARCHIVE_SNAPSHOTS_KEPT overrides)
+SNAPSHOTS_KEPT = int(os.environ.get("SKYNET_ARCHIVE_SNAPSHOTS_KEPT", "4"))
+
+_DAY_US = 86400 * 10**6
+# OMM columns kept per element set, and per object (latest values win)
+_ELEMENT_COLUMNS = (
+    "MEAN_MOTION", "ECCENTRICITY", "INCLINATION", "RA_OF_ASC_NODE", "ARG_OF_PERICENTER", "MEAN_ANOMALY",
+    "ELEMENT_SET_NO", "REV_AT_EPOCH", "BSTAR", "MEAN_MOTION_DOT", "MEAN_MOTION_DDOT",
+)
+_OBJECT_COLUMNS = ("OBJECT_NAME", "OBJECT_ID", "EPHEMERIS_TYPE", "CLASSIFICATION_TYPE")
+
+# Element sets are keyed (and so clustered on disk) by object and epoch, in microseconds
+# since 1970; an element set already archived is never written again
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS element_sets (
+    NORAD_CAT_ID INTEGER NOT NULL,
+    epoch INTEGER NOT NULL,
+    {", ".join(f"{column} {'INTEGER' if column in ('ELEMENT_SET_NO', 'REV_AT_EPOCH') else 'REAL'}" for column in _ELEMENT_COLUMNS)},
+    PRIMARY KEY (NORAD_CAT_ID, epoch)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS objects (
+    type TEXT NOT NULL,
+    NORAD_CAT_ID INTEGER NOT NULL,
+    OBJECT_NAME TEXT, OBJECT_ID TEXT, EPHEMERIS_TYPE INTEGER, CLASSIFICATION_TYPE TEXT,
+    PRIMARY KEY (type, NORAD_CAT_ID)
+) WITHOUT ROWID;
+"""
+
+_INSERT_ELEMENTS = (
+    f"INSERT OR IGNORE INTO element_sets (NORAD_CAT_ID, epoch, {', '.join(_ELEMENT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * (len(_ELEMENT_COLUMNS) + 2))})"
+)
+_UPSERT_OBJECTS = (
+    f"INSERT INTO objects (type, NORAD_CAT_ID, {', '.join(_OBJECT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * (len(_OBJECT_COLUMNS) + 2))}) "
+    f"ON CONFLICT (type, NORAD_CAT_ID) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in _OBJECT_COLUMNS)}"
+)
+
+# Per object, the closest archived epochs at or before and after :t (two primary key seeks),
+# then the nearer of the two, if it is within :gap
+_NEAREST = f"""
+WITH picked AS MATERIALIZED (
+    SELECT o.*,
+        (SELECT epoch FROM element_sets WHERE NORAD_CAT_ID = o.NORAD_CAT_ID AND epoch <= :t ORDER BY epoch DESC LIMIT 1) AS before,
+        (SELECT epoch FROM element_sets WHERE NORAD_CAT_ID = o.NORAD_CAT_ID AND epoch > :t ORDER BY epoch LIMIT 1) AS after
+    FROM objects o
+    {{where}}
+)
+SELECT p.type, p.NORAD_CAT_ID, {", ".join(f"p.{column}" for column in _OBJECT_COLUMNS)}, e.epoch, {", ".join(f"e.{column}" for column in _ELEMENT_COLUMNS)}
+FROM picked p
+JOIN element_sets e ON e.NORAD_CAT_ID = p.NORAD_CAT_ID AND e.epoch =
+    CASE WHEN p.after IS NULL OR (p.before IS NOT NULL AND :t - p.before <= p.after - :t) THEN p.before ELSE p.after END
+WHERE abs(e.epoch - :t) <= :gap
+ORDER BY p.type, p.NORAD_CAT_ID
+"""
+
+# Historical catalogs get negative versions, so their caches never collide with the live ones
+_versions = itertools.count(-1, -1)
+
+# =============================
+# ElementArchive: an append-only SQLite history of every element set ingested, for answering
+# "where was X (or everything) at time T" from the element set nearest to T.
+# =============================
+class ElementArchive:
+    """Element sets by object and epoch."""
+
+    def __init__(self, path=ARCHIVE_PATH):
+        self.path = pathlib.Path(path)
+        # Newest catalog version recorded by this process
+        self._recorded = 0
+        self._lock = threading.Lock()
+        self._ready = False
+        self.timescale = load.timescale()
+        # snapshot() results by the time asked for
+        self._snapshots_lock = threading.Lock()
+        self._snapshots = collections.OrderedDict()
+
+    # One connection per call: writers run on the refresh thread, readers in worker threads
+    @contextlib.contextmanager
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30.0)
+        try:
+            if not self._ready:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(_SCHEMA)
+                self._ready = True
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def append(self, elements):
+        """Add the element sets of an OMM frame with a type column. Returns how many were new."""
+        epoch = elements["EPOCH"].to_numpy(dtype="datetime64[us]").astype(np.int64)
+        ids = elements["NORAD_CAT_ID"].to_numpy(dtype=np.int64).tolist()
+        rows = zip(ids, epoch.tolist(), *(elements[column].tolist() for column in _ELEMENT_COLUMNS))
+        objects = zip(elements["type"].tolist(), ids, *(elements[column].tolist() for column in _OBJECT_COLUMNS))
+        with self._connect() as connection:
+            before = connection.total_changes
+            connection.executemany(_INSERT_ELEMENTS, rows)
+            added = connection.total_changes - before
+            connection.executemany(_UPSERT_OBJECTS, objects)
+        return added
+
+    def record(self, catalog):
+        """Archive what a catalog adds: the changed element sets of a refresh, or everything the
+        first time this process sees a catalog. Archive failures are reported, never raised."""
+        with self._lock:
+            if catalog.version <= self._recorded:
+                return 0
+            elements = catalog.elements
+            if catalog.diff is not None and self._recorded:
+                elements = elements.iloc[catalog.diff.rows]
+            try:
+                added = self.append(elements)
+            except sqlite3.Error as error:
+                console.warn(f"Element set archive not updated: {error}")
+                return 0
+            self._recorded = catalog.version
+            return added
+
+    def elements_at(self, when, ids=None, max_gap_days=MAX_GAP_DAYS):
+        """OMM frame (with a type column) of each archived object's element set nearest to the UTC
+        datetime `when`, limited to the given NORAD ids."""
+        t = int(np.datetime64(when.replace(tzinfo=None), "us").astype(np.int64))
+        parameters = {"t": t, "gap": int(max_gap_days * _DAY_US)}
+        where = ""
+        if ids is not None:
+            where = "WHERE o.NORAD_CAT_ID IN (SELECT value FROM json_each(:ids))"
+            parameters["ids"] = json.dumps([int(norad_id) for norad_id in ids])
+        with self._connect() as connection:
+            cursor = connection.execute(_NEAREST.format(where=where), parameters)
+            columns = [description[0] for description in cursor.description]
+            elements = pd.DataFrame(cursor.fetchall(), columns=columns)
+        epoch = elements.pop("epoch").to_numpy(dtype=np.int64).astype("datetime64[us]")
+        elements["EPOCH"] = np.datetime_as_string(epoch, unit="us")
+        return elements
+
+    def snapshot_at(self, t, ids=None, max_gap_days=MAX_GAP_DAYS):
+        """Snapshot of the archived objects at Skyfield Time t, propagated from their nearest
+        element sets, or None when the archive has nothing near t."""
+        elements = self.elements_at(t.utc_datetime(), ids, max_gap_days)
+        if not len(elements):
+            return None
+        frames = {
+            typ: frame.drop(columns="type").reset_index(drop=True)
+            for typ, frame in elements.groupby("type", sort=False)
+        }
+        catalog = build_catalog(frames, next(_versions))
+        lat, lon, alt = catalog.propagator.geodetic_at(t)
+        return Snapshot(catalog=catalog, t=t, lat=lat, lon=lon, alt=alt)
+
+    def snapshot(self, when):
+        """snapshot_at() of every archived object at the UTC datetime `when`, shared by the sessions
+        looking at that time. Sessions keep only `when`, since catalogs do not pickle; one whose
+        snapshot has been evicted gets it rebuilt here."""
+        key = when.isoformat()
+        with self._snapshots_lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+                return snapshot
+        snapshot = self.snapshot_at(self.timescale.from_datetime(when))
+        if snapshot is None:
+            return None
+        with self._snapshots_lock:
+            snapshot = self._snapshots.setdefault(key, snapshot)
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > SNAPSHOTS_KEPT:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+archive = ElementArchive()
@@ -0,0 +1,182 @@
+import itertools
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sgp4.api import Satrec, WGS72
+
+from .ingest import db_columns
+from .propagation import CatalogPropagator
+
+# =============================
+# Catalog: one immutable, process-wide copy of the downloaded element sets.
+# Every session reads the same object; a refresh builds a new one and swaps it in.
+# =============================
+@dataclass(frozen=True)
+class Catalog:
+    """Parsed element sets plus the vectorized propagator built from them."""
+    version: int
+    elements: pd.DataFrame
+    names: np.ndarray
+    types: np.ndarray
+    ids: np.ndarray
+    propagator: CatalogPropagator
+    # What changed relative to the catalog this one was built from, if any
+    diff: "CatalogDiff | None" = None
+
+    # Column names as stored in the db table
+    @property
+    def colnames(self):
+        return db_columns(self.elements)
+
+    def __len__(self):
+        return len(self.names)
+
+@dataclass(frozen=True)
+class CatalogDiff:
+    """How a catalog differs from its predecessor, per object."""
+    added: int
+    changed: int
+    removed: int
+    unchanged: int
+    # Rows of the new catalog whose element sets are new or changed
+    rows: np.ndarray
+    # NORAD ids no longer in the catalog
+    removed_ids: np.ndarray
+
+    def __repr__(self):
+        return f"CatalogDiff(added={self.added}, changed={self.changed}, removed={self.removed}, unchanged={self.unchanged})"
+
+_swap_lock = threading.Lock()
+_load_lock = threading.Lock()
+_versions = itertools.count(1)
+_current = None
+
+# Unit conversions used by sgp4.omm.initialize()
+_TO_RADIANS = np.pi / 180.0
+_NDOT_UNITS = 1036800.0 / np.pi
+_NDDOT_UNITS = 2985984000.0 / 2.0 / np.pi
+_EPOCH0 = np.datetime64("1949-12-31T00:00:00", "us")
+
+# Arguments of Satrec.sgp4init() after the gravity model and mode, one row per element set,
+# converted exactly as sgp4.omm.initialize() (and so EarthSatellite.from_omm()) does
+SGP4_ARGUMENTS = ("satnum", "epoch", "bstar", "ndot", "nddot", "ecco", "argpo", "inclo", "mo", "no_kozai", "nodeo")
+
+def sgp4_arguments(elements):
+    epoch = (elements["EPOCH"].to_numpy(dtype="datetime64[us]") - _EPOCH0).astype(np.int64) / 1e6 / 86400.0
+    return np.column_stack([
+        elements["NORAD_CAT_ID"].to_numpy(dtype=float),
+        epoch,
+        elements["BSTAR"].to_numpy(dtype=float),
+        elements["MEAN_MOTION_DOT"].to_numpy(dtype=float) / _NDOT_UNITS,
+        elements["MEAN_MOTION_DDOT"].to_numpy(dtype=float) / _NDDOT_UNITS,
+        elements["ECCENTRICITY"].to_numpy(dtype=float),
+        elements["ARG_OF_PERICENTER"].to_numpy(dtype=float) * _TO_RADIANS,
+        elements["INCLINATION"].to_numpy(dtype=float) * _TO_RADIANS,
+        elements["MEAN_ANOMALY"].to_numpy(dtype=float) * _TO_RADIANS,
+        elements["MEAN_MOTION"].to_numpy(dtype=float) / 720.0 * np.pi,
+        elements["RA_OF_ASC_NODE"].to_numpy(dtype=float) * _TO_RADIANS,
+    ]).reshape(len(elements), len(SGP4_ARGUMENTS))
+
+# Satrec objects from rows of sgp4_arguments(); only sgp4init runs per row
+def satrecs_from_arguments(arguments):
+    satrecs = []
+    for satnum, *rest in np.asarray(arguments, dtype=float).tolist():
+        satrec = Satrec()
+        satrec.sgp4init(WGS72, 'i', int(satnum), *rest)
+        satrecs.append(satrec)
+    return satrecs
+
+# Same initialization sgp4.omm.initialize() (and so EarthSatellite.from_omm()) does, with the
+# unit conversions and epoch parsing done on whole columns
+def satrecs_from_elements(elements):
+    satrecs = satrecs_from_arguments(sgp4_arguments(elements))
+    columns = zip(
+        satrecs,
+        elements["CLASSIFICATION_TYPE"].tolist(),
+        [object_id[2:].replace("-", "") for object_id in elements["OBJECT_ID"].tolist()],
+        elements["EPHEMERIS_TYPE"].astype(int).tolist(),
+        elements["ELEMENT_SET_NO"].astype(int).tolist(),
+        elements["REV_AT_EPOCH"].astype(int).tolist(),
+    )
+    for satrec, classification, intldesg, ephtype, elnum, revnum in columns:
+        satrec.classification = classification
+        satrec.intldesg = intldesg
+        satrec.ephtype = ephtype
+        satrec.elnum = elnum
+        satrec.revnum = revnum
+    return satrecs
+
+# An element set is unchanged when its object, element set number and epoch all match
+_IDENTITY = ["type", "NORAD_CAT_ID", "ELEMENT_SET_NO", "EPOCH"]
+
+# Rows of `elements` whose element set is unchanged in `previous`, and their rows there
+def _unchanged_rows(previous, elements):
+    before = previous.elements[_IDENTITY].assign(_before=np.arange(len(previous)))
+    after = elements[_IDENTITY].assign(_after=np.arange(len(elements)))
+    matched = after.merge(before.drop_duplicates(_IDENTITY), on=_IDENTITY, how="inner")
+    return matched["_after"].to_numpy(), matched["_before"].to_numpy()
+
+# Build a catalog from {type: DataFrame of OMM rows}, e.g. {"Satellite": sats, "Station": stations}.
+# Given the previous catalog, only new or changed element sets are initialized; the Satrec
+# objects of unchanged ones are reused
+def build_catalog(frames, version, previous=None):
+    elements = pd.concat(
+        [frame.assign(type=typ) for typ, frame in frames.items()],
+        ignore_index=True,
+    )
+    diff = None
+    if previous is None:
+        satrecs = satrecs_from_elements(elements)
+    else:
+        rows, previous_rows = _unchanged_rows(previous, elements)
+        satrecs = np.empty(len(elements), dtype=object)
+        satrecs[rows] = [previous.propagator.satrecs[row] for row in previous_rows.tolist()]
+        stale = np.setdiff1d(np.arange(len(elements)), rows)
+        satrecs[stale] = satrecs_from_elements(elements.iloc[stale])
+        satrecs = satrecs.tolist()
+
+        before = previous.elements[_IDENTITY[:2]].drop_duplicates()
+        after = elements[_IDENTITY[:2]].drop_duplicates()
+        kept = len(after.merge(before, on=_IDENTITY[:2], how="inner"))
+        diff = CatalogDiff(
+            added=len(after) - kept,
+            changed=kept - len(rows),
+            removed=len(before) - kept,
+            unchanged=len(rows),
+            rows=stale,
+            removed_ids=np.setdiff1d(previous.ids, elements["NORAD_CAT_ID"].to_numpy(dtype=np.int64)),
+        )
+    return Catalog(
+        version=version,
+        elements=elements,
+        names=elements["OBJECT_NAME"].to_numpy(dtype=object),
+        types=elements["type"].to_numpy(dtype=object),
+        ids=elements["NORAD_CAT_ID"].to_numpy(dtype=np.int64),
+        propagator=CatalogPropagator(satrecs),
+        diff=diff,
+    )
+
+# The catalog currently being served, or None before the first load
+def get_catalog():
+    return _current
+
+# Build a new catalog from the given frames, reusing what is unchanged from the current one,
+# and swap it in. Readers holding the old object keep a consistent view; a slower, older build
+# never replaces a newer one
+def publish_catalog(frames):
+    global _current
+    catalog = build_catalog(frames, next(_versions), previous=_current)
+    with _swap_lock:
+        if _current is None or catalog.version > _current.version:
+            _current = catalog
+        return _current
+
+# Load the catalog exactly once per process; concurrent callers wait for the first loader
+def ensure_catalog(loader):
+    if _current is None:
+        with _load_lock:
+            if _current is None:
+                publish_catalog(loader())
+    return _current
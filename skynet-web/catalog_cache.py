@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+# Bump when the on-disk layout changes so stale caches are rebuilt
+FORMAT_VERSION = 1
+
+# Numeric OMM columns, stored in one structured array
+NUMERIC_FIELDS = [
+    ("MEAN_MOTION", "f8"),
+    ("ECCENTRICITY", "f8"),
+    ("INCLINATION", "f8"),
+    ("RA_OF_ASC_NODE", "f8"),
+    ("ARG_OF_PERICENTER", "f8"),
+    ("MEAN_ANOMALY", "f8"),
+    ("EPHEMERIS_TYPE", "i8"),
+    ("NORAD_CAT_ID", "i8"),
+    ("ELEMENT_SET_NO", "i8"),
+    ("REV_AT_EPOCH", "i8"),
+    ("BSTAR", "f8"),
+    ("MEAN_MOTION_DOT", "f8"),
+    ("MEAN_MOTION_DDOT", "f8"),
+]
+# Text OMM columns, stored in a separate string table
+STRING_FIELDS = ["OBJECT_NAME", "OBJECT_ID", "EPOCH", "CLASSIFICATION_TYPE"]
+
+# =============================
+# Compiled catalog files: <cache>/<stem>.elements.npy (numeric columns), <stem>.strings.npy
+# (name table) and <stem>.json (source fingerprint and column order), all next to the CSV.
+# =============================
+def _cache_paths(csv_path):
+    csv_path = pathlib.Path(csv_path)
+    cache = csv_path.parent / ".cache"
+    return cache / f"{csv_path.stem}.elements.npy", cache / f"{csv_path.stem}.strings.npy", cache / f"{csv_path.stem}.json"
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Parse the CSV once and write the compiled files
+def compile_catalog(csv_path):
+    elements_path, strings_path, meta_path = _cache_paths(csv_path)
+    elements_path.parent.mkdir(exist_ok=True)
+    frame = pd.read_csv(csv_path)
+
+    elements = np.empty(len(frame), dtype=NUMERIC_FIELDS)
+    for name, _ in NUMERIC_FIELDS:
+        elements[name] = frame[name].to_numpy()
+    text = {name: frame[name].astype(str).to_numpy() for name in STRING_FIELDS}
+    strings = np.empty(len(frame), dtype=[(name, f"U{max(1, max(map(len, values), default=1))}") for name, values in text.items()])
+    for name, values in text.items():
+        strings[name] = values
+
+    stat = os.stat(csv_path)
+    meta = {
+        "format": FORMAT_VERSION,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": _sha256(csv_path),
+        "columns": list(frame.columns),
+    }
+    # Write the data first and the fingerprint last, so a crash never leaves a valid-looking cache
+    np.save(elements_path, elements)
+    np.save(strings_path, strings)
+    meta_path.write_text(json.dumps(meta))
+    return meta
+
+# The compiled files are current if the CSV's mtime and size are unchanged, or, when the mtime
+# moved (e.g. a re-download of identical data), if its content hash still matches
+def _is_current(csv_path, meta_path):
+    if not meta_path.exists():
+        return False
+    meta = json.loads(meta_path.read_text())
+    if meta.get("format") != FORMAT_VERSION:
+        return False
+    stat = os.stat(csv_path)
+    if meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+        return True
+    if meta["size"] == stat.st_size and meta["sha256"] == _sha256(csv_path):
+        meta["mtime_ns"] = stat.st_mtime_ns
+        meta_path.write_text(json.dumps(meta))
+        return True
+    return False
+
+# sha256 of a catalog CSV as its compiled cache records it, compiling it first when needed
+def fingerprint(csv_path):
+    _, _, meta_path = _cache_paths(csv_path)
+    if not _is_current(csv_path, meta_path):
+        compile_catalog(csv_path)
+    return json.loads(meta_path.read_text())["sha256"]
+
+# Memory-mapped structured arrays for a catalog CSV, compiling them first when needed
+def load_compiled(csv_path):
+    elements_path, strings_path, meta_path = _cache_paths(csv_path)
+    if not _is_current(csv_path, meta_path):
+        compile_catalog(csv_path)
+    meta = json.loads(meta_path.read_text())
+    elements = np.load(elements_path, mmap_mode="r")
+    strings = np.load(strings_path, mmap_mode="r")
+    return elements, strings, meta["columns"]
+
+# Drop-in replacement for pd.read_csv() on a catalog file, served from the compiled cache.
+# Numeric columns are read straight from the memory map; only the name table is decoded
+def read_catalog(csv_path):
+    elements, strings, columns = load_compiled(csv_path)
+    data = {}
+    for name in columns:
+        if name in elements.dtype.names:
+            data[name] = elements[name]
+        else:
+            data[name] = strings[name].astype(object)
+    return pd.DataFrame(data, columns=columns)
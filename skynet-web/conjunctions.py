@@ -0,0 +1,235 @@
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from .propagation import DAY_S, WindowClock
+from .sharded import propagator_for
+
+# Encounters closer than this (km) are reported
+SCREEN_DISTANCE_KM = float(os.environ.get("SKYNET_SCREEN_KM", 5.0))
+# Time between screening samples, in seconds. Hash cells grow with it (see _reach)
+SCREEN_STEP = 20.0
+# Samples propagated per SatrecArray call
+BATCH_SAMPLES = 32
+# Newton steps on the time of closest approach
+TCA_ITERATIONS = 4
+# Escape speed at the surface (km/s). Faster states come from elements propagated far from
+# their epoch, which SGP4 does not always flag, and are dropped like failed ones
+MAX_SPEED_KM_S = 11.2
+# Slack on the linear prefilter for the curvature of the relative path over half a step
+CURVATURE_MARGIN_KM = 1.0
+# Window screened for the globe, in seconds, and how long its result is reused
+UPCOMING_SPAN = 2 * 3600.0
+UPCOMING_REUSE = 600.0
+
+# Offset and width of each packed cell coordinate in the 63-bit hash key
+_CELL_OFFSET = 1 << 20
+_CELL_LIMIT = (1 << 21) - 1
+
+@dataclass(frozen=True)
+class Encounters:
+    """Close approaches, one entry per pair and encounter, ranked by miss distance."""
+    rows_a: np.ndarray
+    rows_b: np.ndarray
+    ids_a: np.ndarray
+    ids_b: np.ndarray
+    tt: np.ndarray
+    miss_km: np.ndarray
+    speed_km_s: np.ndarray
+
+    def __len__(self):
+        return len(self.rows_a)
+
+    # Event times as a Skyfield Time array
+    def times(self, ts):
+        return ts.tt_jd(self.tt)
+
+# =============================
+# Spatial hash: positions are bucketed into cubes of side `reach`, so any two points closer
+# than `reach` sit in the same or neighbouring cubes. Only those pairs are ever compared.
+# =============================
+def _cell_keys(cells):
+    cells = np.clip(cells + _CELL_OFFSET, 1, _CELL_LIMIT - 1)
+    return (cells[:, 0] << 42) + (cells[:, 1] << 21) + cells[:, 2]
+
+# Half of the 26 neighbouring cubes, so each pair of cells is visited once
+_NEIGHBOURS = np.array([
+    (dx << 42) + (dy << 21) + dz
+    for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+    if (dx, dy, dz) > (0, 0, 0)
+], dtype=np.int64)
+
+# Each source paired with the sorted positions first .. first + count - 1, flattened
+def _expand(source, first, count):
+    partner = np.repeat(first - np.cumsum(count) + count, count) + np.arange(count.sum())
+    return np.repeat(source, count), partner
+
+def candidate_pairs(r, reach):
+    """Index pairs (i < j) of finite positions r (n, 3) that are within `reach` of each other or close to it."""
+    finite = np.flatnonzero(np.isfinite(r).all(axis=1))
+    keys = _cell_keys(np.floor(r[finite] / reach).astype(np.int64))
+    order = np.argsort(keys, kind="stable")
+    cells, start, count = np.unique(keys[order], return_index=True, return_counts=True)
+    cell_of = np.repeat(np.arange(len(cells)), count)
+    position = np.arange(len(order))
+
+    # Neighbouring cubes are looked up once per occupied cube, all offsets in one search
+    target = (cells[:, None] + _NEIGHBOURS[None, :]).ravel()
+    found = np.minimum(np.searchsorted(cells, target), len(cells) - 1)
+    hit = cells[found] == target
+    neighbour_first = np.where(hit, start[found], 0).reshape(len(cells), -1)
+    neighbour_count = np.where(hit, count[found], 0).reshape(len(cells), -1)
+
+    # Same cube: each point pairs with the ones after it in its cube
+    source, partner = _expand(
+        np.concatenate([position, np.repeat(position, len(_NEIGHBOURS))]),
+        np.concatenate([position + 1, neighbour_first[cell_of].ravel()]),
+        np.concatenate([start[cell_of] + count[cell_of] - position - 1, neighbour_count[cell_of].ravel()]),
+    )
+    i = finite[order[source]]
+    j = finite[order[partner]]
+    return np.minimum(i, j), np.maximum(i, j)
+
+# Largest separation at a sample for which a pair can still come within `threshold` before
+# the neighbouring samples: relative speed is at most twice the fastest object's speed
+def _reach(r, v, threshold, step):
+    speed = np.linalg.norm(v[np.isfinite(r).all(axis=1)], axis=1)
+    return threshold + CURVATURE_MARGIN_KM + np.max(speed, initial=0.0) * step
+
+# Time offset (clipped to +-half a step) and distance of closest approach on straight lines
+def _linear_approach(dr, dv, step):
+    dv2 = np.einsum("ij,ij->i", dv, dv)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(dv2 > 0, -np.einsum("ij,ij->i", dr, dv) / dv2, 0.0)
+    t = np.clip(t, -step / 2, step / 2)
+    return t, np.linalg.norm(dr + dv * t[:, None], axis=1)
+
+# =============================
+# Detection over one range of samples: batched propagation, a spatial hash per sample and a
+# straight-line prefilter on the candidate pairs. Returns every (i, j, time, linear miss)
+# that passes.
+# =============================
+def _detect(propagator, ids, clock, samples, threshold, step):
+    found_i, found_j, found_t, found_miss = [], [], [], []
+    for first in range(0, len(samples), BATCH_SAMPLES):
+        batch = samples[first:first + BATCH_SAMPLES]
+        jd, fr_utc, _ = clock.args(batch)
+        e, r, v = propagator.propagate_teme(jd, fr_utc)
+        # Decayed or otherwise failed objects drop out of the screen
+        r[(e != 0) | (np.linalg.norm(v, axis=2) > MAX_SPEED_KM_S)] = np.nan
+        for k, seconds in enumerate(batch):
+            r_k = np.ascontiguousarray(r[:, k])
+            v_k = np.ascontiguousarray(v[:, k])
+            i, j = candidate_pairs(r_k, _reach(r_k, v_k, threshold, step))
+            dr = r_k[j] - r_k[i]
+            dv = v_k[j] - v_k[i]
+            t, miss = _linear_approach(dr, dv, step)
+            # The same object listed in two groups, and docked vehicles flying on their
+            # host's elements, are not encounters
+            close = (miss < threshold + CURVATURE_MARGIN_KM) & (ids[i] != ids[j]) & (dr != 0).any(axis=1)
+            found_i.append(i[close])
+            found_j.append(j[close])
+            found_t.append(seconds + t[close])
+            found_miss.append(miss[close])
+
+    i = np.concatenate(found_i) if found_i else np.empty(0, dtype=np.int64)
+    j = np.concatenate(found_j) if found_j else np.empty(0, dtype=np.int64)
+    t = np.concatenate(found_t) if found_t else np.empty(0)
+    miss = np.concatenate(found_miss) if found_miss else np.empty(0)
+    return i, j, t, miss
+
+# Newton iterations on the time of closest approach of pairs (i, j) detected near t, with full
+# SGP4 states. Returns the refined times, miss distances and relative speeds
+def _refine(propagator, clock, i, j, t, seconds_total, step):
+    def relative_state(t):
+        jd, fr_utc, _ = clock.args(np.concatenate([t, t]))
+        e, r, v = propagator.propagate_pairs(np.concatenate([i, j]), jd, fr_utc)
+        failed = (e[:len(i)] != 0) | (e[len(i):] != 0)
+        return r[len(i):] - r[:len(i)], v[len(i):] - v[:len(i)], failed
+
+    # Approaches are searched within a step of their detection and inside the window, so slow
+    # pairs whose true closest point lies outside it report their closest point within it
+    lo, hi = np.maximum(t - step, 0.0), np.minimum(t + step, seconds_total)
+    for _ in range(TCA_ITERATIONS):
+        dr, dv, failed = relative_state(t)
+        dv2 = np.einsum("ij,ij->i", dv, dv)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(t - np.where(dv2 > 0, np.einsum("ij,ij->i", dr, dv) / dv2, 0.0), lo, hi)
+    dr, dv, failed = relative_state(t)
+    miss = np.where(failed, np.nan, np.linalg.norm(dr, axis=1))
+    return t, miss, np.linalg.norm(dv, axis=1)
+
+# One entry per pair and encounter: the same approach is seen from several samples (and from
+# both sides of a batch boundary), so detections of a pair less than a step apart are merged.
+# Returns the index of the closest detection of each encounter
+def _closest_per_encounter(i, j, t, miss, step):
+    order = np.lexsort((t, j, i))
+    i, j, t = i[order], j[order], t[order]
+    new = np.ones(len(i), dtype=bool)
+    new[1:] = (i[1:] != i[:-1]) | (j[1:] != j[:-1]) | (t[1:] - t[:-1] > step)
+    group = np.cumsum(new) - 1
+    ranked = np.lexsort((miss[order], group))
+    first = np.ones(len(ranked), dtype=bool)
+    first[1:] = group[ranked[1:]] != group[ranked[:-1]]
+    return order[ranked[first]]
+
+# =============================
+# Public API: every approach closer than `threshold` km between catalog objects between
+# Skyfield Times `start` and `end`, ranked by miss distance.
+# =============================
+def screen_conjunctions(catalog, start, end, threshold=SCREEN_DISTANCE_KM, step=SCREEN_STEP):
+    clock = WindowClock(start)
+    seconds_total = float((end.tt - start.tt) * DAY_S)
+    samples = np.arange(0.0, seconds_total + step / 2, step)
+
+    # Large catalogs are propagated on the shared workers (see sharded.py); the spatial hash
+    # needs every object at each sample, so it runs here
+    with propagator_for(catalog) as propagator:
+        i, j, t, miss = _detect(propagator, catalog.ids, clock, samples, threshold, step)
+
+    # Only the closest straight-line detection of each approach is refined
+    best = _closest_per_encounter(i, j, t, miss, step)
+    i, j = i[best], j[best]
+    t, miss, speed = _refine(catalog.propagator, clock, i, j, t[best], seconds_total, step)
+    keep = (miss < threshold) & (t >= 0) & (t <= seconds_total)
+    i, j, t, miss, speed = i[keep], j[keep], t[keep], miss[keep], speed[keep]
+    order = np.argsort(miss, kind="stable")
+    return Encounters(
+        rows_a=i[order],
+        rows_b=j[order],
+        ids_a=catalog.ids[i[order]],
+        ids_b=catalog.ids[j[order]],
+        tt=clock.tt_jd(t[order]),
+        miss_km=miss[order],
+        speed_km_s=speed[order],
+    )
+
+# =============================
+# Screening of the next UPCOMING_SPAN for the globe, shared by every session: one screen per
+# catalog version, reused for UPCOMING_REUSE seconds. Without sharding it runs in the calling
+# thread, in SGP4 calls capped at propagation.MAX_CALL_WORK, so the app's to_thread() call
+# leaves the event loop free in between.
+# =============================
+class UpcomingConjunctions:
+    """The last screen of the upcoming window, recomputed when stale."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key = None
+        self._tt = None
+        self._result = None
+
+    def get(self, catalog, t, threshold=SCREEN_DISTANCE_KM):
+        with self._lock:
+            key = (catalog.version, threshold)
+            fresh = self._key == key and (float(t.tt) - self._tt) * DAY_S < UPCOMING_REUSE
+            if not fresh:
+                end = t.ts.tt_jd(t.tt + UPCOMING_SPAN / DAY_S)
+                self._result = screen_conjunctions(catalog, t, end, threshold)
+                self._key = key
+                self._tt = float(t.tt)
+            return self._result
+
+upcoming = UpcomingConjunctions()
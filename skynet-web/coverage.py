@@ -0,0 +1,185 @@
+import collections
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from .propagation import WindowClock, itrs_to_geodetic, teme_to_itrs
+from .sharded import propagator_for
+from .ticker import HISTORY
+
+# Ground cells are squares of this many degrees of latitude and longitude (SKYNET_COVERAGE_CELL_DEGREES overrides)
+COVERAGE_CELL_DEGREES = float(os.environ.get("SKYNET_COVERAGE_CELL_DEGREES", "3"))
+# A cell is covered by the satellites it sees at least this high, in degrees (SKYNET_COVERAGE_MIN_ELEVATION overrides)
+COVERAGE_MIN_ELEVATION = float(os.environ.get("SKYNET_COVERAGE_MIN_ELEVATION", "10"))
+# Time-averaged coverage: hours from the start of the current hour, sampled every AVERAGE_STEP_MINUTES
+AVERAGE_HOURS = float(os.environ.get("SKYNET_COVERAGE_AVERAGE_HOURS", "24"))
+AVERAGE_STEP_MINUTES = 10.0
+# Samples propagated per SGP4 call of an averaged run, which bounds its memory
+AVERAGE_CHUNK_SAMPLES = 16
+# Coverage grids kept: per snapshot and filter, and averaged runs
+GRIDS_KEPT = 4 * HISTORY
+AVERAGES_KEPT = 8
+
+# Mean Earth radius in km; footprints are computed on a sphere
+EARTH_RADIUS_KM = 6371.0
+
+@dataclass(frozen=True)
+class Grid:
+    """Equal-angle ground cells, `rows` of latitude from the south pole by `cols` of longitude from -180°."""
+    rows: int
+    cols: int
+
+    @classmethod
+    def of(cls, cell_degrees):
+        rows = max(1, int(round(180.0 / cell_degrees)))
+        return cls(rows, 2 * rows)
+
+    @property
+    def cell(self):
+        return 180.0 / self.rows
+
+    # Cell center latitudes and longitudes in degrees
+    @property
+    def lat(self):
+        return -90.0 + self.cell * (np.arange(self.rows) + 0.5)
+
+    @property
+    def lon(self):
+        return -180.0 + self.cell * (np.arange(self.cols) + 0.5)
+
+GRID = Grid.of(COVERAGE_CELL_DEGREES)
+
+def footprint_radii(alt, min_elevation=COVERAGE_MIN_ELEVATION):
+    """Earth central angle (radians) around each subpoint from which an object at altitude alt
+    (km) is at least min_elevation degrees high; nan for objects below the surface."""
+    elevation = np.radians(min_elevation)
+    with np.errstate(invalid="ignore"):
+        return np.arccos(EARTH_RADIUS_KM * np.cos(elevation) / (EARTH_RADIUS_KM + np.asarray(alt, dtype=float))) - elevation
+
+# =============================
+# Coverage counts: every object adds one to the cells its footprint (a spherical cap)
+# reaches, one longitude interval per grid row the cap spans. The intervals go into a
+# difference array, so an object costs a couple of entries per row under its footprint and
+# the grid comes out of one cumulative sum, whatever the number of objects.
+# =============================
+def coverage_counts(lat, lon, alt, grid=GRID, min_elevation=COVERAGE_MIN_ELEVATION):
+    """(rows x cols) number of objects each cell center sees at or above min_elevation."""
+    radius = footprint_radii(alt, min_elevation)
+    keep = np.isfinite(radius) & (radius > 0) & np.isfinite(lat) & np.isfinite(lon)
+    phi = np.radians(np.asarray(lat, dtype=float)[keep])
+    lam = np.radians(np.asarray(lon, dtype=float)[keep])
+    radius = radius[keep]
+    cell = np.radians(grid.cell)
+
+    # Grid rows whose center latitude is within the footprint
+    first = np.maximum(np.ceil((phi - radius + np.pi / 2) / cell - 0.5), 0).astype(np.int64)
+    last = np.minimum(np.floor((phi + radius + np.pi / 2) / cell - 0.5), grid.rows - 1).astype(np.int64)
+    span = np.maximum(last - first + 1, 0)
+    owner = np.repeat(np.arange(len(phi)), span)
+    row = first[owner] + np.arange(len(owner)) - np.repeat(np.cumsum(span) - span, span)
+
+    # Half-width in longitude of the footprint along each row (spherical law of cosines);
+    # rows the cap wraps all the way around get the whole circle
+    row_lat = np.radians(grid.lat)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cosine = (np.cos(radius)[owner] - np.sin(row_lat)[row] * np.sin(phi)[owner]) / (np.cos(row_lat)[row] * np.cos(phi)[owner])
+    half = np.arccos(np.clip(np.nan_to_num(cosine, nan=1.0, posinf=1.0, neginf=-1.0), -1.0, 1.0))
+    start = np.ceil((lam[owner] - half + np.pi) / cell - 0.5).astype(np.int64)
+    stop = np.floor((lam[owner] + half + np.pi) / cell - 0.5).astype(np.int64) + 1
+    width = np.clip(stop - start, 0, grid.cols)
+
+    # Intervals run over two turns of longitude, folded back onto one after the sum
+    start %= grid.cols
+    size = grid.rows * 2 * grid.cols
+    offsets = row * 2 * grid.cols
+    diff = np.bincount(offsets + start, minlength=size + 1) - np.bincount(offsets + start + width, minlength=size + 1)
+    counts = np.cumsum(diff[:size].reshape(grid.rows, 2 * grid.cols), axis=1)
+    return (counts[:, :grid.cols] + counts[:, grid.cols:]).astype(np.int32)
+
+def coverage_stats(values, grid=GRID):
+    """Share of the ground, by area, whose cells see at least one object, and the area-weighted
+    mean number of objects in view."""
+    values = np.asarray(values)
+    weights = np.broadcast_to(np.cos(np.radians(grid.lat))[:, None], (grid.rows, grid.cols))
+    return float(weights[values >= 1].sum() / weights.sum()), float((weights * values).sum() / weights.sum())
+
+# =============================
+# Per-tick coverage of a ticker snapshot, shared by every session showing the same filtered
+# set and kept as long as the ticker keeps the snapshot.
+# =============================
+_lock = threading.Lock()
+_grids = collections.OrderedDict()
+
+def counts_for(snapshot, mask=None):
+    """coverage_counts() of a ticker snapshot's objects, limited to the rows set in mask."""
+    key = (id(snapshot), None if mask is None else hash(np.packbits(mask).tobytes()))
+    with _lock:
+        entry = _grids.get(key)
+        if entry is not None and entry[0] is snapshot:
+            _grids.move_to_end(key)
+            return entry[1]
+    if mask is None:
+        counts = coverage_counts(snapshot.lat, snapshot.lon, snapshot.alt)
+    else:
+        counts = coverage_counts(snapshot.lat[mask], snapshot.lon[mask], snapshot.alt[mask])
+    counts.flags.writeable = False
+    with _lock:
+        # Holding the snapshot keeps its id from being reused while the entry exists
+        _grids[key] = (snapshot, counts)
+        while len(_grids) > GRIDS_KEPT:
+            _grids.popitem(last=False)
+    return counts
+
+# =============================
+# Time-averaged coverage: the catalog is propagated over the window a chunk of samples at a
+# time, on the propagation worker pool (each worker covers its shard of the catalog and
+# returns summed counts), and the sums are averaged. With a single worker it all runs in the
+# calling thread, in SGP4 calls capped at propagation.MAX_CALL_WORK, so the app's to_thread()
+# call leaves the event loop free in between.
+# =============================
+def _summed_counts(propagator, lo, hi, rows, jd, fr_utc, fr_ut1, grid, min_elevation):
+    """Sum over the samples of the coverage by the given catalog rows that fall in [lo, hi),
+    with propagator holding the catalog rows lo .. hi - 1."""
+    rows = np.asarray(rows)
+    rows = rows[(rows >= lo) & (rows < hi)] - lo
+    total = np.zeros((grid.rows, grid.cols), dtype=np.int64)
+    if not len(rows):
+        return total
+    for first in range(0, len(jd), AVERAGE_CHUNK_SAMPLES):
+        chunk = slice(first, first + AVERAGE_CHUNK_SAMPLES)
+        samples = len(jd[chunk])
+        e, r, _ = propagator.propagate_teme(jd[chunk], fr_utc[chunk])
+        r[e != 0] = np.nan
+        lat, lon, alt = itrs_to_geodetic(teme_to_itrs(r[rows], jd[chunk], fr_ut1[chunk]))
+        for k in range(samples):
+            total += coverage_counts(lat[:, k], lon[:, k], alt[:, k], grid, min_elevation)
+    return total
+
+_average_lock = threading.Lock()
+_averages = collections.OrderedDict()
+
+def average_for(catalog, rows, t, hours=AVERAGE_HOURS, step_minutes=AVERAGE_STEP_MINUTES):
+    """Mean coverage_counts() of the given catalog rows over `hours` from the start of the hour of
+    Skyfield Time t. Runs are shared by sessions asking for the same catalog, rows and hour."""
+    start = t.ts.tt_jd(np.floor(t.tt * 24.0) / 24.0)
+    rows = np.asarray(rows, dtype=np.int64)
+    key = (catalog.version, hash(rows.tobytes()), float(start.tt), hours, step_minutes, GRID, COVERAGE_MIN_ELEVATION)
+    with _average_lock:
+        average = _averages.get(key)
+        if average is not None:
+            _averages.move_to_end(key)
+            return average
+
+    seconds = np.arange(0.0, hours * 3600.0, step_minutes * 60.0)
+    jd, fr_utc, fr_ut1 = WindowClock(start).args(seconds)
+    with propagator_for(catalog, min_objects=0) as propagator:
+        parts = propagator.map_shards(_summed_counts, rows, jd, fr_utc, fr_ut1, GRID, COVERAGE_MIN_ELEVATION)
+    average = sum(parts, np.zeros((GRID.rows, GRID.cols), dtype=np.int64)) / max(1, len(seconds))
+    average.flags.writeable = False
+    with _average_lock:
+        _averages[key] = average
+        while len(_averages) > AVERAGES_KEPT:
+            _averages.popitem(last=False)
+    return average
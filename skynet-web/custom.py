@@ -0,0 +1,303 @@
+import collections
+import hashlib
+import io
+import json
+import os
+import pathlib
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sgp4 import omm
+
+from .catalog import _EPOCH0, _NDDOT_UNITS, _NDOT_UNITS, satrecs_from_elements
+from .filters import FilterIndex
+from .ingest import CUSTOM_ID_START, db_rows
+from .models import db
+from .propagation import CatalogPropagator
+
+# OMM columns of a custom element set, in catalog CSV order
+COLUMNS = [
+    "OBJECT_NAME", "OBJECT_ID", "EPOCH", "MEAN_MOTION", "ECCENTRICITY", "INCLINATION",
+    "RA_OF_ASC_NODE", "ARG_OF_PERICENTER", "MEAN_ANOMALY", "EPHEMERIS_TYPE", "CLASSIFICATION_TYPE",
+    "NORAD_CAT_ID", "ELEMENT_SET_NO", "REV_AT_EPOCH", "BSTAR", "MEAN_MOTION_DOT", "MEAN_MOTION_DDOT",
+]
+# Columns every record must have; the rest default to these values
+REQUIRED = ["EPOCH", "MEAN_MOTION", "ECCENTRICITY", "INCLINATION", "RA_OF_ASC_NODE", "ARG_OF_PERICENTER", "MEAN_ANOMALY"]
+DEFAULTS = {
+    "OBJECT_NAME": "",
+    "OBJECT_ID": "",
+    "EPHEMERIS_TYPE": 0,
+    "CLASSIFICATION_TYPE": "U",
+    "NORAD_CAT_ID": 0,
+    "ELEMENT_SET_NO": 999,
+    "REV_AT_EPOCH": 0,
+    "BSTAR": 0.0,
+    "MEAN_MOTION_DOT": 0.0,
+    "MEAN_MOTION_DDOT": 0.0,
+}
+# Custom satellites are numbered from CUSTOM_ID_START + 1 up to the largest NORAD id SGP4 takes
+CUSTOM_ID_END = 339999
+# SQLite's default limit of bound parameters per statement (3.32+); each multi-row INSERT
+# carries as many rows as fit under it
+MAX_BIND_PARAMETERS = 32766
+# Sessions whose custom propagators and filter indexes are kept built, least recently used
+# out first (SKYNET_CUSTOM_SETS_KEPT overrides)
+CUSTOM_SETS_KEPT = int(os.environ.get("SKYNET_CUSTOM_SETS_KEPT", "64"))
+
+@dataclass(frozen=True)
+class CustomImport:
+    """Custom satellites stored by one import, and the records that were turned away."""
+    elements: pd.DataFrame
+    satrecs: list
+    # (record, reason) for every rejected record
+    rejected: list
+
+    def __len__(self):
+        return len(self.elements)
+
+@dataclass(frozen=True)
+class CustomSet:
+    """A session's custom satellites, built from their element rows: propagator, filter index
+    (import groups as types), names and ids, row for row."""
+    propagator: CatalogPropagator
+    index: FilterIndex
+    names: np.ndarray
+    ids: np.ndarray
+
+# =============================
+# Readers: TLE (two- or three-line), OMM CSV, OMM JSON and OMM XML, each to a frame of OMM
+# columns as strings or numbers. Unreadable files raise ValueError.
+# =============================
+def _checksum_ok(line):
+    return line[68:69].isdigit() and sum(int(c) if c.isdigit() else c == "-" for c in line[:68]) % 10 == int(line[68])
+
+# "12345-3" (assumed leading decimal point, signed exponent) -> 0.12345e-3
+def _assumed_decimal(field):
+    field = field.strip()
+    if not field:
+        return 0.0
+    sign = -1.0 if field[0] == "-" else 1.0
+    mantissa, exponent = field.lstrip("+-")[:-2], field[-2:]
+    return sign * float(f"0.{mantissa}e{exponent}")
+
+def _tle_row(name, line1, line2):
+    if len(line1) < 69 or len(line2) < 69 or line1[0] != "1" or line2[0] != "2":
+        raise ValueError("not a two-line element set")
+    if not (_checksum_ok(line1) and _checksum_ok(line2)):
+        raise ValueError("checksum mismatch")
+    year = int(line1[18:20])
+    year += 1900 if year >= 57 else 2000
+    epoch = pd.Timestamp(year=year, month=1, day=1) + pd.to_timedelta(float(line1[20:32]) - 1.0, unit="D")
+    designator = line1[9:17].strip()
+    if designator:
+        launch = int(designator[:2])
+        designator = f"{launch + (1900 if launch >= 57 else 2000)}-{designator[2:]}"
+    return {
+        "OBJECT_NAME": name or f"TLE {line1[2:7].strip()}",
+        "OBJECT_ID": designator,
+        "EPOCH": epoch.isoformat(),
+        "MEAN_MOTION": float(line2[52:63]),
+        "ECCENTRICITY": float(f"0.{line2[26:33].strip()}"),
+        "INCLINATION": float(line2[8:16]),
+        "RA_OF_ASC_NODE": float(line2[17:25]),
+        "ARG_OF_PERICENTER": float(line2[34:42]),
+        "MEAN_ANOMALY": float(line2[43:51]),
+        "EPHEMERIS_TYPE": int(line1[62].strip() or 0),
+        "CLASSIFICATION_TYPE": line1[7].strip() or "U",
+        "ELEMENT_SET_NO": int(line1[64:68].strip() or 0),
+        "REV_AT_EPOCH": int(line2[63:68].strip() or 0),
+        "BSTAR": _assumed_decimal(line1[53:61]),
+        "MEAN_MOTION_DOT": float(line1[33:43]),
+        "MEAN_MOTION_DDOT": _assumed_decimal(line1[44:52]),
+    }
+
+# Element sets from TLE text; a line before line 1 is the object's name ("0 " prefix optional)
+def read_tle(text):
+    lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+    rows, rejected = [], []
+    name = ""
+    k = 0
+    while k < len(lines):
+        if lines[k].startswith("1 ") and k + 1 < len(lines):
+            try:
+                rows.append(_tle_row(name, lines[k], lines[k + 1]))
+            except ValueError as error:
+                rejected.append((name or lines[k][2:7].strip(), str(error)))
+            name = ""
+            k += 2
+        else:
+            name = lines[k][2:].strip() if lines[k].startswith("0 ") else lines[k].strip()
+            k += 1
+    return pd.DataFrame(rows), rejected
+
+def read_elements(filename, data):
+    """OMM frame and early rejections from one uploaded file, by extension."""
+    suffix = pathlib.Path(filename).suffix.lower()
+    try:
+        if suffix in (".tle", ".txt", ".3le", ".2le"):
+            return read_tle(data.decode("utf-8-sig"))
+        if suffix == ".csv":
+            return pd.read_csv(io.BytesIO(data), dtype=str), []
+        if suffix == ".json":
+            records = json.loads(data)
+            return pd.DataFrame(records if isinstance(records, list) else [records]), []
+        if suffix == ".xml":
+            return pd.DataFrame(list(omm.parse_xml(io.BytesIO(data)))), []
+    except Exception as error:
+        # Undecodable text, CSV/JSON/XML syntax errors and OMM segments missing their sections
+        raise ValueError(f"unreadable ({type(error).__name__}: {error})") from error
+    raise ValueError("unsupported file type (expected TLE, OMM CSV, JSON or XML)")
+
+# One custom element set from the Add Satellite form, whose fields are in Satrec.sgp4init()
+# units (radians, radians/minute, days since 1949 December 31)
+def form_elements(form_data):
+    values = {key: float(form_data[key]) for key in ("epoch", "no_kozai", "ecco", "inclo", "nodeo", "argpo", "mo", "bstar", "ndot", "nddot")}
+    return pd.DataFrame([{
+        "OBJECT_NAME": form_data["name"],
+        "EPOCH": (pd.Timestamp(_EPOCH0) + pd.to_timedelta(values["epoch"], unit="D")).isoformat(),
+        "MEAN_MOTION": values["no_kozai"] * 720.0 / np.pi,
+        "ECCENTRICITY": values["ecco"],
+        "INCLINATION": np.degrees(values["inclo"]),
+        "RA_OF_ASC_NODE": np.degrees(values["nodeo"]),
+        "ARG_OF_PERICENTER": np.degrees(values["argpo"]),
+        "MEAN_ANOMALY": np.degrees(values["mo"]),
+        "BSTAR": values["bstar"],
+        "MEAN_MOTION_DOT": values["ndot"] * _NDOT_UNITS,
+        "MEAN_MOTION_DDOT": values["nddot"] * _NDDOT_UNITS,
+    }])
+
+# =============================
+# Validation: whole-column type conversion and range checks, one reason per rejected record.
+# =============================
+def validate(elements):
+    """Typed OMM frame of the acceptable records, and (record, reason) for the rest."""
+    missing = [col for col in REQUIRED if col not in elements.columns]
+    if missing:
+        raise ValueError(f"missing OMM fields: {', '.join(missing)}")
+    frame = elements.reindex(columns=COLUMNS).reset_index(drop=True)
+    for col, default in DEFAULTS.items():
+        frame[col] = frame[col].fillna(default)
+    numeric = [col for col in COLUMNS if col not in ("OBJECT_NAME", "OBJECT_ID", "EPOCH", "CLASSIFICATION_TYPE")]
+    for col in numeric:
+        frame[col] = pd.to_numeric(frame[col], errors="coerce")
+    epoch = pd.to_datetime(frame["EPOCH"], format="ISO8601", errors="coerce", utc=True).dt.tz_localize(None)
+
+    checks = [
+        (epoch.isna(), "EPOCH is not a date"),
+        (frame[numeric].isna().any(axis=1), "non-numeric element"),
+        (~(frame["MEAN_MOTION"] > 0), "MEAN_MOTION must be positive"),
+        (~frame["ECCENTRICITY"].between(0.0, 1.0, inclusive="left"), "ECCENTRICITY must be in [0, 1)"),
+        (~frame["INCLINATION"].between(0.0, 180.0), "INCLINATION must be in [0, 180] degrees"),
+    ]
+    reason = pd.Series(None, index=frame.index, dtype=object)
+    for failed, message in checks:
+        reason = reason.where(reason.notna() | ~failed, message)
+
+    bad = reason.notna().to_numpy()
+    rejected = list(zip(frame["OBJECT_NAME"][bad].astype(str).tolist(), reason[bad].tolist()))
+    frame = frame[~bad].copy()
+    frame["EPOCH"] = epoch[~bad].dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    for col in ("EPHEMERIS_TYPE", "NORAD_CAT_ID", "ELEMENT_SET_NO", "REV_AT_EPOCH"):
+        frame[col] = frame[col].astype(np.int64)
+    frame["OBJECT_NAME"] = frame["OBJECT_NAME"].astype(str)
+    frame["OBJECT_ID"] = frame["OBJECT_ID"].astype(str)
+    frame["CLASSIFICATION_TYPE"] = frame["CLASSIFICATION_TYPE"].astype(str)
+    return frame.reset_index(drop=True), rejected
+
+# Multi-row INSERTs of db_rows() through the DB-API driver, in the session's transaction.
+# sqlalchemy.insert().values(rows) builds the same statement but compiles a bind object per
+# value, which costs about half a millisecond per row
+def _insert_rows(session, rows):
+    if not rows:
+        return
+    table = db.__table__
+    connection = session.connection()
+    dialect = connection.dialect
+    cols = list(rows[0])
+    # Values converted the way SQLAlchemy binds them (e.g. DateTime to SQLite's text form)
+    columns = []
+    for col in cols:
+        values = [row[col] for row in rows]
+        process = table.c[col].type.bind_processor(dialect)
+        columns.append([process(value) for value in values] if process else values)
+    records = list(zip(*columns))
+
+    placeholder = "?" if dialect.paramstyle == "qmark" else "%s"
+    row_sql = "(" + ", ".join([placeholder] * len(cols)) + ")"
+    per_insert = max(1, MAX_BIND_PARAMETERS // len(cols))
+    for start in range(0, len(records), per_insert):
+        chunk = records[start:start + per_insert]
+        connection.exec_driver_sql(
+            f"INSERT INTO db ({', '.join(cols)}) VALUES {', '.join([row_sql] * len(chunk))}",
+            tuple(value for record in chunk for value in record),
+        )
+
+# =============================
+# Import: validate, number, initialize and store a batch of custom element sets in the
+# caller's transaction. Satrecs are initialized in one pass over whole columns, and the rows
+# go out as multi-row INSERTs of up to MAX_BIND_PARAMETERS values each.
+# =============================
+def import_custom(session, elements, rejected=()):
+    """Store the valid records of an OMM frame as new custom satellites."""
+    elements, invalid = validate(elements)
+    rejected = [*rejected, *invalid]
+
+    table = db.__table__
+    last = session.execute(sqlalchemy.select(sqlalchemy.func.max(table.c.id)).where(table.c.id > CUSTOM_ID_START)).scalar()
+    first = (last or CUSTOM_ID_START) + 1
+    if first + len(elements) - 1 > CUSTOM_ID_END:
+        raise ValueError(f"only {max(0, CUSTOM_ID_END - first + 1)} more custom satellites fit in the NORAD id range")
+    ids = np.arange(first, first + len(elements))
+    elements["NORAD_CAT_ID"] = ids
+    elements["OBJECT_ID"] = elements["OBJECT_ID"].where(elements["OBJECT_ID"] != "", [f"customsat-{norad_id}" for norad_id in ids.tolist()])
+    elements["OBJECT_NAME"] = elements["OBJECT_NAME"].where(elements["OBJECT_NAME"] != "", elements["OBJECT_ID"])
+
+    # sgp4init flags elements it cannot propagate (e.g. perigee below the surface)
+    satrecs = satrecs_from_elements(elements)
+    failed = np.array([satrec.error != 0 for satrec in satrecs], dtype=bool)
+    rejected += [(name, f"SGP4 cannot propagate these elements (error {satrec.error})") for name, satrec, bad in zip(elements["OBJECT_NAME"].tolist(), satrecs, failed) if bad]
+    satrecs = [satrec for satrec, bad in zip(satrecs, failed) if not bad]
+    elements = elements[~failed].reset_index(drop=True)
+
+    _insert_rows(session, db_rows(elements))
+    return CustomImport(elements=elements, satrecs=satrecs, rejected=rejected)
+
+# =============================
+# Custom sets: sessions keep only the element rows of their custom satellites and a digest
+# of them, since Satrec objects and filter indexes do not pickle into session state. The
+# propagator and index are built here on first use and kept per session token and digest.
+# =============================
+_sets_lock = threading.Lock()
+_sets = collections.OrderedDict()
+
+def elements_digest(rows, groups):
+    """Digest of custom element rows (dicts of OMM columns) and their import groups."""
+    return hashlib.blake2b(json.dumps([rows, groups], default=str).encode(), digest_size=8).hexdigest()
+
+def custom_set(token, digest, rows, groups):
+    """The CustomSet of a session's element rows and their import groups."""
+    key = (token, digest)
+    with _sets_lock:
+        found = _sets.get(key)
+        if found is not None:
+            _sets.move_to_end(key)
+            return found
+    elements = pd.DataFrame(rows, columns=COLUMNS)
+    found = CustomSet(
+        propagator=CatalogPropagator(satrecs_from_elements(elements)),
+        index=FilterIndex.from_elements(elements, groups),
+        names=elements["OBJECT_NAME"].to_numpy(dtype=object),
+        ids=elements["NORAD_CAT_ID"].to_numpy(dtype=np.int64),
+    )
+    with _sets_lock:
+        # Earlier sets of the same session are superseded
+        for stale in [other for other in _sets if other[0] == token and other != key]:
+            del _sets[stale]
+        found = _sets.setdefault(key, found)
+        _sets.move_to_end(key)
+        while len(_sets) > CUSTOM_SETS_KEPT:
+            _sets.popitem(last=False)
+    return found
@@ -0,0 +1,241 @@
+import asyncio
+import collections
+import math
+import os
+import threading
+
+import numpy as np
+
+from .propagation import DAY_S, CatalogPropagator, itrs_to_geodetic, teme_to_itrs, time_arrays
+from .sharded import propagator_for
+
+# Sample spacing and window length of the precomputed grid, in seconds
+SAMPLE_STEP = 60.0
+WINDOW_SPAN = 3600.0
+# Memory budget for all cached windows (SKYNET_EPHEMERIS_MB overrides)
+MEMORY_BUDGET = int(float(os.environ.get("SKYNET_EPHEMERIS_MB", "256")) * 1024 * 1024)
+# Start extending into the next window when this close to the end of the current one
+EXTEND_MARGIN = 600.0
+
+# Objects whose interpolation misses SGP4 by more than this at the interval midpoints are
+# propagated directly instead (mostly stale, decaying element sets far outside their validity)
+TOLERANCE_KM = 0.1
+
+# Whole-day Julian date reference the window grid is anchored to
+_GRID_JD = 2451545.0
+
+# Cubic Hermite interpolation of positions (n, 3) at fraction s of the sample interval i,
+# from float32 samples (n, m, 3) step seconds apart
+def _hermite(positions, velocities, i, s, step):
+    s2 = s * s
+    s3 = s2 * s
+    h00 = 2 * s3 - 3 * s2 + 1
+    h10 = s3 - 2 * s2 + s
+    h01 = -2 * s3 + 3 * s2
+    h11 = s3 - s2
+    p0 = positions[:, i].astype(float)
+    p1 = positions[:, i + 1].astype(float)
+    m0 = velocities[:, i].astype(float) * step
+    m1 = velocities[:, i + 1].astype(float) * step
+    return h00 * p0 + h10 * m0 + h01 * p1 + h11 * m1
+
+# Window samples of every object of a propagator from `start` seconds after the grid anchor:
+# float32 positions and velocities (n, count, 3), and each object's largest interpolation error
+# (km) at the interval midpoints, where cubic Hermite error peaks, (inf where SGP4 failed) with
+# the sum of its squared errors. Runs in-process on a batch of objects, or on a shard's worker
+def _window_rows(propagator, lo, hi, start, step, count):
+    seconds = start + step * np.arange(count)
+    e, r, v = propagator.propagate_teme(np.full(count, _GRID_JD), seconds / DAY_S)
+    # float32 keeps sub-meter resolution at orbital radii and halves the footprint
+    positions = r.astype(np.float32)
+    velocities = v.astype(np.float32)
+
+    midpoints = seconds[:-1] + step / 2
+    e_mid, exact, _ = propagator.propagate_teme(np.full(len(midpoints), _GRID_JD), midpoints / DAY_S)
+    errors = np.stack([
+        np.linalg.norm(_hermite(positions, velocities, k, 0.5, step) - exact[:, k], axis=-1)
+        for k in range(len(midpoints))
+    ], axis=1)
+    errors = np.nan_to_num(errors, nan=np.inf)
+    worst = errors.max(axis=1, initial=0.0)
+    worst[(e != 0).any(axis=1) | (e_mid != 0).any(axis=1)] = np.inf
+    return positions, velocities, worst, np.where(np.isfinite(worst), (errors * errors).sum(axis=1), 0.0)
+
+# =============================
+# EphemerisWindow: TEME positions and velocities of a whole catalog on a fixed time grid,
+# filled a batch of objects (or a worker's shard) at a time by EphemerisCache.
+# =============================
+class EphemerisWindow:
+    """One window of precomputed samples for every object of a catalog version."""
+
+    def __init__(self, catalog, index, step=SAMPLE_STEP, span=WINDOW_SPAN):
+        self.version = catalog.version
+        self.index = index
+        self.step = step
+        self.start = index * span
+        self.count = int(round(span / step)) + 1
+        self.positions = np.empty((len(catalog), self.count, 3), dtype=np.float32)
+        self.velocities = np.empty((len(catalog), self.count, 3), dtype=np.float32)
+        self._worst = np.empty(len(catalog))
+        self._squares = np.empty(len(catalog))
+
+    # Arguments of _window_rows() after the rows
+    @property
+    def grid(self):
+        return self.start, self.step, self.count
+
+    def _fill(self, lo, hi, rows):
+        self.positions[lo:hi], self.velocities[lo:hi], self._worst[lo:hi], self._squares[lo:hi] = rows
+
+    # Once every row is filled: objects that failed or miss SGP4 by more than TOLERANCE_KM at
+    # a midpoint are propagated directly at lookup time, exactly as before
+    def _finish(self, catalog):
+        smooth = self._worst <= TOLERANCE_KM
+        self.direct = np.flatnonzero(~smooth)
+        self._direct = CatalogPropagator(catalog.propagator.satrecs[i] for i in self.direct)
+
+        # Measured interpolation error (km) over the interpolated objects
+        midpoints = int(smooth.sum()) * (self.count - 1)
+        self.error_km = {
+            "max": float(self._worst[smooth].max(initial=0.0)),
+            "rms": float(np.sqrt(self._squares[smooth].sum() / midpoints)) if midpoints else 0.0,
+            "interpolated": int(smooth.sum()),
+            "direct": len(self.direct),
+        }
+        del self._worst, self._squares
+        return self
+
+    @property
+    def end(self):
+        return self.start + self.step * (self.count - 1)
+
+    @property
+    def nbytes(self):
+        return self.positions.nbytes + self.velocities.nbytes
+
+    def covers(self, seconds):
+        return self.start <= seconds <= self.end
+
+    # Cubic Hermite interpolation of TEME positions (n, 3) at a grid offset in seconds
+    def interpolate(self, seconds):
+        i = min(int((seconds - self.start) // self.step), self.count - 2)
+        s = (seconds - self.start - i * self.step) / self.step
+        return _hermite(self.positions, self.velocities, i, s, self.step)
+
+    # TEME positions (n, 3) at a grid offset: interpolated, with the direct rows filled in by SGP4
+    def positions_at(self, seconds):
+        r = self.interpolate(seconds)
+        if len(self.direct):
+            _, exact, _ = self._direct.propagate_teme(_GRID_JD, seconds / DAY_S)
+            r[self.direct] = exact[:, 0]
+        return r
+
+# =============================
+# EphemerisCache: LRU of windows under a memory budget. Positions for "now" come from
+# interpolation; windows are built and extended in the background by the ticker. Large
+# catalogs are built on the propagation worker pool (see sharded.py); otherwise a window is
+# built one batch of objects at a time, and the asynchronous build hands each batch to a
+# worker thread in turn, so the event loop runs between batches.
+# =============================
+class EphemerisCache:
+    """Precomputed ephemeris windows keyed by (catalog version, window index)."""
+
+    def __init__(self, budget=MEMORY_BUDGET, step=SAMPLE_STEP, span=WINDOW_SPAN):
+        self.budget = budget
+        self.step = step
+        self.span = span
+        self.hits = 0
+        self.misses = 0
+        self._windows = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(window.nbytes for window in self._windows.values())
+
+    # Seconds since the grid anchor for a Skyfield Time, and the window it falls in
+    def _locate(self, t):
+        jd, fr_utc, fr_ut1 = time_arrays(t)
+        seconds = float(((jd[0] - _GRID_JD) + fr_utc[0]) * DAY_S)
+        return seconds, math.floor(seconds / self.span)
+
+    def _get(self, key):
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None:
+                self._windows.move_to_end(key)
+            return window
+
+    def _put(self, window):
+        with self._lock:
+            self._windows[(window.version, window.index)] = window
+            self._windows.move_to_end((window.version, window.index))
+            total = sum(w.nbytes for w in self._windows.values())
+            while total > self.budget and len(self._windows) > 1:
+                _, evicted = self._windows.popitem(last=False)
+                total -= evicted.nbytes
+
+    # Build the window at index for the catalog unless it is already cached
+    def build(self, catalog, index):
+        window = self._get((catalog.version, index))
+        if window is None:
+            window = EphemerisWindow(catalog, index, self.step, self.span)
+            with propagator_for(catalog) as propagator:
+                if propagator is catalog.propagator:
+                    for lo, hi in propagator.batches():
+                        window._fill(lo, hi, _window_rows(propagator.subset(lo, hi), lo, hi, *window.grid))
+                else:
+                    for (lo, hi), rows in zip(propagator.shards, propagator.map_shards(_window_rows, *window.grid)):
+                        window._fill(lo, hi, rows)
+            self._put(window._finish(catalog))
+        return window
+
+    # Same as build(), awaitable
+    async def build_async(self, catalog, index):
+        window = self._get((catalog.version, index))
+        if window is None:
+            window = EphemerisWindow(catalog, index, self.step, self.span)
+            with propagator_for(catalog) as propagator:
+                if propagator is catalog.propagator:
+                    for lo, hi in propagator.batches():
+                        window._fill(lo, hi, await asyncio.to_thread(_window_rows, propagator.subset(lo, hi), lo, hi, *window.grid))
+                else:
+                    for (lo, hi), rows in zip(propagator.shards, await propagator.map_shards_async(_window_rows, *window.grid)):
+                        window._fill(lo, hi, rows)
+            self._put(await asyncio.to_thread(window._finish, catalog))
+        return window
+
+    # Geodetic lat/lon (degrees) and altitude (km) at time t, or None if t is not cached yet
+    def geodetic_at(self, catalog, t):
+        seconds, index = self._locate(t)
+        window = self._get((catalog.version, index))
+        if window is None or not window.covers(seconds):
+            self.misses += 1
+            return None
+        self.hits += 1
+        jd, fr_utc, fr_ut1 = time_arrays(t)
+        r = teme_to_itrs(window.positions_at(seconds), jd[0], fr_ut1[0])
+        return itrs_to_geodetic(r)
+
+    # Rolling extension: make sure the window holding t exists, and the next one once t
+    # gets close to the end of the current window
+    def extend(self, catalog, t):
+        seconds, index = self._locate(t)
+        self.build(catalog, index)
+        if seconds + EXTEND_MARGIN >= (index + 1) * self.span:
+            self.build(catalog, index + 1)
+
+    # Same as extend(), awaitable from the ticker's lifespan task
+    async def extend_async(self, catalog, t):
+        seconds, index = self._locate(t)
+        await self.build_async(catalog, index)
+        if seconds + EXTEND_MARGIN >= (index + 1) * self.span:
+            await self.build_async(catalog, index + 1)
+
+    # Measured interpolation error of every cached window, keyed by (version, index)
+    def errors(self):
+        with self._lock:
+            return {key: window.error_km for key, window in self._windows.items()}
+
+ephemeris = EphemerisCache()
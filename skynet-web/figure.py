@@ -0,0 +1,255 @@
+import base64
+import hashlib
+
+import numpy as np
+import plotly.graph_objects as go
+
+from .viewport import cluster, visible_mask
+
+# Marker colors per object type, in trace order
+COLORS = {
+    "Satellite": "#686ffe",
+    "Station": "#e2344d",
+    "Custom": "#4ab2ac",
+    "Conjunction": "#ffb347",
+    "Track": "#f7d794",
+}
+# Marker sizes where they differ from the default of 8
+SIZES = {
+    "Conjunction": 12,
+}
+# Dense cells of satellites drawn as one marker at low zoom (see viewport.cluster)
+CLUSTER_COLOR = "#a3a8ff"
+
+HOVERTEMPLATE = (
+    "<b>%{hovertext}</b><br>" +
+    "Lat: %{lat:.2f}°<br>" +
+    "Lon: %{lon:.2f}°<extra></extra><br>" +
+    "Click on this satellite to view more info!"
+)
+
+# Decimal places sent for lat/lon (1e-4 degrees is about 11 m on the ground)
+COORD_DECIMALS = 4
+# Degrees per int16 step of the packed object coordinates: about 0.003° (300 m) of latitude
+# and 0.006° (600 m) of longitude, below a pixel at any zoom the globe allows
+LAT_STEP = 90.0 / 32767
+LON_STEP = 180.0 / 32767
+
+# Coverage heatmap (see coverage.py): cells nothing covers stay transparent
+COVERAGE_COLORSCALE = [[0.0, "rgba(0,0,0,0)"], [1e-3, "rgba(74,178,172,0.3)"], [1.0, "rgba(255,179,71,0.8)"]]
+COVERAGE_HOVERTEMPLATE = "%{marker.color} objects in view<extra></extra>"
+# Globe radius in pixels at projection scale 1, which sizes the heatmap cells
+GLOBE_RADIUS_PX = 400
+
+# =============================
+# Figure skeleton: everything about the globe except the coordinates. Built once per
+# change of what is shown (catalog version, toggles, custom satellites, selected tracks);
+# between those, only the per-trace lat/lon arrays from coordinates() are sent to the browser.
+# Given a coverage grid, a heatmap trace with a square marker per cell comes first, under
+# everything else. After the object traces comes the trace of level-of-detail clusters, then
+# one line per ground track, which keeps its coordinates in the skeleton.
+# =============================
+def build_figure(groups, tracks=(), key=0, coverage=None):
+    heatmap = []
+    if coverage is not None:
+        heatmap.append(go.Scattergeo(
+            name="Coverage",
+            mode="markers",
+            lat=np.repeat(coverage.lat, coverage.cols),
+            lon=np.tile(coverage.lon, coverage.rows),
+            marker=dict(symbol="square", colorscale=COVERAGE_COLORSCALE),
+            hovertemplate=COVERAGE_HOVERTEMPLATE,
+        ))
+    fig = go.Figure(heatmap + [
+        go.Scattergeo(
+            name=typ,
+            legendgroup=typ,
+            mode="markers",
+            lat=[],
+            lon=[],
+            hovertext=list(names),
+            customdata=np.asarray(ids)[:, None],
+            marker=dict(color=COLORS[typ], size=SIZES.get(typ, 8)),
+            hovertemplate=HOVERTEMPLATE,
+            # Packed coordinates are only applied to the skeleton they were made for
+            meta=key,
+        )
+        for typ, names, ids, lat, lon in groups
+    ] + [
+        go.Scattergeo(
+            name="Cluster",
+            mode="markers",
+            lat=[],
+            lon=[],
+            marker=dict(color=CLUSTER_COLOR, opacity=0.8),
+            hovertemplate="<b>%{hovertext}</b><br>Zoom in to see individual satellites<extra></extra>",
+        )
+    ] + [
+        go.Scattergeo(
+            name=f"{name} track",
+            mode="lines",
+            lat=np.round(lat, COORD_DECIMALS),
+            lon=np.round(lon, COORD_DECIMALS),
+            line=dict(color=COLORS["Track"], width=1.5),
+            hoverinfo="skip",
+        )
+        for name, lat, lon in tracks
+    ])
+    fig.update_geos(
+        projection_type="orthographic",
+        showlakes=False,
+        landcolor='#B2A5FF',
+        oceancolor='#424874',
+    )
+    fig.update_layout(
+        template="plotly_dark",
+        width=1300,
+        height=900,
+        uirevision="constant",
+        showlegend=False,
+    )
+    return fig
+
+# Packed trace coordinates: only the shown points are sent, as one base64 string holding
+# which points they are, then their latitudes and then their longitudes as little-endian int16
+# steps of LAT_STEP / LON_STEP. Which points: a bitmap over the trace (np.packbits order,
+# padded to an even length), or, when fewer than one point in 32 is shown and the bitmap
+# would be the larger, k little-endian uint32 indices. The Globe component decodes it into
+# full arrays with nulls, which Plotly skips. n is the trace length and v the key of the
+# skeleton the frame belongs to
+def _packed_coords(lat, lon, shown, key):
+    shown = shown & np.isfinite(lat) & np.isfinite(lon)
+    rows = np.flatnonzero(shown)
+    quantized = np.concatenate((np.rint(lat[rows] / LAT_STEP), np.rint(lon[rows] / LON_STEP)))
+    packed = np.clip(quantized, -32767, 32767).astype("<i2").tobytes()
+    entry = {"n": len(lat), "v": key}
+    if 32 * len(rows) < len(lat):
+        entry["k"] = len(rows)
+        packed = rows.astype("<u4").tobytes() + packed
+    else:
+        bitmap = np.packbits(shown)
+        if len(bitmap) % 2:
+            bitmap = np.append(bitmap, np.uint8(0))
+        packed = bitmap.tobytes() + packed
+    entry["b"] = base64.b64encode(packed).decode("ascii")
+    return entry
+
+# Heatmap entry of a coverage grid: the marker, with squares about a cell wide at the center
+# of the view, and in c the cell values (row by row from the south) as base64 little-endian
+# uint16 tenths, which the Globe component decodes into the marker colors
+def _packed_coverage(grid, values, viewport):
+    values = np.asarray(values).ravel()
+    return {
+        "marker": {
+            "symbol": "square",
+            "size": round(max(2.0, GLOBE_RADIUS_PX * viewport.scale * np.radians(grid.cell)), 1),
+            "colorscale": COVERAGE_COLORSCALE,
+            "cmin": 0,
+            "cmax": max(1.0, float(values.max(initial=0))),
+            "line": {"width": 0},
+        },
+        "c": base64.b64encode(np.clip(np.rint(values * 10), 0, 65535).astype("<u2").tobytes()).decode("ascii"),
+    }
+
+# Per-trace coordinate arrays, in the same order as the skeleton's traces. Points on the far
+# side of the globe or outside the zoomed view are culled; at low zoom dense satellite cells
+# collapse into the cluster trace. coverage is the (grid, values) of the heatmap, if drawn
+def coordinates(groups, viewport, key=0, coverage=None):
+    traces = []
+    if coverage is not None:
+        traces.append(_packed_coverage(*coverage, viewport))
+    cluster_lat, cluster_lon, cluster_count = [], [], []
+    for typ, names, ids, lat, lon in groups:
+        shown = visible_mask(viewport, lat, lon)
+        if typ == "Satellite":
+            shown, c_lat, c_lon, c_count = cluster(viewport, lat, lon, shown)
+            cluster_lat.append(c_lat)
+            cluster_lon.append(c_lon)
+            cluster_count.append(c_count)
+        traces.append(_packed_coords(np.asarray(lat), np.asarray(lon), shown, key))
+
+    counts = np.concatenate(cluster_count) if cluster_count else np.empty(0, dtype=int)
+    traces.append({
+        "lat": np.round(np.concatenate(cluster_lat), COORD_DECIMALS).tolist() if cluster_lat else [],
+        "lon": np.round(np.concatenate(cluster_lon), COORD_DECIMALS).tolist() if cluster_lon else [],
+        "hovertext": [f"{count} satellites" for count in counts.tolist()],
+        "marker": {"color": CLUSTER_COLOR, "opacity": 0.8, "size": np.round(6 + 2 * np.sqrt(counts), 1).tolist()},
+    })
+    return traces
+
+# Keys are kept in session state, which any server process may load, so they use a digest
+# rather than hash(), which is seeded per process
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+# What the skeleton depends on: the set of traces, the objects in each, the drawn tracks and
+# the heatmap grid
+def structure_key(version, groups, tracks=(), coverage=None):
+    return (
+        version,
+        tuple((typ, len(ids), _digest(np.ascontiguousarray(ids).tobytes())) for typ, names, ids, lat, lon in groups),
+        tuple((name, _digest(np.ascontiguousarray(lat).tobytes())) for name, lat, lon in tracks),
+        coverage,
+    )
+
+# A structure_key() as the small integer that tags a skeleton and its packed frames
+def wire_key(key):
+    return int(_digest(repr(key).encode()), 16) & 0x7FFFFFFF
+
+# =============================
+# Sky plot: a polar view of what one observer sees, zenith in the middle, north up and east
+# to the right, with the horizon (0° elevation) as the rim. One trace per object type; the
+# skeleton never changes, and every tick sends each trace's points with coordinates from
+# sky_coordinates().
+# =============================
+SKY_TYPES = ("Satellite", "Station")
+
+SKY_HOVERTEMPLATE = (
+    "<b>%{hovertext}</b><br>" +
+    "Az: %{theta:.1f}°<br>" +
+    "El: %{customdata[1]:.1f}°<br>" +
+    "Range: %{customdata[2]:,.0f} km<extra></extra>"
+)
+
+def build_sky_figure():
+    fig = go.Figure([
+        go.Scatterpolar(
+            name=typ,
+            mode="markers",
+            r=[],
+            theta=[],
+            marker=dict(color=COLORS[typ], size=SIZES.get(typ, 8)),
+            hovertemplate=SKY_HOVERTEMPLATE,
+        )
+        for typ in SKY_TYPES
+    ])
+    fig.update_polars(
+        bgcolor="#424874",
+        angularaxis=dict(rotation=90, direction="clockwise", tickvals=[0, 90, 180, 270], ticktext=["N", "E", "S", "W"]),
+        radialaxis=dict(range=[0, 90], tickvals=[0, 30, 60, 90], ticktext=["90°", "60°", "30°", "0°"]),
+    )
+    fig.update_layout(
+        template="plotly_dark",
+        width=450,
+        height=450,
+        uirevision="constant",
+        showlegend=False,
+    )
+    return fig
+
+# Per-trace points of a sky.SkyView, in the order of build_sky_figure()'s traces: the
+# radius is the zenith distance, customdata carries the NORAD id, elevation and range
+def sky_coordinates(catalog, view):
+    traces = []
+    types = catalog.types[view.rows]
+    for typ in SKY_TYPES:
+        shown = types == typ
+        rows = view.rows[shown]
+        elevation = np.round(view.elevation[shown], 2)
+        traces.append({
+            "r": np.round(90.0 - elevation, 2).tolist(),
+            "theta": np.round(view.azimuth[shown], 2).tolist(),
+            "hovertext": catalog.names[rows].tolist(),
+            "customdata": [list(point) for point in zip(catalog.ids[rows].tolist(), elevation.tolist(), np.round(view.range_km[shown]).tolist())],
+        })
+    return traces
@@ -0,0 +1,202 @@
+import collections
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Orbital regimes, from mean motion (rev/day) and eccentricity: HEO is highly elliptical
+# (e >= HEO_ECCENTRICITY) or circular beyond geosynchronous, GEO is within GEO_MEAN_MOTION of
+# one rev/day, LEO is at least LEO_MEAN_MOTION (periods up to 128 minutes), MEO is the rest
+REGIMES = ("LEO", "MEO", "GEO", "HEO")
+HEO_ECCENTRICITY = 0.25
+LEO_MEAN_MOTION = 11.25
+GEO_MEAN_MOTION = (0.9, 1.1)
+# Inclination bands: upper edges in degrees and their labels
+BAND_EDGES = (30.0, 60.0, 80.0, 100.0)
+BANDS = ("0-30°", "30-60°", "60-80°", "80-100° polar", "100-180° retrograde")
+# Name prefixes with at least this many objects are offered as constellations
+CONSTELLATION_MIN_OBJECTS = 20
+# Resolved selections kept per index
+MASKS_KEPT = 64
+# Catalog versions whose indexes are kept: the live ones and archived catalogs being looked at
+VERSIONS_KEPT = 4
+
+# Leading word of an object name: "STARLINK-1008" -> STARLINK, "O3B FM1" -> O3B, "GSAT0101" -> GSAT
+_PREFIX = r"^([A-Z]+(?:\d+[A-Z]+)*)"
+
+def _categories(values):
+    categories, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return categories, codes.astype(np.uint16)
+
+# One boolean row mask per category of a code column
+def _bitmaps(codes, categories):
+    return {value: codes == k for k, value in enumerate(categories)}
+
+# =============================
+# Selection: what the filters let through. Every field is a set of allowed values (empty
+# allows everything) or, for launch years, an inclusive (first, last) range. The type toggles
+# are passed alongside, so a toggle never builds a new selection.
+# =============================
+@dataclass(frozen=True)
+class Selection:
+    """Filter settings of one session."""
+    regimes: frozenset = frozenset()
+    bands: frozenset = frozenset()
+    years: tuple = ()
+    constellations: frozenset = frozenset()
+    # Custom satellite groups (one per import)
+    groups: frozenset = frozenset()
+
+    def __bool__(self):
+        return bool(self.regimes or self.bands or self.years or self.constellations or self.groups)
+
+def selection_from_form(form_data):
+    """A Selection from the filter form: regime:<name> / band:<label> checkboxes, year_from,
+    year_to, constellation and group."""
+    years = ()
+    first, last = (form_data.get(key, "") for key in ("year_from", "year_to"))
+    if first or last:
+        try:
+            years = (int(first) if first else 0, int(last) if last else 9999)
+        except ValueError:
+            raise ValueError("launch years have to be whole numbers")
+        if years[0] > years[1]:
+            raise ValueError("the first launch year is after the last")
+    return Selection(
+        regimes=frozenset(regime for regime in REGIMES if form_data.get(f"regime:{regime}")),
+        bands=frozenset(band for band in BANDS if form_data.get(f"band:{band}")),
+        years=years,
+        constellations=frozenset([form_data["constellation"]]) if form_data.get("constellation") else frozenset(),
+        groups=frozenset([form_data["group"]]) if form_data.get("group") else frozenset(),
+    )
+
+# =============================
+# FilterIndex: the filterable attributes of a set of objects, derived once into a bitmap
+# (boolean row mask) per category plus a column of launch years. A selection resolves to a
+# row mask by OR-ing the bitmaps chosen within each filter and AND-ing across filters;
+# resolved masks are cached, so redraws with unchanged filters cost a dict lookup.
+# =============================
+class FilterIndex:
+    """Category columns of a catalog (or of a session's custom satellites), row for row."""
+
+    def __init__(self, types, names, object_ids, mean_motion, eccentricity, inclination):
+        self._columns = (
+            np.asarray(types, dtype=object), np.asarray(names, dtype=object), np.asarray(object_ids, dtype=object),
+            np.asarray(mean_motion, dtype=float), np.asarray(eccentricity, dtype=float), np.asarray(inclination, dtype=float),
+        )
+        types, names, object_ids, mean_motion, eccentricity, inclination = self._columns
+        categories, codes = _categories(types)
+        self.types = categories.tolist()
+        self._types = _bitmaps(codes, self.types)
+
+        regime = np.full(len(mean_motion), REGIMES.index("MEO"), dtype=np.uint8)
+        regime[mean_motion >= LEO_MEAN_MOTION] = REGIMES.index("LEO")
+        regime[(mean_motion >= GEO_MEAN_MOTION[0]) & (mean_motion <= GEO_MEAN_MOTION[1])] = REGIMES.index("GEO")
+        regime[(mean_motion < GEO_MEAN_MOTION[0]) | (eccentricity >= HEO_ECCENTRICITY)] = REGIMES.index("HEO")
+        self._regimes = _bitmaps(regime, REGIMES)
+        self._bands = _bitmaps(np.digitize(inclination, BAND_EDGES), BANDS)
+
+        # International designators are "YYYY-NNNP"; anything else has no launch year (0)
+        self.years = pd.to_numeric(pd.Series(object_ids, dtype=object).astype(str).str[:4], errors="coerce").fillna(0).to_numpy(dtype=np.int16)
+
+        # Name prefixes: a bitmap for each offered constellation, codes for the long tail
+        prefixes = pd.Series(names, dtype=object).astype(str).str.upper().str.extract(_PREFIX)[0].fillna("")
+        categories, self._prefix_codes = _categories(prefixes.to_numpy(dtype=object))
+        self._prefix_positions = {value: k for k, value in enumerate(categories.tolist())}
+        counts = np.bincount(self._prefix_codes, minlength=len(categories))
+        popular = np.flatnonzero((counts >= CONSTELLATION_MIN_OBJECTS) & (categories != ""))
+        # Offered constellations, largest first
+        self.constellations = categories[popular[np.argsort(-counts[popular], kind="stable")]].tolist()
+        self._constellations = {value: self._prefix_codes == self._prefix_positions[value] for value in self.constellations}
+
+        self._masks = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_elements(cls, elements, types):
+        """Index of an OMM frame; types is a column (or one value) of object types."""
+        return cls(
+            np.broadcast_to(np.asarray(types, dtype=object), (len(elements),)),
+            elements["OBJECT_NAME"].to_numpy(dtype=object),
+            elements["OBJECT_ID"].to_numpy(dtype=object),
+            elements["MEAN_MOTION"].to_numpy(dtype=float),
+            elements["ECCENTRICITY"].to_numpy(dtype=float),
+            elements["INCLINATION"].to_numpy(dtype=float),
+        )
+
+    def extended(self, other):
+        """Index of these rows followed by other's."""
+        return FilterIndex(*(np.concatenate(pair) for pair in zip(self._columns, other._columns)))
+
+    def __len__(self):
+        return len(self.years)
+
+    # Union of the bitmaps of the chosen categories
+    def _any(self, bitmaps, chosen):
+        mask = np.zeros(len(self), dtype=bool)
+        for value in chosen:
+            bitmap = bitmaps.get(value)
+            if bitmap is None and bitmaps is self._constellations and value in self._prefix_positions:
+                bitmap = self._prefix_codes == self._prefix_positions[value]
+            if bitmap is not None:
+                mask |= bitmap
+        return mask
+
+    def _resolve(self, selection, types):
+        mask = self._any(self._types, types)
+        if selection.regimes:
+            mask &= self._any(self._regimes, selection.regimes)
+        if selection.bands:
+            mask &= self._any(self._bands, selection.bands)
+        if selection.years:
+            mask &= (self.years >= selection.years[0]) & (self.years <= selection.years[1])
+        if selection.constellations:
+            mask &= self._any(self._constellations, selection.constellations)
+        return mask
+
+    def _entry(self, selection, types):
+        key = (selection, frozenset(types))
+        with self._lock:
+            entry = self._masks.get(key)
+            if entry is not None:
+                self._masks.move_to_end(key)
+                return entry
+        mask = self._resolve(selection, key[1])
+        mask.flags.writeable = False
+        entry = (mask, np.flatnonzero(mask))
+        with self._lock:
+            self._masks[key] = entry
+            while len(self._masks) > MASKS_KEPT:
+                self._masks.popitem(last=False)
+        return entry
+
+    def mask(self, selection, types):
+        """Read-only boolean mask of the rows of the given types that the selection lets through."""
+        return self._entry(selection, types)[0]
+
+    def rows(self, selection, types):
+        """Indices of the rows mask() lets through, ascending."""
+        return self._entry(selection, types)[1]
+
+# =============================
+# One index per catalog version, built on first use and kept for the VERSIONS_KEPT most recently
+# used versions, so archive views do not push out the live catalog's index.
+# =============================
+_lock = threading.Lock()
+_indexes = collections.OrderedDict()
+
+def filters_for(catalog):
+    """The FilterIndex of a catalog."""
+    with _lock:
+        index = _indexes.get(catalog.version)
+        if index is not None:
+            _indexes.move_to_end(catalog.version)
+            return index
+    index = FilterIndex.from_elements(catalog.elements, catalog.types)
+    with _lock:
+        index = _indexes.setdefault(catalog.version, index)
+        _indexes.move_to_end(catalog.version)
+        while len(_indexes) > VERSIONS_KEPT:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,100 @@
+from reflex.components.plotly.plotly import Plotly
+from reflex.event import EventHandler
+from reflex.vars.base import Var, VarData
+
+from .figure import LAT_STEP, LON_STEP
+
+# Plotly's own click spec drops customdata; keep the NORAD id carried in customdata[0]
+# together with the clicked coordinates and trace/point numbers
+def _event_points_ids_signature(e0: Var) -> tuple[Var[list[dict]]]:
+    return (
+        Var(
+            _js_expr=f"({e0}?.points ?? []).map(point => ({{"
+            "id: point.customdata?.[0], "
+            "lat: point.lat, "
+            "lon: point.lon, "
+            "curveNumber: point.curveNumber, "
+            "pointIndex: point.pointIndex"
+            "}))"
+        ),
+    )
+
+# Plotly's own relayout spec drops the event data; keep it so the server sees rotation and zoom
+def _event_relayout_signature(e0: Var) -> tuple[Var[dict]]:
+    return (e0,)
+
+# Client-side decoding of one packed coordinate entry (see figure._packed_coords) into full
+# lat/lon arrays with nulls for the points not sent. Frames made for another skeleton than
+# the trace's are dropped; heatmap entries (figure._packed_coverage) get their cell values
+# as marker colors; entries that are not packed are merged into the trace as they are
+_DECODE_COORDS = (
+    "((c, trace) => {"
+    "if (c?.c !== undefined) { "
+    "const raw = atob(c.c); "
+    "const values = new Array(raw.length >> 1); "
+    "for (let k = 0; k < values.length; k++) values[k] = (raw.charCodeAt(2 * k) | (raw.charCodeAt(2 * k + 1) << 8)) / 10; "
+    "return {marker: {...c.marker, color: values}}; "
+    "} "
+    "if (!c || c.b === undefined) return c ?? {}; "
+    "if (c.v !== (trace?.meta ?? 0)) return {}; "
+    "const raw = atob(c.b); "
+    "const bytes = new Uint8Array(raw.length); "
+    "for (let k = 0; k < raw.length; k++) bytes[k] = raw.charCodeAt(k); "
+    "const n = c.n; "
+    "const lat = new Array(n).fill(null); "
+    "const lon = new Array(n).fill(null); "
+    "if (c.k !== undefined) { "
+    "const rows = new Uint32Array(bytes.buffer, 0, c.k); "
+    "const q = new Int16Array(bytes.buffer, 4 * c.k, 2 * c.k); "
+    "for (let j = 0; j < c.k; j++) { "
+    f"lat[rows[j]] = q[j] * {LAT_STEP!r}; lon[rows[j]] = q[c.k + j] * {LON_STEP!r}; "
+    "} "
+    "return {lat, lon}; "
+    "} "
+    "const offset = ((n + 15) >> 4) << 1; "
+    "const count = (bytes.length - offset) >> 2; "
+    "const q = new Int16Array(bytes.buffer, offset, 2 * count); "
+    "for (let k = 0, j = 0; k < n; k++) { "
+    "if (bytes[k >> 3] & (128 >> (k & 7))) { "
+    f"lat[k] = q[j] * {LAT_STEP!r}; lon[k] = q[count + j] * {LON_STEP!r}; j++; "
+    "} } "
+    "return {lat, lon};"
+    "})"
+)
+
+# =============================
+# Globe: rx.plotly with click events that identify objects by NORAD id and
+# coordinate-only updates on top of a cached figure skeleton
+# =============================
+class Globe(Plotly):
+    """The orbital globe plot."""
+
+    # Per-trace {"lat": [...], "lon": [...]} arrays merged into the figure's traces in the
+    # browser, so a redraw only ships coordinates and the figure skeleton stays cached.
+    # Packed entries {"n", "v", "b"} are decoded to length-n arrays with nulls
+    coords: Var[list[dict]]
+
+    # Fired when the plot is clicked, with the NORAD id of each clicked point
+    on_click: EventHandler[_event_points_ids_signature]
+
+    # Fired after the plot is laid out (rotate, zoom), with Plotly's relayout data
+    on_relayout: EventHandler[_event_relayout_signature]
+
+    def _exclude_props(self) -> set[str]:
+        return super()._exclude_props() | {"coords"}
+
+    def _render(self):
+        if self.coords is None or self.data is None:
+            return super()._render()
+        figure = self.data.to(dict)
+        skeleton = self.data
+        self.data = Var(
+            _js_expr=f"((fig, coords) => ({{...fig, data: (fig?.data ?? []).map((trace, i) => ({{...trace, ...{_DECODE_COORDS}(coords?.[i], trace)}}))}}))({figure!s}, {self.coords!s})",
+            _var_data=VarData.merge(figure._get_all_var_data(), self.coords._get_all_var_data()),
+        )
+        try:
+            return super()._render()
+        finally:
+            self.data = skeleton
+
+globe = Globe.create
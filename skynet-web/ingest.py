@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+
+import pandas as pd
+import sqlalchemy
+
+from .models import db
+
+# Ids above this are user-defined custom satellites and are never touched by catalog ingestion
+CUSTOM_ID_START = 100000
+
+@dataclass(frozen=True)
+class IngestReport:
+    """Row counts from one catalog ingestion."""
+    inserted: int
+    updated: int
+    removed: int
+
+# Column names as stored in the db table (NORAD_CAT_ID doubles as the primary key)
+def db_columns(elements):
+    return [col if col != "NORAD_CAT_ID" else "id" for col in elements.columns if col != "type"]
+
+# Convert one CSV column to the Python type of the matching db column
+def _typed_column(values, column):
+    if isinstance(column.type, sqlalchemy.DateTime):
+        return pd.to_datetime(values, format="ISO8601").dt.to_pydatetime().tolist()
+    if isinstance(column.type, sqlalchemy.Float):
+        return values.astype(float).tolist()
+    if isinstance(column.type, sqlalchemy.Integer):
+        return values.astype(int).tolist()
+    return values.astype(str).tolist()
+
+# One dict of bind parameters per catalog row, keyed by db column name
+def db_rows(elements):
+    frame = elements.drop(columns="type", errors="ignore").rename(columns={"NORAD_CAT_ID": "id"})
+    frame = frame.drop_duplicates(subset="id", keep="first")
+    # Column-wise conversion; DataFrame.to_dict("records") boxes every cell and is far slower
+    columns = {col: _typed_column(frame[col], db.__table__.c[col]) for col in frame.columns}
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+# =============================
+# Bulk upsert of the whole catalog in the caller's transaction.
+# Rows are matched by NORAD id: new ids are inserted, ids whose element set changed are
+# updated, and catalog ids that disappeared from the download are deleted.
+# Given `removed`, `elements` is a delta instead (e.g. CatalogDiff.rows of a refresh): only
+# its ids are compared and written, and only the `removed` ids are deleted.
+# =============================
+def ingest_catalog(session, elements, removed=None):
+    cols = db_columns(elements)
+    rows = db_rows(elements)
+
+    table = db.__table__
+
+    query = sqlalchemy.select(table.c.id, table.c.EPOCH, table.c.ELEMENT_SET_NO).where(table.c.id <= CUSTOM_ID_START)
+    if removed is not None:
+        query = query.where(table.c.id.in_([row["id"] for row in rows] + [int(norad_id) for norad_id in removed]))
+    existing = {row.id: (row.EPOCH, row.ELEMENT_SET_NO) for row in session.execute(query)}
+
+    changed = [row for row in rows if existing.get(row["id"]) != (row["EPOCH"], row["ELEMENT_SET_NO"])]
+    inserted = sum(1 for row in changed if row["id"] not in existing)
+    removed = existing.keys() - {row["id"] for row in rows}
+
+    if changed:
+        session.execute(
+            sqlalchemy.text(
+                f"INSERT INTO db ({', '.join(cols)}) "
+                f"VALUES ({', '.join(f':{col}' for col in cols)}) "
+                f"ON CONFLICT (id) DO UPDATE SET {', '.join(f'{col} = excluded.{col}' for col in cols if col != 'id')}"
+            ).bindparams(*(sqlalchemy.bindparam(col, type_=table.c[col].type) for col in cols)),
+            changed,
+        )
+    if removed:
+        session.execute(
+            sqlalchemy.text("DELETE FROM db WHERE id = :id"),
+            [{"id": norad_id} for norad_id in removed],
+        )
+
+    return IngestReport(inserted=inserted, updated=len(changed) - inserted, removed=len(removed))
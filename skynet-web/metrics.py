@@ -0,0 +1,229 @@
+import bisect
+import collections
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from reflex.utils.serializers import serialize
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from .catalog import get_catalog
+
+# Instrumentation on or off (SKYNET_METRICS=0 turns it off). Off, the decorators return the
+# handlers unchanged, the hooks are no-ops and /metrics is not mounted
+ENABLED = os.environ.get("SKYNET_METRICS", "1") != "0"
+# Histogram buckets for durations (seconds) and payload sizes (bytes)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(float(4 ** k) for k in range(5, 13))
+# Serializing a state var just to weigh it costs about as much as sending it, so only every
+# PAYLOAD_SAMPLE_EVERY-th value of each var is measured
+PAYLOAD_SAMPLE_EVERY = 20
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+# =============================
+# Metric types, rendered in the Prometheus text format. Series are keyed by their label values
+# and created on first observation.
+# =============================
+class Histogram:
+    """Cumulative-bucket histogram of observed values per label set."""
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [count per bucket..., count above the last bucket, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            counts = np.cumsum(values[:-1]).tolist()
+            for bound, count in zip((*(f"{bound:g}" for bound in self.buckets), "+Inf"), counts):
+                lines.append(f"{self.name}_bucket{_labels((*self.labels, 'le'), (*labels, bound))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {values[-1]!r}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {counts[-1]}")
+        return "\n".join(lines) + "\n"
+
+class Counter:
+    """Monotonic count per label set."""
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = collections.Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *labels):
+        with self._lock:
+            self._values[labels] += 1
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labels, labels)} {value}" for labels, value in values)
+        return "\n".join(lines) + "\n"
+
+class Gauge:
+    """Values read at scrape time from collect(), which returns {label values: value}."""
+
+    def __init__(self, name, documentation, collect, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.collect = collect
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        lines.extend(f"{self.name}{_labels(self.labels, labels)} {value}" for labels, value in sorted(self.collect().items()))
+        return "\n".join(lines) + "\n"
+
+def _catalog_objects():
+    catalog = get_catalog()
+    if catalog is None:
+        return {}
+    types, counts = np.unique(catalog.types, return_counts=True)
+    return {(typ,): int(count) for typ, count in zip(types.tolist(), counts.tolist())}
+
+def _catalog_version():
+    catalog = get_catalog()
+    return {(): catalog.version if catalog is not None else 0}
+
+event_seconds = Histogram("skynet_event_seconds", "Wall time of State event handlers.", ("handler",))
+event_errors = Counter("skynet_event_errors_total", "State event handlers that raised.", ("handler",))
+phase_seconds = Histogram("skynet_phase_seconds", "Wall time of the phases inside an event handler.", ("handler", "phase"))
+payload_bytes = Histogram("skynet_state_payload_bytes", "Serialized size of state vars sent to the browser (sampled).", ("var",), SIZE_BUCKETS)
+redraws = Counter("skynet_redraws_total", "Globe redraw requests and what became of them.", ("outcome",))
+query_seconds = Histogram("skynet_db_query_seconds", "Latency of database statements by kind.", ("statement",))
+catalog_objects = Gauge("skynet_catalog_objects", "Objects in the shared catalog by type.", _catalog_objects, ("type",))
+catalog_version = Gauge("skynet_catalog_version", "Version of the shared catalog.", _catalog_version)
+
+REGISTRY = [event_seconds, event_errors, phase_seconds, payload_bytes, redraws, query_seconds, catalog_objects, catalog_version]
+
+def exposition():
+    """All metrics in the Prometheus text exposition format."""
+    return "".join(metric.exposition() for metric in REGISTRY)
+
+# =============================
+# Hooks used by the app: a decorator for event handlers, phase laps inside a handler, sampled
+# payload sizes, and SQLAlchemy events timing every statement on every engine.
+# =============================
+def timed(handler):
+    """Decorator recording the wall time and failures of a State event handler. Goes under @rx.event."""
+    if not ENABLED:
+        return handler
+    name = handler.__name__
+
+    if inspect.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def timed_handler(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await handler(*args, **kwargs)
+            except Exception:
+                event_errors.inc(name)
+                raise
+            finally:
+                event_seconds.observe(time.perf_counter() - start, name)
+    else:
+        @functools.wraps(handler)
+        def timed_handler(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            except Exception:
+                event_errors.inc(name)
+                raise
+            finally:
+                event_seconds.observe(time.perf_counter() - start, name)
+    return timed_handler
+
+class Phases:
+    """Consecutive phases of one handler call: each lap() records the time since the previous one."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        phase_seconds.observe(now - self._last, self.handler, phase)
+        self._last = now
+
+class _NoPhases:
+    def lap(self, phase):
+        pass
+
+_NO_PHASES = _NoPhases()
+
+def phases(handler):
+    """A Phases clock for one call of handler, started now."""
+    return Phases(handler) if ENABLED else _NO_PHASES
+
+_payloads = collections.Counter()
+
+def payload(var, value):
+    """Record the serialized size of a state var, for every PAYLOAD_SAMPLE_EVERY-th value."""
+    if not ENABLED:
+        return
+    _payloads[var] += 1
+    if _payloads[var] % PAYLOAD_SAMPLE_EVERY != 1:
+        return
+    payload_bytes.observe(len(json.dumps(value, default=serialize)), var)
+
+def redraw(outcome):
+    """Count a redraw request (requested) or what became of it: coalesced, executed or unchanged."""
+    if ENABLED:
+        redraws.inc(outcome)
+
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("skynet_started", []).append(time.perf_counter())
+
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("skynet_started")
+    if started:
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        query_seconds.observe(time.perf_counter() - started.pop(), kind)
+
+def _statement_failed(context):
+    started = context.connection.info.get("skynet_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+if ENABLED:
+    event.listen(Engine, "before_cursor_execute", _statement_started)
+    event.listen(Engine, "after_cursor_execute", _statement_finished)
+    event.listen(Engine, "handle_error", _statement_failed)
+
+async def _metrics(request):
+    return PlainTextResponse(exposition(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Mounted in front of the Reflex app (rx.App(api_transformer=...)); None when disabled
+api = Starlette(routes=[Route("/metrics", _metrics)]) if ENABLED else None
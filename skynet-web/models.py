@@ -0,0 +1,26 @@
+import datetime
+
+import reflex as rx
+import sqlmodel
+
+# =============================
+# Database model for satellites and stations. Uses NORAD ID as primary key.
+# =============================
+class db(rx.Model, table=True): #Using NORAD ID as primary key - merging with default id
+
+    OBJECT_NAME: str = sqlmodel.Field(index=True)
+    OBJECT_ID: str = sqlmodel.Field(index=True)
+    EPOCH: datetime.datetime
+    MEAN_MOTION: float
+    ECCENTRICITY: float
+    INCLINATION: float
+    RA_OF_ASC_NODE: float
+    ARG_OF_PERICENTER: float
+    MEAN_ANOMALY: float
+    EPHEMERIS_TYPE: int
+    CLASSIFICATION_TYPE: str
+    ELEMENT_SET_NO: int
+    REV_AT_EPOCH: int
+    BSTAR: float
+    MEAN_MOTION_DOT: float
+    MEAN_MOTION_DDOT: float
@@ -0,0 +1,228 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .propagation import DAY_S, WGS84_E2, WGS84_RADIUS_KM, CatalogPropagator, WindowClock, teme_to_itrs
+from .sharded import propagator_for
+
+# Event codes, same meaning as Skyfield's EarthSatellite.find_events()
+RISE, CULMINATE, SET = 0, 1, 2
+EVENT_NAMES = ("rise", "culminate", "set")
+
+# Finest coarse-scan spacing, in seconds; see _scan_steps()
+SCAN_STEP = 60.0
+# Root refinement stops when the bracket is this narrow, in seconds
+TOLERANCE = 0.5
+# Cap on root-finding rounds; regula falsi usually settles in four or five
+MAX_ITERATIONS = 30
+# Objects handled per scan block, which bounds the (objects x samples x 3) position arrays
+BLOCK_OBJECTS = 2048
+# Samples per scan block at SCAN_STEP (proportionally fewer objects x more samples otherwise)
+BLOCK_SAMPLES = 240
+
+@dataclass(frozen=True)
+class PassEvents:
+    """Rise, culmination and set events, one entry per event, sorted by time."""
+    rows: np.ndarray
+    ids: np.ndarray
+    events: np.ndarray
+    tt: np.ndarray
+    elevation: np.ndarray
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Event times as a Skyfield Time array
+    def times(self, ts):
+        return ts.tt_jd(self.tt)
+
+    def passes(self):
+        """(rise, culmination, set) event indices of every pass, in order of its first event;
+        -1 where the window cuts the pass off. The culmination is the highest in the pass."""
+        found = []
+        current, row = None, None
+        for k in np.lexsort((self.tt, self.rows)).tolist():
+            if current is None or self.rows[k] != row or self.events[k] == RISE:
+                current, row = [-1, -1, -1], self.rows[k]
+                found.append(current)
+            if self.events[k] == CULMINATE:
+                if current[1] < 0 or self.elevation[k] > self.elevation[current[1]]:
+                    current[1] = k
+            else:
+                current[0 if self.events[k] == RISE else 2] = k
+                if self.events[k] == SET:
+                    current = None
+        found.sort(key=lambda events: min(self.tt[k] for k in events if k >= 0))
+        return found
+
+@dataclass(frozen=True)
+class Observer:
+    """A ground observer in WGS84 geodetic coordinates."""
+    lat: float
+    lon: float
+    elevation_m: float = 0.0
+
+    # Earth-fixed position (km) and local vertical unit vector
+    def itrs(self):
+        lat = np.radians(self.lat)
+        lon = np.radians(self.lon)
+        height = self.elevation_m / 1000.0
+        N = WGS84_RADIUS_KM / np.sqrt(1.0 - WGS84_E2 * np.sin(lat) ** 2)
+        position = np.array([
+            (N + height) * np.cos(lat) * np.cos(lon),
+            (N + height) * np.cos(lat) * np.sin(lon),
+            (N * (1.0 - WGS84_E2) + height) * np.sin(lat),
+        ])
+        up = np.array([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+        return position, up
+
+def _elevation(r_teme, jd, fr_ut1, observer):
+    position, up = observer
+    rho = teme_to_itrs(r_teme, jd, fr_ut1) - position
+    return np.degrees(np.arcsin(np.einsum("...k,k->...", rho, up) / np.linalg.norm(rho, axis=-1)))
+
+# Elevation of object rows[i] at seconds[i]
+def _elevation_pairs(propagator, rows, seconds, clock, observer):
+    jd, fr_utc, fr_ut1 = clock.args(seconds)
+    _, r, _ = propagator.propagate_pairs(rows, jd, fr_utc)
+    return _elevation(r, jd, fr_ut1, observer)
+
+# Vectorized root finding for f(rows, seconds) = 0 inside brackets [lo, hi] where f_lo and
+# f_hi have opposite signs: regula falsi with the Illinois modification, which converges in
+# a handful of evaluations on smooth elevation curves. Only unconverged roots are evaluated
+def _find_roots(f, rows, lo, hi, f_lo, f_hi):
+    lo, hi, f_lo, f_hi = (np.array(a, dtype=float) for a in (lo, hi, f_lo, f_hi))
+    x = 0.5 * (lo + hi)
+    active = np.flatnonzero(hi - lo > TOLERANCE)
+    side = np.zeros(len(rows), dtype=np.int8)
+    for _ in range(MAX_ITERATIONS):
+        if not len(active):
+            break
+        a, b, fa, fb = lo[active], hi[active], f_lo[active], f_hi[active]
+        guess = np.clip(b - fb * (b - a) / (fb - fa), a, b)
+        x[active] = guess
+        fx = f(rows[active], guess)
+        low = np.sign(fx) == np.sign(fa)
+        # Illinois: halve the stale endpoint's value when the same side is kept twice
+        stale = side[active] == np.where(low, 1, -1)
+        lo[active] = np.where(low, guess, a)
+        f_lo[active] = np.where(low, fx, np.where(stale, fa / 2, fa))
+        hi[active] = np.where(low, b, guess)
+        f_hi[active] = np.where(low, np.where(stale, fb / 2, fb), fx)
+        side[active] = np.where(low, 1, -1)
+        done = (fx == 0) | ~(hi[active] - lo[active] > TOLERANCE)
+        active = active[~done]
+    return x
+
+# Coarse scan step per object: a twentieth of an orbit (at most 6 h), as Skyfield's
+# find_events() uses, rounded down to SCAN_STEP times a power of two so that objects can
+# share sample grids
+def _scan_steps(satrecs):
+    orbits_per_day = np.array([satrec.no_kozai for satrec in satrecs]) * 1440.0 / (2.0 * np.pi)
+    step = np.clip(0.05 * DAY_S / np.maximum(orbits_per_day, 1.0), SCAN_STEP, 0.25 * DAY_S)
+    return SCAN_STEP * 2.0 ** np.floor(np.log2(step / SCAN_STEP))
+
+# =============================
+# Pass search for satellites sharing one scan step, over the whole window: a coarse
+# vectorized elevation scan, then refinement only where something happens. Maxima are
+# refined first and spliced back into the samples, so a pass that rises and sets between
+# two samples still shows up as a pair of sign changes around its culmination.
+# =============================
+def _find_events_on_grid(satrecs, step, clock, seconds_total, min_elevation, observer_xyz):
+    propagator = CatalogPropagator(satrecs)
+    samples = np.arange(-step, seconds_total + 2 * step, step)
+    chunk_size = max(1, BLOCK_SAMPLES * int(SCAN_STEP) * BLOCK_OBJECTS // int(step) // len(satrecs))
+    elevation = np.empty((len(satrecs), len(samples)))
+    for first in range(0, len(samples), chunk_size):
+        chunk = samples[first:first + chunk_size]
+        jd, fr_utc, fr_ut1 = clock.args(chunk)
+        _, r, _ = propagator.propagate_teme(jd, fr_utc)
+        elevation[:, first:first + len(chunk)] = _elevation(r, jd, fr_ut1, observer_xyz)
+    elevation = np.nan_to_num(elevation, nan=-90.0)
+
+    def elevation_at(rows, seconds):
+        return _elevation_pairs(propagator, rows, seconds, clock, observer_xyz) - min_elevation
+
+    def climbing(rows, seconds):
+        both = elevation_at(np.concatenate([rows, rows]), np.concatenate([seconds + 0.5, seconds - 0.5]))
+        return both[:len(rows)] - both[len(rows):]
+
+    # Culminations: sampled local maxima, refined on the zero of the elevation rate
+    rows, k = np.nonzero((elevation[:, 1:-1] >= elevation[:, :-2]) & (elevation[:, 1:-1] > elevation[:, 2:]))
+    k = k + 1
+    lo, hi = samples[k - 1], samples[k + 1]
+    rates = climbing(np.concatenate([rows, rows]), np.concatenate([lo, hi]))
+    peak_seconds = _find_roots(climbing, rows, lo, hi, rates[:len(rows)], rates[len(rows):])
+    peak = elevation_at(rows, peak_seconds) + min_elevation
+    times = np.broadcast_to(samples, elevation.shape).copy()
+    times[rows, k] = peak_seconds
+    elevation[rows, k] = peak
+
+    found_rows, found_events, found_seconds = [], [], []
+    culminates = (peak > min_elevation) & (peak_seconds >= 0) & (peak_seconds <= seconds_total)
+    found_rows.append(rows[culminates])
+    found_events.append(np.full(culminates.sum(), CULMINATE))
+    found_seconds.append(peak_seconds[culminates])
+
+    # Horizon crossings: bracketed by neighbouring points on opposite sides of the mask
+    above = elevation > min_elevation
+    for rising, code in ((True, RISE), (False, SET)):
+        rows, k = np.nonzero(~above[:, :-1] & above[:, 1:] if rising else above[:, :-1] & ~above[:, 1:])
+        seconds = _find_roots(
+            elevation_at, rows, times[rows, k], times[rows, k + 1],
+            elevation[rows, k] - min_elevation, elevation[rows, k + 1] - min_elevation,
+        )
+        inside = (seconds >= 0) & (seconds <= seconds_total)
+        found_rows.append(rows[inside])
+        found_events.append(np.full(inside.sum(), code))
+        found_seconds.append(seconds[inside])
+
+    rows = np.concatenate(found_rows)
+    seconds = np.concatenate(found_seconds)
+    return rows, np.concatenate(found_events), seconds, elevation_at(rows, seconds) + min_elevation
+
+def _find_events(satrecs, clock, seconds_total, min_elevation, observer_xyz):
+    steps = _scan_steps(satrecs)
+    results = []
+    for step in np.unique(steps):
+        group = np.flatnonzero(steps == step)
+        rows, events, seconds, elevation = _find_events_on_grid([satrecs[i] for i in group], float(step), clock, seconds_total, min_elevation, observer_xyz)
+        results.append((group[rows], events, seconds, elevation))
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+# The events of the requested rows in lo .. hi - 1, run through map_shards() where the
+# shard's Satrec objects already are. Returns a list of (rows, events, seconds, elevation)
+def _shard_events(propagator, lo, hi, rows, clock, seconds_total, min_elevation, observer_xyz):
+    rows = rows[(rows >= lo) & (rows < hi)]
+    results = []
+    for first in range(0, len(rows), BLOCK_OBJECTS):
+        block = rows[first:first + BLOCK_OBJECTS]
+        local, events, seconds, elevation = _find_events([propagator.satrecs[i - lo] for i in block.tolist()], clock, seconds_total, min_elevation, observer_xyz)
+        results.append((block[local], events, seconds, elevation))
+    return results
+
+# =============================
+# Public API: every rise, culmination and set for the catalog (or the rows selected by
+# `rows`) seen from `observer` between Skyfield Times `start` and `end`.
+# =============================
+def predict_passes(catalog, observer, start, end, min_elevation=0.0, rows=None):
+    rows = np.arange(len(catalog)) if rows is None else np.asarray(rows)
+    seconds_total = float((end.tt - start.tt) * DAY_S)
+    clock = WindowClock(start)
+
+    # Large catalogs are searched shard by shard on the propagation workers (see sharded.py)
+    with propagator_for(catalog) as propagator:
+        parts = propagator.map_shards(_shard_events, rows.astype(np.int64), clock, seconds_total, min_elevation, observer.itrs())
+    results = [result for part in parts for result in part]
+
+    found = [np.concatenate(parts) for parts in zip(*results)] if results else [np.empty(0)] * 4
+    found_rows, events, seconds, elevation = found
+    found_rows = found_rows.astype(np.int64)
+    order = np.lexsort((events, seconds))
+    return PassEvents(
+        rows=found_rows[order],
+        ids=catalog.ids[found_rows[order]],
+        events=events[order].astype(np.int64),
+        tt=clock.tt_jd(seconds[order]),
+        elevation=elevation[order],
+    )
@@ -0,0 +1,143 @@
+import collections
+import functools
+import itertools
+import threading
+
+import numpy as np
+
+from .ticker import HISTORY
+
+# Grid cell size on the unit sphere, in degrees of arc (as a chord)
+CELL_DEGREES = 1.0
+# Default radius of "what is near this point" queries, in degrees of arc
+NEAR_RADIUS_DEGREES = 2.0
+# Default number of objects returned by nearest()
+NEAREST_COUNT = 10
+
+_CELL = 2.0 * np.sin(np.radians(CELL_DEGREES) / 2.0)
+
+def _unit_vectors(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    return np.stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)), axis=-1)
+
+def _cell_key(cx, cy, cz):
+    # Cube coordinates are within +-(2 / _CELL) < 2**20, so they pack into one int
+    return ((cx + (1 << 20)) << 42) + ((cy + (1 << 20)) << 21) + (cz + (1 << 20))
+
+# =============================
+# PickIndex: a uniform grid over the sub-satellite points of one snapshot. Points are
+# bucketed by their unit vector, so a query only visits the cubes around the query point,
+# with no special cases at the poles or the antimeridian.
+# =============================
+class PickIndex:
+    """Nearest-object and radius queries on the lat/lon of one snapshot."""
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.tt = float(snapshot.t.tt)
+        self.ids = snapshot.catalog.ids
+        self.types = snapshot.catalog.types
+        self._xyz = _unit_vectors(snapshot.lat, snapshot.lon)
+        rows = np.flatnonzero(np.isfinite(self._xyz).all(axis=1))
+        cubes = np.floor(self._xyz[rows] / _CELL).astype(np.int64)
+        keys = _cell_key(cubes[:, 0], cubes[:, 1], cubes[:, 2])
+        order = np.argsort(keys, kind="stable")
+        self._rows = rows[order]
+        self._cells, self._start, self._count = np.unique(keys[order], return_index=True, return_counts=True)
+        # Cube coordinates of every occupied cell
+        self._cubes = cubes[order[self._start]]
+
+    # Rows in the occupied cells with the given indices
+    def _rows_in(self, cells):
+        count = self._count[cells]
+        first = np.repeat(self._start[cells] - np.cumsum(count) + count, count)
+        return self._rows[first + np.arange(count.sum())]
+
+    # Rows in the cubes with the given keys
+    def _rows_at(self, keys):
+        found = np.minimum(np.searchsorted(self._cells, keys), len(self._cells) - 1)
+        return self._rows_in(found[self._cells[found] == keys])
+
+    # Rows in the cubes within `reach` (chord length) of the unit vector p
+    def _candidates(self, p, reach):
+        lo = np.floor((p - reach) / _CELL).astype(np.int64)
+        hi = np.floor((p + reach) / _CELL).astype(np.int64)
+        cx, cy, cz = np.meshgrid(*(np.arange(lo[k], hi[k] + 1) for k in range(3)), indexing="ij")
+        return self._rows_at(_cell_key(cx.ravel(), cy.ravel(), cz.ravel()))
+
+    # Candidate rows restricted to types and mask, with their distances from p in degrees of arc
+    def _distances(self, rows, p, types, mask):
+        if types is not None:
+            rows = rows[np.isin(self.types[rows], list(types))]
+        if mask is not None:
+            rows = rows[mask[rows]]
+        return rows, np.degrees(np.arccos(np.clip(self._xyz[rows] @ p, -1.0, 1.0)))
+
+    def near(self, lat, lon, radius=NEAR_RADIUS_DEGREES, types=None, mask=None):
+        """Catalog rows within `radius` degrees of arc of (lat, lon), nearest first, with their distances.
+        Restricted to the given types and/or to the rows set in a boolean mask over the catalog."""
+        p = _unit_vectors(lat, lon)
+        rows, distance = self._distances(self._candidates(p, 2.0 * np.sin(np.radians(min(radius, 180.0)) / 2.0)), p, types, mask)
+        inside = distance <= radius
+        order = np.argsort(distance[inside], kind="stable")
+        return rows[inside][order], distance[inside][order]
+
+    # Searches the cube shells around the point in order: once shells 0 .. s are done, every
+    # object closer than s cells (as a chord) has been seen, so the search stops as soon as
+    # the count-th best is that close. When a shell would take more cubes than there are
+    # occupied cells, the rest of them are scanned at once instead
+    def nearest(self, lat, lon, count=NEAREST_COUNT, types=None, mask=None):
+        """The `count` catalog rows closest to (lat, lon), nearest first, with their distances."""
+        p = _unit_vectors(lat, lon)
+        center = np.floor(p / _CELL).astype(np.int64)
+        found_rows, found_distance = [], []
+        for shell in itertools.count(1):
+            if (2 * shell + 1) ** 3 > len(self._cells):
+                rest = np.flatnonzero(np.abs(self._cubes - center).max(axis=1) >= shell)
+                rows, distance = self._distances(self._rows_in(rest), p, types, mask)
+                searched = 180.0
+            else:
+                cubes = center + _shell_offsets(shell)
+                rows, distance = self._distances(self._rows_at(_cell_key(cubes[:, 0], cubes[:, 1], cubes[:, 2])), p, types, mask)
+                searched = np.degrees(2.0 * np.arcsin(min(1.0, shell * _CELL / 2.0)))
+            found_rows.append(rows)
+            found_distance.append(distance)
+            if sum(map(len, found_rows)) >= count or searched >= 180.0:
+                distance = np.concatenate(found_distance)
+                if searched >= 180.0 or np.partition(distance, count - 1)[count - 1] <= searched:
+                    break
+        rows = np.concatenate(found_rows)
+        order = np.argsort(distance, kind="stable")[:count]
+        return rows[order], distance[order]
+
+# Offsets of the cubes exactly `shell` cubes away (in the max norm), the first shell taking
+# the center cube along
+@functools.lru_cache(maxsize=None)
+def _shell_offsets(shell):
+    side = np.arange(-shell, shell + 1)
+    offsets = np.stack(np.meshgrid(side, side, side, indexing="ij"), axis=-1).reshape(-1, 3)
+    distance = np.abs(offsets).max(axis=1)
+    return offsets[distance == shell if shell > 1 else distance <= 1]
+
+# =============================
+# One index per ticker snapshot, built on first use and kept as long as the ticker keeps the
+# snapshot, so a click resolves against exactly the positions the session last drew.
+# =============================
+_lock = threading.Lock()
+_indices = collections.OrderedDict()
+
+def index_for(snapshot):
+    """The PickIndex of a ticker snapshot."""
+    with _lock:
+        entry = _indices.get(id(snapshot))
+        if entry is not None and entry[0] is snapshot:
+            _indices.move_to_end(id(snapshot))
+            return entry[1]
+    index = PickIndex(snapshot)
+    with _lock:
+        # Holding the snapshot keeps its id from being reused while the entry exists
+        _indices[id(snapshot)] = (snapshot, index)
+        while len(_indices) > HISTORY:
+            _indices.popitem(last=False)
+    return index
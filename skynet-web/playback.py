@@ -0,0 +1,137 @@
+import asyncio
+import datetime
+import os
+import threading
+
+import numpy as np
+
+from .propagation import CatalogPropagator, WindowClock, itrs_to_geodetic, teme_to_itrs
+
+# Frames shown per second of playback (SKYNET_PLAYBACK_FPS overrides)
+PLAYBACK_FPS = float(os.environ.get("SKYNET_PLAYBACK_FPS", "10"))
+# Longest playback, in frames
+MAX_FRAMES = 36000
+# SGP4 evaluations per chunk: frames per chunk shrink as the number of objects grows. SGP4
+# itself runs in calls of at most propagation.MAX_CALL_WORK; this bounds the frame transforms
+# that follow, which also hold the GIL
+CHUNK_WORK = 100000
+MAX_CHUNK_FRAMES = 64
+# The first chunk is this many times smaller, so the first frame is out quickly
+FIRST_CHUNK_DIVISOR = 4
+# Playbacks computing at once per server process (SKYNET_MAX_PLAYBACKS overrides). Every one
+# keeps a worker thread busy, and the event loop shares the GIL with all of them
+MAX_PLAYBACKS = int(os.environ.get("SKYNET_MAX_PLAYBACKS", "4"))
+
+_running = 0
+_running_lock = threading.Lock()
+
+# Claim one of the MAX_PLAYBACKS slots; False when they are all taken
+def claim_slot():
+    global _running
+    with _running_lock:
+        if _running >= MAX_PLAYBACKS:
+            return False
+        _running += 1
+        return True
+
+def release_slot():
+    global _running
+    with _running_lock:
+        _running -= 1
+
+# =============================
+# FrameBuffer: lat/lon of every played object over one chunk of frames, as (objects x frames)
+# float32 arrays. Playback cycles through two of them, so memory stays at two chunks however
+# long the window is.
+# =============================
+class FrameBuffer:
+    """Reusable storage for one chunk of frames."""
+
+    def __init__(self, objects, frames):
+        self.lat = np.empty((objects, frames), dtype=np.float32)
+        self.lon = np.empty((objects, frames), dtype=np.float32)
+        self.first = 0
+        self.count = 0
+
+# =============================
+# Playback: the objects on the globe over a time window, propagated a chunk of frames at a
+# time with one SGP4 call per chunk. The next chunk is computed off the event loop while the
+# current one plays.
+# =============================
+class Playback:
+    """Frames of a set of objects from start for `count` steps of `step` seconds."""
+
+    def __init__(self, satrecs, start, step, count):
+        self.propagator = CatalogPropagator(satrecs)
+        self.start = start
+        self.step = step
+        self.count = count
+        self.clock = WindowClock(start)
+        objects = max(1, len(self.propagator))
+        self.chunk = int(np.clip(CHUNK_WORK // objects, 1, MAX_CHUNK_FRAMES))
+        self.first_chunk = max(1, self.chunk // FIRST_CHUNK_DIVISOR)
+        self._buffers = [FrameBuffer(len(self.propagator), self.chunk) for _ in range(2)]
+        # float64 SGP4 outputs of the chunk being computed; one chunk is computed at a time
+        size = len(self.propagator) * self.chunk
+        self._e = np.empty(size, dtype=np.uint8)
+        self._r = np.empty(size * 3)
+        self._v = np.empty(size * 3)
+
+    def time_at(self, frame):
+        """UTC datetime of a frame."""
+        return self.start.utc_datetime() + datetime.timedelta(seconds=frame * self.step)
+
+    # Contiguous SGP4 outputs for `frames` samples, laid over the scratch
+    def _scratch(self, frames):
+        objects = len(self.propagator)
+        size = objects * frames
+        return (
+            self._e[:size].reshape(objects, frames),
+            self._r[:size * 3].reshape(objects, frames, 3),
+            self._v[:size * 3].reshape(objects, frames, 3),
+        )
+
+    # Fill buffer with frames first .. first + count - 1
+    def _compute(self, buffer, first, count):
+        seconds = (first + np.arange(count)) * self.step
+        jd, fr_utc, fr_ut1 = self.clock.args(seconds)
+        e, r, v = self._scratch(count)
+        self.propagator.propagate_into(jd, fr_utc, e, r, v)
+        r[e != 0] = np.nan
+        lat, lon, _ = itrs_to_geodetic(teme_to_itrs(r, jd, fr_ut1))
+        buffer.lat[:, :count] = lat
+        buffer.lon[:, :count] = lon
+        buffer.first = first
+        buffer.count = count
+        return buffer
+
+    async def frames(self):
+        """(frame index, lat, lon) of every frame in order; lat/lon are views into a reused buffer."""
+        size = min(self.first_chunk, self.count)
+        pending = asyncio.ensure_future(asyncio.to_thread(self._compute, self._buffers[0], 0, size))
+        k = 0
+        try:
+            while pending is not None:
+                buffer = await pending
+                following = buffer.first + buffer.count
+                pending = None
+                if following < self.count:
+                    size = min(self.chunk, self.count - following)
+                    pending = asyncio.ensure_future(asyncio.to_thread(self._compute, self._buffers[(k + 1) % 2], following, size))
+                for j in range(buffer.count):
+                    yield buffer.first + j, buffer.lat[:, j], buffer.lon[:, j]
+                k += 1
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+# Figure groups (see figure.build_figure) of one frame. objects are (type, names, ids) in the
+# order their satrecs were given to Playback
+def frame_groups(objects, lat, lon):
+    groups = []
+    first = 0
+    for typ, names, ids in objects:
+        last = first + len(ids)
+        groups.append((typ, names, ids, lat[first:last], lon[first:last]))
+        first = last
+    return groups
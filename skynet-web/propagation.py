@@ -0,0 +1,171 @@
+import asyncio
+
+import numpy as np
+from sgp4.api import SatrecArray
+from skyfield.sgp4lib import theta_GMST1982
+
+# WGS84 ellipsoid, same constants Skyfield's wgs84 geoid uses for latlon_of()
+WGS84_RADIUS_KM = 6378.137
+WGS84_E2 = (2.0 - 1.0 / 298.257223563) / 298.257223563
+DAY_S = 86400.0
+
+# =============================
+# Time helpers: split a Skyfield Time into the pieces SGP4 and GMST need.
+# =============================
+def time_arrays(t):
+    # SGP4 epochs are UTC, so propagate with the UTC fraction (like EarthSatellite.at)
+    # and rotate TEME -> ITRS with the UT1 fraction
+    jd = np.atleast_1d(np.asarray(t.whole, dtype=float))
+    fr_utc = np.atleast_1d(np.asarray(t.tai_fraction - t._leap_seconds() / DAY_S, dtype=float))
+    fr_ut1 = np.atleast_1d(np.asarray(t.ut1_fraction, dtype=float))
+    return jd, fr_utc, fr_ut1
+
+# Maps seconds after a start Time onto the time arguments SGP4 (UTC) and the TEME -> ITRS
+# rotation (UT1) need, for scans over a window. UTC-TT and UT1-TT are held at their start
+# values, which drift by milliseconds over a day
+class WindowClock:
+    def __init__(self, t0):
+        self.jd = float(t0.whole)
+        self.tt = float(t0.tt_fraction)
+        self.utc = float(t0.tai_fraction - t0._leap_seconds() / DAY_S)
+        self.ut1 = float(t0.ut1_fraction)
+
+    def args(self, seconds):
+        days = np.asarray(seconds, dtype=float) / DAY_S
+        return np.full(days.shape, self.jd), self.utc + days, self.ut1 + days
+
+    def tt_jd(self, seconds):
+        return self.jd + self.tt + np.asarray(seconds, dtype=float) / DAY_S
+
+# =============================
+# Frame conversions on NumPy arrays. Positions are (..., 3) in kilometers.
+# =============================
+def teme_to_itrs(r, jd, fr_ut1):
+    # Rotate about z by -GMST; polar motion is ignored, matching Skyfield's defaults
+    theta, _ = theta_GMST1982(jd, fr_ut1)
+    c = np.cos(theta)
+    s = np.sin(theta)
+    x = r[..., 0] * c + r[..., 1] * s
+    y = r[..., 1] * c - r[..., 0] * s
+    return np.stack((x, y, r[..., 2]), axis=-1)
+
+def itrs_to_geodetic(r):
+    # Same fixed three-step latitude iteration as Skyfield's Geoid._compute_latitude()
+    x = r[..., 0]
+    y = r[..., 1]
+    z = r[..., 2]
+    R = np.hypot(x, y)
+    lat = np.arctan2(z, R)
+    for _ in range(3):
+        sin_lat = np.sin(lat)
+        e2_sin_lat = WGS84_E2 * sin_lat
+        aC = WGS84_RADIUS_KM / np.sqrt(1.0 - e2_sin_lat * sin_lat)
+        hyp = z + aC * e2_sin_lat
+        lat = np.arctan2(hyp, R)
+    lon = (np.arctan2(y, x) - np.pi) % (2.0 * np.pi) - np.pi
+    alt = np.sqrt(hyp * hyp + R * R) - aC
+    return np.degrees(lat), np.degrees(lon), alt
+
+def geodetic_to_itrs(lat, lon, alt):
+    # Inverse of itrs_to_geodetic(): WGS84 latitude/longitude in degrees, height in km
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    sin_lat = np.sin(lat)
+    N = WGS84_RADIUS_KM / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+    R = (N + alt) * np.cos(lat)
+    return np.stack((R * np.cos(lon), R * np.sin(lon), (N * (1.0 - WGS84_E2) + alt) * sin_lat), axis=-1)
+
+# =============================
+# CatalogPropagator: the whole catalog as consecutive SatrecArrays of BATCH_OBJECTS objects.
+# SGP4 holds the GIL for the whole of a SatrecArray call, so every call is kept to about
+# MAX_CALL_WORK object x sample evaluations (~15 ms): a propagation running in a worker
+# thread lets the event loop in between calls instead of stalling it for the whole catalog.
+# =============================
+MAX_CALL_WORK = 20000
+BATCH_OBJECTS = 256
+
+class CatalogPropagator:
+    """Vectorized SGP4 over a list of Satrec objects."""
+
+    def __init__(self, satrecs):
+        self.satrecs = list(satrecs)
+        self._arrays = [SatrecArray(self.satrecs[lo:lo + BATCH_OBJECTS]) for lo in range(0, len(self.satrecs), BATCH_OBJECTS)]
+
+    def __len__(self):
+        return len(self.satrecs)
+
+    # (lo, hi) row ranges of the SatrecArrays, in order
+    def batches(self):
+        return [(lo, min(lo + BATCH_OBJECTS, len(self))) for lo in range(0, len(self), BATCH_OBJECTS)]
+
+    # Rows lo .. hi - 1 as a propagator of their own, sharing this one's arrays; lo and hi are
+    # batch boundaries (see batches())
+    def subset(self, lo, hi):
+        subset = CatalogPropagator(())
+        subset.satrecs = self.satrecs[lo:hi]
+        subset._arrays = self._arrays[lo // BATCH_OBJECTS:-(-hi // BATCH_OBJECTS)]
+        return subset
+
+    # Raw TEME state vectors: error codes (n, m), positions and velocities (n, m, 3)
+    def propagate_teme(self, jd, fr):
+        jd = np.atleast_1d(np.asarray(jd, dtype=float))
+        fr = np.atleast_1d(np.asarray(fr, dtype=float))
+        e = np.empty((len(self), len(jd)), dtype=np.uint8)
+        r = np.empty((len(self), len(jd), 3))
+        v = np.empty((len(self), len(jd), 3))
+        self.propagate_into(jd, fr, e, r, v)
+        return e, r, v
+
+    # propagate_teme() into C-contiguous outputs of the caller: error codes e (n, m),
+    # positions r and velocities v (n, m, 3). Long time series go through in slices of samples
+    def propagate_into(self, jd, fr, e, r, v):
+        samples = max(1, MAX_CALL_WORK // BATCH_OBJECTS)
+        for array, (lo, hi) in zip(self._arrays, self.batches()):
+            if len(jd) <= samples:
+                array._sgp4(jd, fr, e[lo:hi], r[lo:hi], v[lo:hi])
+                continue
+            for first in range(0, len(jd), samples):
+                times = slice(first, first + samples)
+                e[lo:hi, times], r[lo:hi, times], v[lo:hi, times] = array.sgp4(jd[times], fr[times])
+
+    # TEME state vectors of object rows[i] at time jd[i] + fr[i], for scattered (object, time)
+    # pairs: one SGP4 call per distinct object. Returns error codes (k,), positions and velocities (k, 3)
+    def propagate_pairs(self, rows, jd, fr):
+        rows = np.asarray(rows)
+        order = np.argsort(rows, kind="stable")
+        jd_sorted = np.asarray(jd, dtype=float)[order]
+        fr_sorted = np.asarray(fr, dtype=float)[order]
+        e = np.empty(len(rows), dtype=np.uint8)
+        r = np.empty((len(rows), 3))
+        v = np.empty((len(rows), 3))
+        bounds = [0] + (np.flatnonzero(np.diff(rows[order])) + 1).tolist() + [len(rows)]
+        for first, last, row in zip(bounds[:-1], bounds[1:], rows[order[bounds[:-1]]].tolist() if len(rows) else []):
+            e[first:last], r[first:last], v[first:last] = self.satrecs[row].sgp4_array(jd_sorted[first:last], fr_sorted[first:last])
+        e[order], r[order], v[order] = e.copy(), r.copy(), v.copy()
+        return e, r, v
+
+    # function(propagator, lo, hi, *args) over every object as one shard, like
+    # ShardedPropagator.map_shards(); returns the result in a list
+    def map_shards(self, function, *args):
+        if not len(self):
+            return []
+        return [function(self, 0, len(self), *args)]
+
+    # Earth-fixed (ITRS) positions in km, shape (n, m, 3). Like EarthSatellite.at(), the
+    # SGP4 error codes are not applied: decayed objects keep whatever position SGP4 returned
+    def itrs_at(self, t):
+        jd, fr_utc, fr_ut1 = time_arrays(t)
+        _, r, _ = self.propagate_teme(jd, fr_utc)
+        return teme_to_itrs(r, jd, fr_ut1)
+
+    # Geodetic latitude/longitude in degrees and altitude in km for every object at time t
+    def geodetic_at(self, t):
+        r = self.itrs_at(t)
+        lat, lon, alt = itrs_to_geodetic(r)
+        if np.ndim(t.whole) == 0:
+            return lat[:, 0], lon[:, 0], alt[:, 0]
+        return lat, lon, alt
+
+    # Awaitable geodetic_at(), run off the event loop thread
+    async def geodetic_at_async(self, t):
+        return await asyncio.to_thread(self.geodetic_at, t)
@@ -0,0 +1,46 @@
+import os
+from dataclasses import dataclass, replace
+
+# Most redraws per second of one session (SKYNET_REDRAW_FPS overrides)
+REDRAW_FPS = float(os.environ.get("SKYNET_REDRAW_FPS", "10"))
+# How long a redraw with nothing new to draw waits for the next ticker snapshot before it is
+# dropped; the globe then stays as it is until the next event
+IDLE_WAIT = 10.0
+# A pending redraw older than this is assumed lost (its task died) and no longer absorbs requests
+STALE_AFTER = IDLE_WAIT + 5.0
+
+# =============================
+# RedrawSchedule: per-session redraw bookkeeping. Redraw requests (relayout, after_plot,
+# relayouting) are folded into one pending flush, flushes are spaced to REDRAW_FPS, and a
+# flush whose inputs match the last drawn ones does no work.
+# =============================
+@dataclass(frozen=True)
+class RedrawSchedule:
+    """When this session last redrew, what it drew, and whether a flush is pending."""
+    # A flush is scheduled or running; requests until it runs are folded into it
+    pending: bool = False
+    # Monotonic time the pending flush was requested
+    since: float = 0.0
+    # Monotonic time of the last redraw
+    last: float = 0.0
+    # Inputs of the last redraw (see State._redraw_inputs)
+    drawn: tuple = ()
+
+    # Register a request at monotonic time now. Returns the new schedule and whether a flush
+    # has to be started; otherwise the request is folded into the pending one
+    def request(self, now):
+        if self.pending and now - self.since < STALE_AFTER:
+            return self, False
+        return replace(self, pending=True, since=now), True
+
+    # Seconds until the next redraw may run
+    def delay(self, now, fps=REDRAW_FPS):
+        return max(0.0, self.last + 1.0 / fps - now)
+
+    # The pending flush has run; later requests start a new one
+    def flushed(self):
+        return replace(self, pending=False)
+
+    # A redraw of `inputs` happened at monotonic time now
+    def drew(self, inputs, now):
+        return replace(self, last=now, drawn=inputs)
@@ -0,0 +1,184 @@
+import asyncio
+import email.utils
+import json
+import os
+import pathlib
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pandas as pd
+from reflex.utils import console
+
+from .archive import archive
+from .catalog import get_catalog, publish_catalog
+from .catalog_cache import fingerprint, read_catalog
+from .filters import filters_for
+
+# Element sets are fetched from here; point it at a local server to test without CelesTrak
+CELESTRAK_URL = os.environ.get("SKYNET_CELESTRAK_URL", "https://celestrak.org/NORAD/elements/gp.php")
+# Seconds between conditional fetches of each group (SKYNET_REFRESH_INTERVAL overrides)
+REFRESH_INTERVAL = float(os.environ.get("SKYNET_REFRESH_INTERVAL", "3600"))
+# Seconds to wait for CelesTrak before giving up on a fetch
+FETCH_TIMEOUT = 60.0
+# Local copies of the downloaded groups
+DATABASE = pathlib.Path("databases")
+# Catalog type -> (CelesTrak group, local file)
+GROUPS = {
+    "Satellite": ("active", "active_satellites.csv"),
+    "Station": ("stations", "stations.csv"),
+}
+
+def group_url(group, base=None):
+    return f"{base or CELESTRAK_URL}?GROUP={group}&FORMAT=csv"
+
+# =============================
+# Conditional fetch: the ETag and Last-Modified of each download are kept next to the compiled
+# catalog cache, so an unchanged group costs one request answered with 304 Not Modified.
+# =============================
+def _validators_path(path):
+    path = pathlib.Path(path)
+    return path.parent / ".cache" / f"{path.stem}.http.json"
+
+def _read_validators(path):
+    try:
+        return json.loads(_validators_path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _write_validators(path, validators):
+    meta = _validators_path(path)
+    meta.parent.mkdir(exist_ok=True)
+    meta.write_text(json.dumps(validators))
+
+# Seconds since `path` was last checked against the server (or modified, if never checked)
+def seconds_since_check(path):
+    checked = _read_validators(path).get("checked")
+    if checked is None:
+        try:
+            checked = os.stat(path).st_mtime
+        except OSError:
+            return float("inf")
+    return time.time() - checked
+
+def fetch_if_changed(url, path):
+    """Download url to path unless the server reports it unchanged. Returns True when the file changed."""
+    path = pathlib.Path(path)
+    validators = _read_validators(path) if path.exists() else {}
+    request = urllib.request.Request(url)
+    if validators.get("etag"):
+        request.add_header("If-None-Match", validators["etag"])
+    if validators.get("last_modified"):
+        request.add_header("If-Modified-Since", validators["last_modified"])
+    elif path.exists():
+        request.add_header("If-Modified-Since", email.utils.formatdate(os.stat(path).st_mtime, usegmt=True))
+
+    try:
+        with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            body = response.read()
+            headers = response.headers
+    except urllib.error.HTTPError as error:
+        if error.code != 304:
+            raise
+        validators["checked"] = time.time()
+        _write_validators(path, validators)
+        return False
+
+    changed = not path.exists() or path.read_bytes() != body
+    if changed:
+        # Readers never see a half-written file
+        partial = path.with_suffix(path.suffix + ".part")
+        partial.write_bytes(body)
+        os.replace(partial, path)
+    _write_validators(path, {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "checked": time.time(),
+    })
+    return changed
+
+# =============================
+# Refresh pipeline: fetch the groups that are due, then rebuild the shared catalog from the
+# previous one (only new or changed element sets are initialized, see build_catalog),
+# write only the changed rows to the database and append the new element sets to the archive
+# (see archive.py). Sessions pick up the new version on their next redraw.
+#
+# Whether to rebuild is decided by the files on disk, not by what this round downloaded: a
+# round that fails after a fetch (or in the store) leaves the fingerprints of the last
+# completed round behind, so the next one still sees the change and finishes it.
+# =============================
+_refresh_lock = threading.Lock()
+# Fingerprints (see file_fingerprints) of the files behind the catalog that was last loaded,
+# published, stored and archived in full; None while a round is unfinished
+_applied = None
+
+def catalog_paths():
+    return {typ: DATABASE / filename for typ, (_, filename) in GROUPS.items()}
+
+# Served from the compiled, memory-mapped cache; rebuilt when a CSV changes
+def read_frames():
+    return {typ: read_catalog(path) for typ, path in catalog_paths().items()}
+
+# sha256 of every group file on disk
+def file_fingerprints():
+    return {typ: fingerprint(path) for typ, path in catalog_paths().items()}
+
+def _fetch_due(interval, base):
+    refreshed = False
+    for group, filename in GROUPS.values():
+        path = DATABASE / filename
+        if seconds_since_check(path) >= interval:
+            refreshed = fetch_if_changed(group_url(group, base), path) or refreshed
+    return refreshed
+
+def refresh_files(interval=REFRESH_INTERVAL, base=None):
+    """Conditionally fetch every group not checked in the last `interval` seconds. Returns True when any file changed."""
+    with _refresh_lock:
+        return _fetch_due(interval, base)
+
+def load_frames(store):
+    """The frames on disk for the first load of the catalog, stored in full."""
+    global _applied
+    with _refresh_lock:
+        fingerprints = file_fingerprints()
+        frames = read_frames()
+        store(pd.concat(frames.values(), ignore_index=True))
+        _applied = fingerprints
+        return frames
+
+def refresh_catalog(store, interval=REFRESH_INTERVAL, base=None):
+    """Fetch what is due and, if the files differ from the last completed round, publish and store a new catalog. Returns it, or None."""
+    global _applied
+    with _refresh_lock:
+        _fetch_due(interval, base)
+        if get_catalog() is None:
+            return None
+        fingerprints = file_fingerprints()
+        if fingerprints == _applied:
+            return None
+        # After an unfinished round the database may lag the catalog the diff is taken
+        # against, so everything is stored; unchanged rows are skipped
+        complete, _applied = _applied is not None, None
+        catalog = publish_catalog(read_frames())
+        if catalog.diff is None or not complete:
+            store(catalog.elements)
+        else:
+            store(catalog.elements.iloc[catalog.diff.rows], catalog.diff.removed_ids)
+        archive.record(catalog)
+        _applied = fingerprints
+        return catalog
+
+# Lifespan task: refresh on a fixed cadence, off the event loop thread. A failed fetch is
+# reported and retried on the next round; the current catalog keeps being served meanwhile
+async def run(store, interval=REFRESH_INTERVAL):
+    while True:
+        try:
+            catalog = await asyncio.to_thread(refresh_catalog, store, interval)
+            if catalog is not None:
+                console.info(f"Catalog refreshed to version {catalog.version}: {catalog.diff}")
+                # Build the filter index here rather than in the first redraw of the new version
+                await asyncio.to_thread(filters_for, catalog)
+        except (OSError, ValueError) as error:
+            console.warn(f"Catalog refresh failed: {error}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,272 @@
+import asyncio
+import atexit
+import collections
+import concurrent.futures
+import contextlib
+import os
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+from .catalog import SGP4_ARGUMENTS, satrecs_from_arguments, sgp4_arguments
+from .propagation import CatalogPropagator, itrs_to_geodetic, teme_to_itrs, time_arrays
+
+# Worker processes for catalog propagation (SKYNET_PROPAGATION_WORKERS overrides; 1 disables sharding)
+WORKERS = int(os.environ.get("SKYNET_PROPAGATION_WORKERS", os.cpu_count() or 1))
+# Catalogs smaller than this are always propagated in-process
+SHARD_MIN_OBJECTS = 20000
+# Calls with fewer object x sample evaluations than this run in-process; below it the
+# round trip to the workers costs more than it saves
+SHARD_MIN_WORK = 200000
+# Catalog versions whose shared element sets are kept alive
+VERSIONS_KEPT = 2
+
+# =============================
+# Worker side. Each worker process always serves the same shard, so it builds that shard's
+# Satrec objects once per catalog version from the sgp4init arguments in shared memory and
+# writes every result straight into the caller's shared output arrays.
+# =============================
+_worker_propagators = collections.OrderedDict()
+
+def _attach(name):
+    # Blocks are only ever attached here; the parent owns and unlinks them
+    return shared_memory.SharedMemory(name=name)
+
+# Shards of one-off propagators (keep=False, see ShardedPropagator) are built for the call
+# and not cached, so they never push out the live catalog's
+def _shard_propagator(elements_name, count, lo, hi, keep=True):
+    key = (elements_name, lo, hi)
+    propagator = _worker_propagators.get(key)
+    if propagator is None:
+        block = _attach(elements_name)
+        arguments = np.ndarray((count, len(SGP4_ARGUMENTS)), dtype=float, buffer=block.buf)
+        propagator = CatalogPropagator(satrecs_from_arguments(arguments[lo:hi]))
+        # A block cannot be closed while arrays still point into it
+        del arguments
+        block.close()
+        if not keep:
+            return propagator
+        _worker_propagators[key] = propagator
+        while len(_worker_propagators) > VERSIONS_KEPT:
+            _worker_propagators.popitem(last=False)
+    return propagator
+
+def _propagate_shard(elements_name, count, lo, hi, keep, output_name, jd, fr):
+    propagator = _shard_propagator(elements_name, count, lo, hi, keep)
+    block = _attach(output_name)
+    e, r, v = _output_views(block, count, len(jd))
+    # The shard's rows of the shared block are contiguous, so they are filled in place
+    propagator.propagate_into(jd, fr, e[lo:hi], r[lo:hi], v[lo:hi])
+    del e, r, v
+    block.close()
+
+# Any other per-shard work: function(propagator of the shard's rows, lo, hi, *args), run where
+# the shard's Satrec objects already are
+def _run_on_shard(elements_name, count, lo, hi, keep, function, args):
+    return function(_shard_propagator(elements_name, count, lo, hi, keep), lo, hi, *args)
+
+# Error codes (n, m), positions and velocities (n, m, 3) laid out in one shared block
+def _output_views(block, count, samples):
+    vectors = count * samples * 3 * 8
+    r = np.ndarray((count, samples, 3), dtype=float, buffer=block.buf, offset=0)
+    v = np.ndarray((count, samples, 3), dtype=float, buffer=block.buf, offset=vectors)
+    e = np.ndarray((count, samples), dtype=np.uint8, buffer=block.buf, offset=2 * vectors)
+    return e, r, v
+
+def _output_size(count, samples):
+    return max(1, count * samples * (2 * 3 * 8 + 1))
+
+# =============================
+# Process-wide worker pool: one single-process executor per shard, so shard k always lands on
+# the worker that already holds its Satrec objects.
+# =============================
+class ShardPool:
+    """Pinned worker processes, created on first use."""
+
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self._executors = None
+        self._lock = threading.Lock()
+
+    def executors(self):
+        with self._lock:
+            if self._executors is None:
+                self._executors = [concurrent.futures.ProcessPoolExecutor(max_workers=1) for _ in range(self.workers)]
+            return self._executors
+
+    def shutdown(self):
+        with self._lock:
+            executors, self._executors = self._executors, None
+        for executor in executors or ():
+            executor.shutdown()
+
+pool = ShardPool()
+
+# =============================
+# ShardedPropagator: a drop-in for CatalogPropagator.propagate_teme() over a whole catalog,
+# split into contiguous shards across the pool. The catalog's element sets go to the workers
+# once, through shared memory; results come back through one shared output block.
+# =============================
+class ShardedPropagator:
+    """Catalog propagation sharded across worker processes."""
+
+    def __init__(self, catalog, shard_pool=pool):
+        self.version = catalog.version
+        self.local = catalog.propagator
+        self.pool = shard_pool
+        arguments = sgp4_arguments(catalog.elements)
+        self._elements = shared_memory.SharedMemory(create=True, size=max(1, arguments.nbytes))
+        np.ndarray(arguments.shape, dtype=float, buffer=self._elements.buf)[:] = arguments
+        self._count = len(arguments)
+        bounds = np.linspace(0, self._count, shard_pool.workers + 1).astype(int)
+        self.shards = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        # Archive catalogs (negative versions, see archive.py) are propagated once per use,
+        # so the workers do not keep their Satrec objects
+        self._keep = catalog.version >= 0
+        # Users inside propagator_for(), and whether the propagator has left the cache; the
+        # shared element sets go away once both say so (see _close_if_unused())
+        self._users = 0
+        self._retired = False
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._elements.close()
+        self._elements.unlink()
+
+    def _submit(self, jd, fr):
+        output = shared_memory.SharedMemory(create=True, size=_output_size(self._count, len(jd)))
+        futures = [
+            executor.submit(_propagate_shard, self._elements.name, self._count, lo, hi, self._keep, output.name, jd, fr)
+            for executor, (lo, hi) in zip(self.pool.executors(), self.shards)
+        ]
+        return output, futures
+
+    # Copy the gathered results out of the shared block and release it
+    def _collect(self, output, samples):
+        e, r, v = (view.copy() for view in _output_views(output, self._count, samples))
+        self._release(output)
+        return e, r, v
+
+    def _release(self, output):
+        output.close()
+        output.unlink()
+
+    def _is_small(self, jd):
+        return self._count * len(jd) < SHARD_MIN_WORK
+
+    # Raw TEME state vectors: error codes (n, m), positions and velocities (n, m, 3)
+    def propagate_teme(self, jd, fr):
+        jd = np.atleast_1d(np.asarray(jd, dtype=float))
+        fr = np.atleast_1d(np.asarray(fr, dtype=float))
+        if self._is_small(jd):
+            return self.local.propagate_teme(jd, fr)
+        output, futures = self._submit(jd, fr)
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            # Let the other shards finish writing before the block goes away
+            concurrent.futures.wait(futures)
+            self._release(output)
+            raise
+        return self._collect(output, len(jd))
+
+    # Awaitable propagate_teme(): the event loop is free while the workers run
+    async def propagate_teme_async(self, jd, fr):
+        jd = np.atleast_1d(np.asarray(jd, dtype=float))
+        fr = np.atleast_1d(np.asarray(fr, dtype=float))
+        if self._is_small(jd):
+            return await asyncio.to_thread(self.local.propagate_teme, jd, fr)
+        output, futures = self._submit(jd, fr)
+        try:
+            await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        except BaseException:
+            await asyncio.to_thread(concurrent.futures.wait, futures)
+            self._release(output)
+            raise
+        return await asyncio.to_thread(self._collect, output, len(jd))
+
+    def _map(self, function, args):
+        return [
+            executor.submit(_run_on_shard, self._elements.name, self._count, lo, hi, self._keep, function, args)
+            for executor, (lo, hi) in zip(self.pool.executors(), self.shards)
+        ]
+
+    # function(propagator of the shard's rows, lo, hi, *args) on every shard's worker; the
+    # function and its arguments must pickle. Returns the results in shard order
+    def map_shards(self, function, *args):
+        return [future.result() for future in self._map(function, args)]
+
+    # Awaitable map_shards(): the event loop is free while the workers run
+    async def map_shards_async(self, function, *args):
+        return await asyncio.gather(*(asyncio.wrap_future(future) for future in self._map(function, args)))
+
+    # Geodetic latitude/longitude in degrees and altitude in km for every object at time t,
+    # like CatalogPropagator.geodetic_at()
+    def geodetic_at(self, t):
+        jd, fr_utc, fr_ut1 = time_arrays(t)
+        _, r, _ = self.propagate_teme(jd, fr_utc)
+        return _geodetic(r, jd, fr_ut1, t)
+
+    async def geodetic_at_async(self, t):
+        jd, fr_utc, fr_ut1 = time_arrays(t)
+        _, r, _ = await self.propagate_teme_async(jd, fr_utc)
+        return await asyncio.to_thread(_geodetic, r, jd, fr_ut1, t)
+
+def _geodetic(r, jd, fr_ut1, t):
+    lat, lon, alt = itrs_to_geodetic(teme_to_itrs(r, jd, fr_ut1))
+    if np.ndim(t.whole) == 0:
+        return lat[:, 0], lon[:, 0], alt[:, 0]
+    return lat, lon, alt
+
+# =============================
+# One sharded propagator per live catalog version, kept for the last VERSIONS_KEPT versions.
+# Callers hold it for the length of a `with propagator_for(catalog)` block, and an evicted
+# propagator only unlinks its shared element sets once the last of them is done, so a call
+# in flight never loses its inputs. Archive catalogs get a propagator of their own for the
+# block instead of a place in the cache. Small catalogs and single-worker setups get the
+# catalog's own in-process propagator.
+# =============================
+_lock = threading.Lock()
+_propagators = collections.OrderedDict()
+
+# Called with _lock held
+def _close_if_unused(propagator):
+    if propagator._retired and not propagator._users:
+        propagator.close()
+
+@contextlib.contextmanager
+def propagator_for(catalog, min_objects=SHARD_MIN_OBJECTS):
+    """The propagator to use for bulk work on a catalog, for the length of the with block:
+    sharded when it has at least min_objects objects, else catalog.propagator."""
+    if pool.workers <= 1 or len(catalog) < min_objects:
+        yield catalog.propagator
+        return
+    if catalog.version < 0:
+        propagator = ShardedPropagator(catalog)
+        propagator._retired = True
+    with _lock:
+        if catalog.version >= 0:
+            propagator = _propagators.get(catalog.version)
+            if propagator is None:
+                propagator = _propagators[catalog.version] = ShardedPropagator(catalog)
+                while len(_propagators) > VERSIONS_KEPT:
+                    _, evicted = _propagators.popitem(last=False)
+                    evicted._retired = True
+                    _close_if_unused(evicted)
+        propagator._users += 1
+    try:
+        yield propagator
+    finally:
+        with _lock:
+            propagator._users -= 1
+            _close_if_unused(propagator)
+
+@atexit.register
+def _close_all():
+    with _lock:
+        while _propagators:
+            _, propagator = _propagators.popitem()
+            propagator.close()
@@ -0,0 +1,85 @@
+import collections
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from .propagation import geodetic_to_itrs
+from .ticker import HISTORY
+
+# Objects lower than this (degrees) are left out of the sky view (SKYNET_SKY_MIN_ELEVATION overrides)
+SKY_MIN_ELEVATION = float(os.environ.get("SKYNET_SKY_MIN_ELEVATION", "10"))
+
+@dataclass(frozen=True)
+class SkyView:
+    """Objects above the minimum elevation for one observer and snapshot, highest first."""
+    rows: np.ndarray
+    azimuth: np.ndarray
+    elevation: np.ndarray
+    range_km: np.ndarray
+
+    def __len__(self):
+        return len(self.rows)
+
+# Earth-fixed position (km) of an observer and its local east, north and up unit vectors
+def _axes(observer):
+    position, up = observer.itrs()
+    lat = np.radians(observer.lat)
+    lon = np.radians(observer.lon)
+    east = np.array([-np.sin(lon), np.cos(lon), 0.0])
+    north = np.array([-np.sin(lat) * np.cos(lon), -np.sin(lat) * np.sin(lon), np.cos(lat)])
+    return position, east, north, up
+
+# =============================
+# Earth-fixed positions of every object of one ticker snapshot, shared by all observers and
+# kept as long as the ticker keeps the snapshot.
+# =============================
+_lock = threading.Lock()
+_positions = collections.OrderedDict()
+
+def positions_for(snapshot):
+    """(objects x 3) ITRS positions in km of a ticker snapshot."""
+    with _lock:
+        entry = _positions.get(id(snapshot))
+        if entry is not None and entry[0] is snapshot:
+            _positions.move_to_end(id(snapshot))
+            return entry[1]
+    xyz = geodetic_to_itrs(snapshot.lat, snapshot.lon, snapshot.alt)
+    xyz.flags.writeable = False
+    with _lock:
+        # Holding the snapshot keeps its id from being reused while the entry exists
+        _positions[id(snapshot)] = (snapshot, xyz)
+        while len(_positions) > HISTORY:
+            _positions.popitem(last=False)
+    return xyz
+
+# =============================
+# Topocentric view: a horizon-plane test (one dot product per object) keeps only what is
+# above the observer's horizon, then azimuth, elevation and range are computed for those
+# candidates alone.
+# =============================
+def look(snapshot, observer, min_elevation=SKY_MIN_ELEVATION, mask=None):
+    """What `observer` (a passes.Observer) sees above min_elevation in a snapshot, limited to
+    the rows set in an optional boolean mask over the catalog."""
+    xyz = positions_for(snapshot)
+    position, east, north, up = _axes(observer)
+    above = xyz @ up > position @ up
+    if mask is not None:
+        above &= mask
+    rows = np.flatnonzero(above)
+
+    rho = xyz[rows] - position
+    e = rho @ east
+    n = rho @ north
+    u = rho @ up
+    range_km = np.sqrt(e * e + n * n + u * u)
+    elevation = np.degrees(np.arcsin(u / range_km))
+    keep = elevation >= min_elevation
+    order = np.argsort(-elevation[keep], kind="stable")
+    return SkyView(
+        rows=rows[keep][order],
+        azimuth=(np.degrees(np.arctan2(e[keep], n[keep])) % 360.0)[order],
+        elevation=elevation[keep][order],
+        range_km=range_km[keep][order],
+    )
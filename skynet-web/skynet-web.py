@@ -1,42 +1,107 @@
+import asyncio
+import datetime
 import csv
 import time
-import pathlib
 import sqlalchemy
 import reflex as rx
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from skyfield.api import wgs84
 from skyfield.api import load
-from skyfield.api import EarthSatellite
 from rxconfig import config
-from sgp4.api import Satrec, WGS72
-
-# =============================
-# Database model for satellites and stations. Uses NORAD ID as primary key.
-# =============================
-class db(rx.Model, table=True): #Using NORAD ID as primary key - merging with default id
-    
-    OBJECT_NAME: str
-    OBJECT_ID: str
-    EPOCH: str
-    MEAN_MOTION: str
-    ECCENTRICITY: str
-    INCLINATION: str
-    RA_OF_ASC_NODE: str
-    ARG_OF_PERICENTER: str
-    MEAN_ANOMALY: str
-    EPHEMERIS_TYPE: str
-    CLASSIFICATION_TYPE: str
-    ELEMENT_SET_NO: str
-    REV_AT_EPOCH: str
-    BSTAR: str
-    MEAN_MOTION_DOT: str
-    MEAN_MOTION_DDOT: str
+from .models import db
+from .globe import globe
+from .catalog import get_catalog, ensure_catalog
+from .refresh import load_frames, refresh_catalog
+from . import refresh
+from .ingest import ingest_catalog
+from .ticker import ticker
+from .figure import build_figure, coordinates, structure_key, wire_key
+from .viewport import Viewport
+from .conjunctions import upcoming
+from .pick import NEAR_RADIUS_DEGREES, index_for
+from .tracks import TRACK_ORBITS, tracks
+from .custom import custom_set, elements_digest, form_elements, import_custom, read_elements
+from . import metrics
+from .redraw import IDLE_WAIT, REDRAW_FPS, STALE_AFTER, RedrawSchedule
+from .playback import MAX_FRAMES, MAX_PLAYBACKS, PLAYBACK_FPS, Playback, claim_slot, frame_groups, release_slot
+from .filters import BANDS, REGIMES, Selection, filters_for, selection_from_form
+from .passes import Observer, predict_passes
+from . import sky
+from .figure import build_sky_figure, sky_coordinates
+from .archive import MAX_GAP_DAYS, archive
+from . import coverage
 
     # Skyfield timescale object for all orbital calculations (universal time reference)
 timescale = load.timescale()
 
+# Number of closest encounters highlighted on the globe
+CONJUNCTIONS_SHOWN = 25
+# Number of objects listed by "what is near this point"
+NEARBY_LISTED = 20
+# Number of rejected records listed after a custom satellite import
+IMPORT_REJECTS_LISTED = 20
+# Hours ahead searched for passes over the browser location, and passes listed
+PASS_HOURS = 6.0
+PASSES_LISTED = 20
+# Filter group of custom satellites added through the form
+CUSTOM_FORM_GROUP = "Added by hand"
+# Coverage heatmap modes: off, the current tick, and the average over coverage.AVERAGE_HOURS
+COVERAGE_MODES = ("Off", "Now", f"{coverage.AVERAGE_HOURS:g} h average")
+# Browser location as [latitude, longitude, altitude in m], or why there is none
+GEOLOCATE = (
+    "new Promise((resolve) => navigator.geolocation"
+    " ? navigator.geolocation.getCurrentPosition("
+    "(p) => resolve([p.coords.latitude, p.coords.longitude, p.coords.altitude ?? 0]), "
+    "(e) => resolve(e.message), {timeout: 10000})"
+    " : resolve('this browser does not share its location'))"
+)
+
+# Upserts the catalog (or, given removed ids, a delta of it) into the database in a single
+# transaction; only changed rows are written
+def store_catalog(elements, removed=None):
+    with rx.session() as session:
+        report = ingest_catalog(session, elements, removed)
+        session.commit()
+    return report
+
+# Validates, initializes and stores custom element sets in a single transaction
+def store_custom(elements, rejected=()):
+    with rx.session() as session:
+        added = import_custom(session, elements, rejected)
+        session.commit()
+    return added
+
+# Makes sure the shared catalog is loaded and current
+# The first mount in the process loads the CSVs into the process-wide catalog; later mounts
+# reuse it. Groups not checked within REFRESH_INTERVAL are fetched conditionally first; the
+# refresh task (see refresh.run) keeps them current afterwards. Whatever is served ends up in
+# the element set archive
+def load_catalog():
+    def first_load():
+        #Remove custom sats stored by a previous run of the server
+        with rx.session() as session:
+            session.execute(
+                sqlalchemy.text(
+                    "DELETE FROM db "
+                    "WHERE id > 100000"
+                )
+            )
+            session.commit()
+        # Bring the database in line with the files on disk; unchanged rows are
+        # skipped, so this is cheap when the table is already current
+        return load_frames(store_catalog)
+    
+    try:
+        catalog = refresh_catalog(store_catalog)
+    except OSError:
+        # CelesTrak unreachable: serve the files on disk, the refresh task retries later
+        catalog = None
+    catalog = catalog or ensure_catalog(first_load)
+    archive.record(catalog)
+    return catalog
+
 # =============================
 # State: The reactive heart of the app. Holds all live data, toggles, and event handlers.
 # =============================
@@ -45,20 +110,74 @@ class State(rx.State):
     details: str = ''
     isclicked: bool = False
     db_data: list[db]
-    sats: pd.DataFrame
-    station: pd.DataFrame
-    colnames: list = []
-    custom_data: list = []
-    custom: list = []
+    # Version of the shared catalog this session last drew; the element sets themselves live in catalog.py
+    catalog_version: int = 0
     form_error: bool = False
-    satellites: list = []
-    stations: list = []
     show_satellites: bool = True
     show_stations: bool = True
+    show_conjunctions: bool = False
+    show_tracks: bool = True
+    # True while the shared conjunction screen is running for this session
+    screening: bool = False
+    # Closest upcoming encounters, highlighted on the globe when show_conjunctions is on
+    conjunctions: list[dict] = []
     relayout: bool = True
-    # DataFrame for plotting satellite positions on the globe
-    df: pd.DataFrame
-    # Main Plotly figure for the interactive globe
+    # Element rows of the user's custom satellites, the import group of each and a digest of
+    # both; their propagator and filter index are built from these (see custom.custom_set())
+    _custom_elements: list[dict] = []
+    _custom_types: list[str] = []
+    _custom_digest: str = ""
+    # Import groups of the custom satellites, offered in the filter dialog
+    custom_groups: list[str] = []
+    # Regime, inclination, launch year, constellation and custom group filters
+    _filter: Selection = Selection()
+    # Constellations of the current catalog, offered in the filter dialog
+    constellation_options: list[str] = []
+    # How many objects the filters let through, or "" with no filter set
+    filter_summary: str = ""
+    # Observer mode: a polar plot of what is above the browser's location (see sky.py)
+    sky_on: bool = False
+    sky_summary: str = ""
+    _observer: Observer | None = None
+    # Per-trace points of the sky plot; its skeleton never changes
+    sky_fig: go.Figure = build_sky_figure()
+    sky_coords: list[dict] = []
+    # Snapshot (version, TT) the sky plot shows, and when its pending update was scheduled (0: none)
+    _sky_drawn: tuple = ()
+    _sky_pending: float = 0.0
+    # True while the passes over the browser location are being predicted
+    predicting: bool = False
+    # Per-trace lat/lon arrays; the only part of the globe sent on every redraw
+    coords: list[dict] = []
+    # What the current figure skeleton was built for
+    _figure_key: tuple = ()
+    # Rotation and zoom of the globe from the last relayout event
+    _viewport: Viewport = Viewport()
+    # Catalog version and TT of the ticker snapshot last drawn, which clicks resolve against
+    _rendered: tuple = ()
+    # NORAD id of the catalog object whose ground track is drawn, or 0
+    _track_id: int = 0
+    # Pending redraw, time and inputs of the last one (see redraw.py)
+    _redraws: RedrawSchedule = RedrawSchedule()
+    # A time window is being played back instead of the live globe (see playback.py)
+    playing: bool = False
+    # UTC time of the frame on screen during playback
+    playback_time: str = ""
+    # Bumped by every start and stop, so a superseded playback task ends
+    _playback_run: int = 0
+    # ISO UTC time of the archived catalog shown instead of the live one, or "" (see
+    # archive.snapshot(), which holds the snapshot itself)
+    _history_at: str = ""
+    # UTC time of the archived catalog on screen, or "" for the live globe
+    history_time: str = ""
+    # Coverage heatmap mode (one of COVERAGE_MODES) and what the heatmap shows
+    coverage_mode: str = COVERAGE_MODES[0]
+    coverage_summary: str = ""
+    # Averaged coverage grid of the objects shown when it was asked for, once computed
+    _coverage_average: np.ndarray | None = None
+    # True while the averaged grid is being computed
+    averaging: bool = False
+    # Main Plotly figure for the interactive globe (skeleton: traces, names, ids, styling)
     fig: go.Figure = px.scatter_geo(
         pd.DataFrame(columns=["lat", "lon"]),
         lat="lat",
@@ -69,246 +188,730 @@ class State(rx.State):
         height=1000
     )
     
-    # Handles user submission of custom satellite data and adds it to the system
+    # Handles user submission of custom satellite data and adds it to the system; the form is
+    # a one-record import
     @rx.event
+    @metrics.timed
     def handle_submit(self, form_data: dict):
-        self.custom_data = self.custom_data + [form_data]
-        
-        satnum = 100000 + len(self.custom_data) #To not conflict with existing norad_ids
+        try:
+            added = store_custom(form_elements(form_data))
+        except ValueError as error:
+            self.form_error = True
+            self._report_import(None, [(form_data.get("name", ""), str(error))])
+            return
+        self.form_error = False
+        self._add_custom(added, CUSTOM_FORM_GROUP)
+        if added.rejected:
+            self._report_import(added, added.rejected)
+    
+    # Bulk import of custom satellites from uploaded TLE, OMM CSV, OMM JSON or OMM XML files.
+    # All records are validated, initialized and stored in one batch off the event loop, then
+    # added to the custom propagator in one step and drawn with a single redraw
+    @rx.event
+    @metrics.timed
+    async def handle_upload(self, files: list[rx.UploadFile]):
+        frames = []
+        read = []
+        rejected = []
+        for file in files:
+            try:
+                frame, skipped = read_elements(file.name or "", await file.read())
+            except ValueError as error:
+                rejected.append((file.name, str(error)))
+                continue
+            frames.append(frame)
+            read.append(file.name or "upload")
+            rejected.extend(skipped)
         
-        with rx.session() as session:
-            session.execute(
-                sqlalchemy.text(
-                    f"INSERT INTO db ({", ".join(self.colnames)}) ",
-                    f"Values({satnum}, {form_data["name"]}, 'customsat-{satnum}', {form_data["epoch"]}, {form_data["no_kozai"]} {form_data["ecco"]}, {form_data["inclo"]}, {form_data["nodeo"]}, {form_data["argpo"]}, {form_data["mo"]}, '0', 'U', '999', '0', {form_data["bstar"]}, {form_data["ndot"]}, {form_data["nddot"]})"
-                )
-            )
-            session.commit()
-
-        satrec = Satrec()
-        satrec.sgp4init(
-            WGS72,
-            'i',
-            satnum,
-            float(form_data["epoch"]),
-            float(form_data["bstar"]),
-            float(form_data["ndot"]),
-            float(form_data["nddot"]),
-            float(form_data["ecco"]),
-            float(form_data["argpo"]),
-            float(form_data["inclo"]),
-            float(form_data["mo"]),
-            float(form_data["no_kozai"]),
-            float(form_data["nodeo"]),
-        )
-        earth_sat = EarthSatellite.from_satrec(satrec, timescale)
-        self.custom = self.custom + [(form_data["name"], earth_sat)]
+        added = None
+        if frames:
+            try:
+                added = await asyncio.to_thread(store_custom, pd.concat(frames, ignore_index=True), rejected)
+                rejected = added.rejected
+            except ValueError as error:
+                rejected.append(("import", str(error)))
+        if added is not None:
+            self._add_custom(added, ", ".join(read))
+        self._report_import(added, rejected)
+    
+    # Adds stored custom satellites to this session's custom set, as one filter group, and draws them
+    def _add_custom(self, added, group):
+        if not len(added):
+            return
+        self._custom_elements = self._custom_elements + added.elements.to_dict("records")
+        self._custom_types = self._custom_types + [group] * len(added)
+        self._custom_digest = elements_digest(self._custom_elements, self._custom_types)
+        if group not in self.custom_groups:
+            self.custom_groups = self.custom_groups + [group]
+        self._update_filter_summary()
         self.create_map()
     
+    # Catalog object types toggled on
+    def _shown_types(self):
+        return [typ for typ, shown in (("Satellite", self.show_satellites), ("Station", self.show_stations)) if shown]
+    
+    # Catalog rows of one type that the toggles and filters let through
+    def _shown_rows(self, catalog, typ):
+        shown = {"Satellite": self.show_satellites, "Station": self.show_stations}.get(typ, True)
+        return filters_for(catalog).rows(self._filter, (typ,) if shown else ())
+    
+    # Propagator, filter index, names and ids of the custom satellites, or None without any
+    def _custom(self):
+        if not self._custom_elements:
+            return None
+        return custom_set(self.router.session.client_token, self._custom_digest, self._custom_elements, self._custom_types)
+    
+    # Positions in the custom satellite lists that the filters let through
+    def _shown_custom(self):
+        custom = self._custom()
+        if custom is None:
+            return np.empty(0, dtype=np.int64)
+        return custom.index.rows(self._filter, self._filter.groups or custom.index.types)
+    
+    def _update_filter_summary(self):
+        if not self._filter:
+            self.filter_summary = ""
+            return
+        catalog = get_catalog()
+        shown = total = 0
+        if catalog is not None:
+            shown = sum(len(self._shown_rows(catalog, typ)) for typ in ("Satellite", "Station"))
+            total = len(catalog)
+        shown += len(self._shown_custom())
+        total += len(self._custom_elements)
+        self.filter_summary = f"Filters: {shown:,} of {total:,} objects"
+    
+    # Apply the filter dialog: regime and inclination checkboxes, launch year range,
+    # constellation and custom group
+    @rx.event
+    @metrics.timed
+    def apply_filters(self, form_data: dict):
+        try:
+            self._filter = selection_from_form(form_data)
+        except ValueError as error:
+            self.details = f"Cannot filter: {error}"
+            self.isclicked = True
+            return
+        self._update_filter_summary()
+        return self._request_redraw()
+    
+    @rx.event
+    @metrics.timed
+    def clear_filters(self):
+        self._filter = Selection()
+        self._update_filter_summary()
+        return self._request_redraw()
+    
+    # Shows what an import added and why records were turned away
+    def _report_import(self, added, rejected):
+        lines = [f"Imported {len(added) if added is not None else 0} custom satellites"]
+        if rejected:
+            lines.append(f"{len(rejected)} rejected:")
+            lines += [f"{record}: {reason}" for record, reason in rejected[:IMPORT_REJECTS_LISTED]]
+            if len(rejected) > IMPORT_REJECTS_LISTED:
+                lines.append(f"... and {len(rejected) - IMPORT_REJECTS_LISTED} more")
+        self.details = "\n".join(lines)
+        self.isclicked = True
+    
     # Toggle the visibility of space stations on the map
     @rx.event
+    @metrics.timed
     def toggle_stations(self):
         self.show_stations = not self.show_stations
+        self._update_filter_summary()
         
     # Toggle the visibility of satellites on the map
     @rx.event
+    @metrics.timed
     def toggle_satellites(self):
         self.show_satellites = not self.show_satellites
+        self._update_filter_summary()
+    
+    # Toggle the ground track of the last clicked object
+    @rx.event
+    @metrics.timed
+    def toggle_tracks(self):
+        self.show_tracks = not self.show_tracks
+        
+    # Toggle highlighting of the closest upcoming conjunctions. The screen of the catalog runs
+    # off the event loop and is shared by every session (see conjunctions.upcoming)
+    @rx.event(background=True)
+    @metrics.timed
+    async def toggle_conjunctions(self):
+        async with self:
+            self.show_conjunctions = not self.show_conjunctions
+            if not self.show_conjunctions:
+                self.create_map()
+                return
+            self.screening = True
+        
+        catalog = get_catalog()
+        found = None
+        if catalog is not None:
+            found = await asyncio.to_thread(upcoming.get, catalog, timescale.now())
+        
+        async with self:
+            self.conjunctions = []
+            if found is not None and len(found):
+                shown = min(len(found), CONJUNCTIONS_SHOWN)
+                tcas = found.times(timescale)[:shown].utc_strftime("%Y-%m-%d %H:%M:%S UTC")
+                self.conjunctions = [
+                    {
+                        "id_a": int(found.ids_a[k]),
+                        "id_b": int(found.ids_b[k]),
+                        "name_a": str(catalog.names[found.rows_a[k]]),
+                        "name_b": str(catalog.names[found.rows_b[k]]),
+                        "tca": tcas[k],
+                        "miss_km": round(float(found.miss_km[k]), 3),
+                        "speed_km_s": round(float(found.speed_km_s[k]), 3),
+                    }
+                    for k in range(shown)
+                ]
+            self.screening = False
+            self.create_map()
+        
+    # Switch the coverage heatmap between COVERAGE_MODES. The averaged grid covers the objects
+    # shown when it is asked for; it is computed off the event loop, on the propagation
+    # workers when there are several (see coverage.average_for)
+    @rx.event(background=True)
+    @metrics.timed
+    async def set_coverage_mode(self, mode: str):
+        async with self:
+            self.coverage_mode = mode
+            self._coverage_average = None
+            self.coverage_summary = ""
+            snapshot = self._shown_snapshot()
+            if mode != COVERAGE_MODES[2] or snapshot is None:
+                self.create_map()
+                return
+            rows = filters_for(snapshot.catalog).rows(self._filter, self._shown_types())
+            self.averaging = True
+        
+        average = await asyncio.to_thread(coverage.average_for, snapshot.catalog, rows, snapshot.t)
+        
+        async with self:
+            self.averaging = False
+            if self.coverage_mode != mode:
+                return
+            self._coverage_average = average
+            share, mean = coverage.coverage_stats(average)
+            self.coverage_summary = (
+                f"{len(rows)} objects over {coverage.AVERAGE_HOURS:g} h: {share:.0%} of the ground "
+                f"sees one above {coverage.COVERAGE_MIN_ELEVATION:g}° on average, {mean:.1f} in view"
+            )
+            self.create_map()
+    
+    # Track the globe's rotation and zoom, then redraw only what is in view
+    @rx.event
+    @metrics.timed
+    def set_viewport(self, relayout_data: dict):
+        self._viewport = self._viewport.update(relayout_data)
+        return self._request_redraw()
         
     # Toggle the relayout state for the map (for UI responsiveness)
     @rx.event
+    @metrics.timed
     def toggle_relayout(self):
         self.relayout = not self.relayout
-        self.create_map()
+        return self._request_redraw()
         
-    # Fetch and return all data for a given satellite/station by ID
+    # Fetch and return all data for a given satellite/station by NORAD ID (primary key lookup)
     @rx.event
+    @metrics.timed
     def show_data(self, id):
         
         with rx.session() as session:
-            return[
-                list(row)
-                for row in session.execute(
-                    sqlalchemy.text(
-                        "SELECT * FROM db "
-                        f"WHERE OBJECT_NAME = '{self.df.iloc[id]["name"]}'"
-                    )
-                )
-            ]
+            row = session.get(db, id)
+            if row is None:
+                return []
+            return [getattr(row, col) for col in get_catalog().colnames]
             
     @rx.event
+    @metrics.timed
     def set_details(self, vals):
         if not vals or len(vals) == 0 or len(vals) == 0:
             self.details = "No data available for this satellite."
         else:
-            print(self.colnames)
-            self.details = '\n'.join(f'{col}: {val}' for col, val in zip(self.colnames, vals))
+            self.details = '\n'.join(f'{col}: {val}' for col, val in zip(get_catalog().colnames, vals))
         self.create_map()
             
     # Handle click events on the map (for future interactivity)
     @rx.event
+    @metrics.timed
     def handle_click(self, clickData):
         
-        if clickData is None:
+        if not clickData:
+            return
+        
+        point = clickData[0]
+        norad_id = point.get("id")
+        if norad_id is None:
+            # Cluster markers stand for many objects: list the ones around the clicked spot
+            if point.get("lat") is not None and point.get("lon") is not None:
+                self.show_nearby(point["lat"], point["lon"])
             return
         
         self.isclicked = True
-        point_index = clickData[0]["pointIndex"]
-        vals = self.show_data(point_index)
+        # Catalog objects get their ground track drawn; custom satellites are not in the catalog
+        if norad_id < 100000:
+            self._track_id = int(norad_id)
+        vals = self.show_data(norad_id)
         self.set_details(vals)
     
+    # The archived snapshot being looked at, or None on the live globe
+    def _history(self):
+        if not self._history_at:
+            return None
+        return archive.snapshot(datetime.datetime.fromisoformat(self._history_at))
+    
+    # The archived snapshot being looked at, otherwise the newest ticker snapshot
+    def _shown_snapshot(self):
+        history = self._history()
+        return history if history is not None else ticker.current()
+    
+    # The snapshot this session last drew, or the shown one once it has left the ring buffer
+    def _rendered_snapshot(self):
+        history = self._history()
+        snapshots = ticker.history() if history is None else [*ticker.history(), history]
+        for snapshot in reversed(snapshots):
+            if (snapshot.version, float(snapshot.t.tt)) == tuple(self._rendered):
+                return snapshot
+        return self._shown_snapshot()
+    
+    # List the objects drawn within NEAR_RADIUS_DEGREES of a point on the globe, nearest first
+    @rx.event
+    @metrics.timed
+    def show_nearby(self, lat: float, lon: float):
+        snapshot = self._rendered_snapshot()
+        if snapshot is None:
+            return
+        catalog = snapshot.catalog
+        shown = filters_for(catalog).mask(self._filter, self._shown_types())
+        rows, distance = index_for(snapshot).near(lat, lon, NEAR_RADIUS_DEGREES, mask=shown)
+        
+        header = f"{len(rows)} objects within {NEAR_RADIUS_DEGREES:g}° of {lat:.2f}°, {lon:.2f}°"
+        lines = [
+            f"{snapshot.catalog.names[row]} ({snapshot.catalog.ids[row]}): {d:.2f}°"
+            for row, d in zip(rows[:NEARBY_LISTED].tolist(), distance[:NEARBY_LISTED].tolist())
+        ]
+        if len(rows) > NEARBY_LISTED:
+            lines.append(f"... and {len(rows) - NEARBY_LISTED} more")
+        self.details = "\n".join([header] + lines)
+        self.isclicked = True
+    
+    # Everything a redraw depends on: the ticker snapshot (or, without one, the tick the wall
+    # clock is in), the toggles, the viewport and the extra objects on the globe
+    def _redraw_inputs(self, snapshot):
+        if snapshot is not None:
+            quantum = (snapshot.version, float(snapshot.t.tt))
+        else:
+            quantum = (0, time.time() // ticker.interval)
+        return (
+            quantum,
+            self.relayout,
+            self.show_satellites,
+            self.show_stations,
+            self.show_conjunctions,
+            tuple((encounter["id_a"], encounter["id_b"], encounter["tca"]) for encounter in self.conjunctions),
+            self.show_tracks,
+            self._track_id,
+            self._custom_digest,
+            self._filter,
+            self._viewport,
+            self.playing,
+            self.coverage_mode,
+        )
+    
+    # Ask for a redraw; returns the flush to start, or None when one is already pending
+    def _request_redraw(self):
+        metrics.redraw("requested")
+        # Playback draws its own frames; stopping it redraws the live globe
+        if self.playing:
+            metrics.redraw("coalesced")
+            return None
+        self._redraws, start = self._redraws.request(time.monotonic())
+        if not start:
+            metrics.redraw("coalesced")
+            return None
+        return State.flush_redraw
+    
+    # Redraw requests from the globe: one drag or render fires many of them, and every render
+    # fires after_plot again. They are folded into one flush per frame (see redraw.py)
+    @rx.event
+    @metrics.timed
+    def request_redraw(self):
+        return self._request_redraw()
+    
+    # The pending redraw, at most REDRAW_FPS times a second. When nothing it depends on changed,
+    # it waits for the next ticker snapshot instead of redrawing the same frame: the globe keeps
+    # moving in real time, but never redraws faster than the positions change
+    @rx.event(background=True)
+    @metrics.timed
+    async def flush_redraw(self):
+        async with self:
+            delay = self._redraws.delay(time.monotonic())
+        await asyncio.sleep(delay)
+        
+        deadline = time.monotonic() + IDLE_WAIT
+        while True:
+            async with self:
+                if self._redraw_inputs(self._shown_snapshot()) != self._redraws.drawn:
+                    self._redraws = self._redraws.flushed()
+                    self.create_map()
+                    metrics.redraw("executed")
+                    return
+                if self.playing or time.monotonic() >= deadline:
+                    self._redraws = self._redraws.flushed()
+                    metrics.redraw("unchanged")
+                    return
+            await asyncio.sleep(1.0 / REDRAW_FPS)
+    
     # Generates the Plotly globe visualization with all visible satellites, stations, and custom objects
     # Updates the figure in real time as the state changes
     @rx.event
+    @metrics.timed
     def create_map(self):
         
         self.isclicked = False
         
-        if self.relayout == True:
+        # Playback owns the globe until it ends or is stopped
+        if self.relayout == True and not self.playing:
             
+            # Time spent in each stage of the redraw (see metrics.py)
+            phases = metrics.phases("create_map")
             t = timescale.now()
-            coords = []
-            typ = ""
+            version = 0
+            groups = []
             
-            if self.show_satellites == True:
-                for sat in self.satellites:
-                    typ = "Satellite"
-                    name, obj = sat
-                    lat, lon = wgs84.latlon_of(obj.at(t))
-                    coords.append((lat.degrees, lon.degrees, typ, name))
+            # Positions come from the shared ticker snapshot (or the archived one being looked
+            # at); keep the rows that are toggled on
+            snapshot = self._shown_snapshot()
+            self._redraws = self._redraws.drew(self._redraw_inputs(snapshot), time.monotonic())
+            if snapshot is not None:
+                catalog = snapshot.catalog
+                version = snapshot.version
+                if version != self.catalog_version:
+                    self.catalog_version = version
+                    self.constellation_options = filters_for(catalog).constellations
+                self._rendered = (version, float(snapshot.t.tt))
+                t = snapshot.t
+                # Only the rows the toggles and filters let through (see filters.py)
+                for typ in ("Satellite", "Station"):
+                    rows = self._shown_rows(catalog, typ)
+                    if len(rows):
+                        groups.append((typ, catalog.names[rows], catalog.ids[rows], snapshot.lat[rows], snapshot.lon[rows]))
+                
+                # Both objects of each highlighted encounter, drawn on top of the other traces
+                if self.show_conjunctions and self.conjunctions:
+                    notes = {}
+                    for encounter in self.conjunctions:
+                        notes.setdefault(encounter["id_a"], f"{encounter['name_a']}<br>{encounter['miss_km']} km from {encounter['name_b']} at {encounter['tca']}")
+                        notes.setdefault(encounter["id_b"], f"{encounter['name_b']}<br>{encounter['miss_km']} km from {encounter['name_a']} at {encounter['tca']}")
+                    ids, rows = np.unique(catalog.ids, return_index=True)
+                    rows = rows[np.isin(ids, list(notes))]
+                    groups.append((
+                        "Conjunction",
+                        [notes[norad_id] for norad_id in catalog.ids[rows].tolist()],
+                        catalog.ids[rows],
+                        snapshot.lat[rows],
+                        snapshot.lon[rows],
+                    ))
+            phases.lap("groups")
             
-            if self.show_stations == True:
-                for sat in self.stations:
-                    typ = "Station"
-                    name, obj = sat
-                    lat, lon = wgs84.latlon_of(obj.at(t))
-                    coords.append((lat.degrees, lon.degrees, typ, name))
+            custom = self._shown_custom()
+            if len(custom):
+                customs = self._custom()
+                lat, lon, alt = customs.propagator.geodetic_at(t)
+                groups.append((
+                    "Custom",
+                    customs.names[custom],
+                    customs.ids[custom],
+                    lat[custom],
+                    lon[custom],
+                ))
+            phases.lap("propagate")
             
-            if self.custom:
-                for sat in self.custom:
-                    typ = "Custom"
-                    name, obj = sat
-                    lat, lon = wgs84.latlon_of(obj.at(t))
-                    coords.append((lat.degrees, lon.degrees, typ, name))
-                
-            self.df = pd.DataFrame(coords, columns=["lat", "lon", "type", "name"])
-            self.fig = px.scatter_geo(self.df,
-                            lat="lat",
-                            lon="lon",
-                            color="type",
-                            color_discrete_map={
-                                "Satellite" : "#686ffe",
-                                "Station": "#e2344d",
-                                "Custom": "#4ab2ac"
-                            },
-                            hover_name="name",
-                            projection="orthographic", 
-                            template="plotly_dark",
-                            width=1300,
-                            height=900
-                            )
-            self.fig.update_geos(
-                            showlakes=False,
-                            landcolor='#B2A5FF',
-                            oceancolor='#424874',
-                            )
-            self.fig.update_traces(
-                        marker=dict(size=8),
-                        hovertemplate="<b>%{hovertext}</b><br>" +
-                         "Lat: %{lat:.2f}°<br>" +
-                         "Lon: %{lon:.2f}°<extra></extra><br>" +
-                         "Click on this satellite to view more info!"
-                        )
-            self.fig.update_layout(
-                uirevision="constant",
-                showlegend=False
-                )
-        
-    # Downloads new data from Celestrak if the local file is older than 15 days
-    # Updates the database with the latest satellite and station data
-    @rx.event
-    # Download new data if the local file is older than 7 days
-    def download_limiter(self, url, file):
-        if load.days_old(file) >= 15.0:
-            load.download(url, filename = str(file))
+            # Ground track of the selected object, TRACK_ORBITS either side of now; served from
+            # the shared track cache, so re-clicks and redraws do not propagate again
+            drawn = []
+            if self.show_tracks and self._track_id and snapshot is not None:
+                rows = np.flatnonzero(snapshot.catalog.ids == self._track_id)
+                if len(rows):
+                    track = tracks.ground_track(snapshot.catalog, rows[0], t)
+                    drawn.append((snapshot.catalog.names[rows[0]], *track.decimated()))
+            phases.lap("track")
             
-            self.colnames = list(col if col != "NORAD_CAT_ID" else "id" for col in self.sats.columns)
-        
-            for index, row in self.sats.iterrows():
-                
-                vals = [int(item) if idx == 11 else str(item) for idx, item in enumerate(row)]
-                
-                with rx.session() as session:
-                    session.execute(
-                        sqlalchemy.text(
-                            f"INSERT INTO db ({", ".join(self.colnames)}) "
-                            f"VALUES ({", ".join(f":{col}" for col in self.colnames)})"
-                        ), dict(zip(self.colnames, vals))
-                    )
-                    session.commit()
+            # Coverage heatmap of the shown catalog objects, shared per snapshot and filter
+            # (see coverage.py), or the averaged grid once it is ready
+            heatmap = None
+            if self.coverage_mode == COVERAGE_MODES[1] and snapshot is not None:
+                counts = coverage.counts_for(snapshot, filters_for(catalog).mask(self._filter, self._shown_types()))
+                heatmap = (coverage.GRID, counts)
+                share, mean = coverage.coverage_stats(counts)
+                self.coverage_summary = f"{share:.0%} of the ground sees a shown object above {coverage.COVERAGE_MIN_ELEVATION:g}°, {mean:.1f} on average"
+            elif self.coverage_mode == COVERAGE_MODES[2] and self._coverage_average is not None:
+                heatmap = (coverage.GRID, self._coverage_average)
+            phases.lap("coverage")
             
-            for index, row in self.station.iterrows():
-                
-                vals = [int(item) if idx == 11 else str(item) for idx, item in enumerate(row)]
-                
-                with rx.session() as session:
-                    session.execute(
-                        sqlalchemy.text(
-                            f"INSERT INTO db ({", ".join(self.colnames)}) "
-                            f"VALUES ({", ".join(f":{col}" for col in self.colnames)})"
-                        ), dict(zip(self.colnames, vals))
-                    )
-                    session.commit()
-    
-    # Downloads the latest satellite and station data from Celestrak
-    # Loads the data into Pandas DataFrames and Skyfield objects for visualization
-    # Removes any previously stored custom satellites from the database
-    @rx.event
-    def download_celestrak_data(self):
-        # Base URL for Celestrak NORAD elements in CSV format
-        base = 'https://celestrak.org/NORAD/elements/gp.php'
-
-        database = pathlib.Path('databases/')
-
-        # File paths and URLs for space stations and active satellites
-        space_stations = 'stations.csv'
-        stations_url = base + '?GROUP=stations&FORMAT=csv'
-        stations_filepath = database / "stations.csv"
-
-        active_sats = 'active_satellites.csv'
-        active_sats_url = base + '?GROUP=active&FORMAT=csv'
-        sats_filepath = database / "active_satellites.csv"
-        
-        self.download_limiter(stations_url, stations_filepath)
-        self.download_limiter(active_sats_url, sats_filepath)
-        
-        self.sats = pd.read_csv(sats_filepath)
-        self.station = pd.read_csv(stations_filepath)
-        
-        self.colnames = list(col if col != "NORAD_CAT_ID" else "id" for col in self.sats.columns)
+            # Rebuild the figure skeleton only when the set of plotted objects changed;
+            # otherwise just the coordinate arrays go out
+            key = structure_key(version, groups, drawn, heatmap[0] if heatmap is not None else None)
+            rebuilt = key != self._figure_key
+            if rebuilt:
+                self._figure_key = key
+                self.fig = build_figure(groups, drawn, wire_key(key), heatmap[0] if heatmap is not None else None)
+            phases.lap("figure")
+            self.coords = coordinates(groups, self._viewport, wire_key(key), heatmap)
+            phases.lap("coordinates")
+            
+            # Sampled sizes of what this redraw sends to the browser
+            if rebuilt:
+                metrics.payload("fig", self.fig)
+            metrics.payload("coords", self.coords)
         
-        sats_data = []
-        stations_data = []
+    # Turn observer mode on (asking the browser where it is) or off
+    @rx.event
+    @metrics.timed
+    def toggle_sky(self):
+        if self.sky_on:
+            self.sky_on = False
+            self.sky_coords = []
+            self.sky_summary = ""
+            return
+        return rx.call_script(GEOLOCATE, callback=State.set_observer)
+    
+    # Browser location from GEOLOCATE; starts the sky plot
+    @rx.event
+    @metrics.timed
+    def set_observer(self, position):
+        if not isinstance(position, list) or len(position) < 2:
+            self.details = f"Cannot show the sky: {position or 'no location'}"
+            self.isclicked = True
+            return
+        self._observer = Observer(float(position[0]), float(position[1]), float(position[2] or 0.0) if len(position) > 2 else 0.0)
+        self.sky_on = True
+        self._sky_drawn = ()
+        return self._request_sky()
+    
+    def _request_sky(self):
+        if not self.sky_on or time.monotonic() - self._sky_pending < STALE_AFTER:
+            return None
+        self._sky_pending = time.monotonic()
+        return State.update_sky
+    
+    # Every render of the sky plot asks for the next one, so it follows the ticker at 1 Hz for
+    # as long as the page is open
+    @rx.event
+    @metrics.timed
+    def request_sky(self):
+        return self._request_sky()
+    
+    # Waits for a ticker snapshot the sky plot has not shown yet (up to IDLE_WAIT), then sends
+    # what the observer sees in it. The view is computed outside the state lock from the
+    # shared snapshot positions (see sky.py)
+    @rx.event(background=True)
+    @metrics.timed
+    async def update_sky(self):
+        async with self:
+            drawn = self._sky_drawn
+        deadline = time.monotonic() + IDLE_WAIT
+        while True:
+            snapshot = await ticker.current_async()
+            if snapshot is not None and (snapshot.version, float(snapshot.t.tt)) != tuple(drawn):
+                break
+            if time.monotonic() >= deadline:
+                async with self:
+                    self._sky_pending = 0.0
+                return
+            await asyncio.sleep(1.0 / REDRAW_FPS)
         
-        for index, row in self.sats.iterrows():
-            sats_data.append(row.to_dict())
-            
-        for index, row in self.station.iterrows():
-            stations_data.append(row.to_dict())
+        async with self:
+            observer = self._observer
+            mask = filters_for(snapshot.catalog).mask(self._filter, self._shown_types())
+        view = sky.look(snapshot, observer, mask=mask) if observer is not None else None
         
-        self.satellites = [(fields["OBJECT_NAME"], EarthSatellite.from_omm(timescale, fields)) for fields in sats_data]
-        self.stations = [(fields["OBJECT_NAME"], EarthSatellite.from_omm(timescale, fields)) for fields in stations_data]
+        async with self:
+            self._sky_pending = 0.0
+            if not self.sky_on or view is None:
+                return
+            self.sky_coords = sky_coordinates(snapshot.catalog, view)
+            self._sky_drawn = (snapshot.version, float(snapshot.t.tt))
+            self.sky_summary = f"{len(view)} objects above {sky.SKY_MIN_ELEVATION:g}° from {observer.lat:.2f}°, {observer.lon:.2f}°"
+            metrics.payload("sky_coords", self.sky_coords)
+    
+    # List the next passes of the shown catalog objects over the browser location: rise,
+    # highest point and set within PASS_HOURS, above the sky view's elevation mask. The
+    # prediction (see passes.py) runs off the event loop
+    @rx.event(background=True)
+    @metrics.timed
+    async def show_passes(self):
+        catalog = get_catalog()
+        async with self:
+            observer = self._observer
+            if observer is None or catalog is None or self.predicting:
+                return
+            rows = filters_for(catalog).rows(self._filter, self._shown_types())
+            self.predicting = True
         
-        #Remove previously stored custom sats
+        start = timescale.now()
+        end = timescale.tt_jd(start.tt + PASS_HOURS / 24.0)
+        found = await asyncio.to_thread(predict_passes, catalog, observer, start, end, sky.SKY_MIN_ELEVATION, rows)
+        passes = found.passes()
+        times = found.times(timescale).utc_strftime("%m-%d %H:%M:%S") if len(found) else []
         
-        with rx.session() as session:
-            session.execute(
-                sqlalchemy.text(
-                    "DELETE FROM db "
-                    "WHERE id > 100000"
-                )
+        header = f"{len(passes)} passes above {sky.SKY_MIN_ELEVATION:g}° over {observer.lat:.2f}°, {observer.lon:.2f}° in the next {PASS_HOURS:g} h (UTC)"
+        lines = []
+        for rise, peak, set_ in passes[:PASSES_LISTED]:
+            row = found.rows[max(rise, peak, set_)]
+            highest = f"{found.elevation[peak]:.0f}° at {times[peak]}" if peak >= 0 else "highest before or after the window"
+            lines.append(
+                f"{catalog.names[row]} ({catalog.ids[row]}): rises {times[rise] if rise >= 0 else 'before now'}, "
+                f"{highest}, sets {times[set_] if set_ >= 0 else 'after the window'}"
             )
-            session.commit()
+        if len(passes) > PASSES_LISTED:
+            lines.append(f"... and {len(passes) - PASSES_LISTED} more")
+        async with self:
+            self.predicting = False
+            self.details = "\n".join([header] + lines)
+            self.isclicked = True
+    
+    # Play the shown objects from start to end (UTC, as the datetime inputs send it) at
+    # `speed` times real time
+    @rx.event
+    @metrics.timed
+    def start_playback(self, form_data: dict):
+        try:
+            start = datetime.datetime.fromisoformat(form_data["start"]).replace(tzinfo=datetime.timezone.utc)
+            end = datetime.datetime.fromisoformat(form_data["end"]).replace(tzinfo=datetime.timezone.utc)
+            speed = float(form_data.get("speed") or 60.0)
+            if end <= start or speed <= 0:
+                raise ValueError("the end has to be after the start, and the speed positive")
+            step = speed / PLAYBACK_FPS
+            count = int((end - start).total_seconds() // step) + 1
+            if count > MAX_FRAMES:
+                raise ValueError(f"{count} frames is more than {MAX_FRAMES}; shorten the window or raise the speed")
+        except (KeyError, ValueError) as error:
+            self.details = f"Cannot play back: {error}"
+            self.isclicked = True
+            return
+        self.playing = True
+        self._playback_run += 1
+        return State.run_playback(start.isoformat(), step, count)
+    
+    # Back to the live globe
+    @rx.event
+    @metrics.timed
+    def stop_playback(self):
+        self.playing = False
+        self._playback_run += 1
+        self.playback_time = ""
+        self.create_map()
+    
+    # The shown catalog objects and custom satellites, as (type, names, ids) groups and the
+    # satrecs behind them in the same order
+    def _playback_objects(self):
+        objects = []
+        satrecs = []
+        snapshot = self._shown_snapshot()
+        if snapshot is not None:
+            catalog = snapshot.catalog
+            for typ in ("Satellite", "Station"):
+                rows = self._shown_rows(catalog, typ)
+                if len(rows):
+                    objects.append((typ, catalog.names[rows], catalog.ids[rows]))
+                    satrecs += [catalog.propagator.satrecs[row] for row in rows.tolist()]
+        custom = self._shown_custom()
+        if len(custom):
+            customs = self._custom()
+            objects.append(("Custom", customs.names[custom], customs.ids[custom]))
+            satrecs += [customs.propagator.satrecs[row] for row in custom.tolist()]
+        return snapshot.version if snapshot is not None else 0, objects, satrecs
+    
+    # Streams the frames of a playback to the globe as they come out of Playback, one
+    # coordinate update per frame at PLAYBACK_FPS. Frames that fall more than a frame behind
+    # the clock are dropped rather than played late. At most MAX_PLAYBACKS run at once
+    @rx.event(background=True)
+    @metrics.timed
+    async def run_playback(self, start: str, step: float, count: int):
+        if not claim_slot():
+            async with self:
+                self.playing = False
+                self.details = f"Cannot play back: {MAX_PLAYBACKS} playbacks are already running, try again shortly"
+                self.isclicked = True
+            return
+        try:
+            async with self:
+                run = self._playback_run
+                version, objects, satrecs = self._playback_objects()
+                # A skeleton with just the played objects; live redraws rebuild theirs afterwards
+                groups = frame_groups(objects, np.empty(len(satrecs)), np.empty(len(satrecs)))
+                self._figure_key = structure_key(version, groups)
+                key = wire_key(self._figure_key)
+                self.fig = build_figure(groups, key=key)
+            
+            # Building the SatrecArrays of a large catalog takes a while, so not on the event loop
+            playback = await asyncio.to_thread(Playback, satrecs, timescale.from_datetime(datetime.datetime.fromisoformat(start)), step, count)
+            began = time.monotonic()
+            async for frame, lat, lon in playback.frames():
+                delay = began + frame / PLAYBACK_FPS - time.monotonic()
+                if delay < -1.0 / PLAYBACK_FPS and frame < count - 1:
+                    continue
+                await asyncio.sleep(max(0.0, delay))
+                async with self:
+                    if not self.playing or self._playback_run != run:
+                        return
+                    self.coords = coordinates(frame_groups(objects, lat, lon), self._viewport, key)
+                    self.playback_time = playback.time_at(frame).strftime("%Y-%m-%d %H:%M:%S UTC")
+            
+            async with self:
+                if self._playback_run == run:
+                    self.playing = False
+                    self.playback_time = ""
+                    self.create_map()
+        finally:
+            release_slot()
+    
+    # Show the catalog as the archive had it at a UTC time: every object's element set nearest
+    # to that time, propagated to it. The archive is queried off the event loop
+    @rx.event(background=True)
+    @metrics.timed
+    async def show_history(self, form_data: dict):
+        try:
+            when = datetime.datetime.fromisoformat(form_data["time"]).replace(tzinfo=datetime.timezone.utc)
+        except (KeyError, ValueError) as error:
+            async with self:
+                self.details = f"Cannot look back: {error}"
+                self.isclicked = True
+            return
+        snapshot = await asyncio.to_thread(archive.snapshot, when)
+        async with self:
+            if snapshot is None:
+                self.details = f"The archive has no element sets within {MAX_GAP_DAYS:g} days of {when:%Y-%m-%d %H:%M} UTC"
+                self.isclicked = True
+                return
+            self._history_at = when.isoformat()
+            self.history_time = when.strftime("%Y-%m-%d %H:%M:%S UTC")
+            self.create_map()
+    
+    # Back to the live catalog
+    @rx.event
+    @metrics.timed
+    def show_live(self):
+        self._history_at = ""
+        self.history_time = ""
+        self.create_map()
+    
+    # Makes sure the shared catalog is loaded and current, off the event loop: the CSVs, the
+    # database and the first propagation of a large catalog can take seconds
+    @rx.event(background=True)
+    @metrics.timed
+    async def download_celestrak_data(self):
+        catalog = await asyncio.to_thread(load_catalog)
+        await ticker.current_async()
+        index = await asyncio.to_thread(filters_for, catalog)
+        async with self:
+            self.catalog_version = catalog.version
+            self.constellation_options = index.constellations
         
 # =============================
 # Main page: builds the entire interactive dashboard, including toggles, forms, and the globe.
@@ -371,6 +974,70 @@ def index() -> rx.Component:
                                         variant="surface"
                                         )
                             ),
+                            rx.hstack(
+                                rx.text("Toggle Conjunctions: ",
+                                        size="4",
+                                        weight="medium",
+                                        align="center",
+                                        color_scheme="purple"
+                                        ),
+                                rx.switch(on_change=State.toggle_conjunctions,
+                                        checked=State.show_conjunctions,
+                                        size="3",
+                                        color_scheme="iris",
+                                        high_contrast=True,
+                                        radius="full",
+                                        variant="surface"
+                                        ),
+                                rx.cond(State.screening, rx.spinner(size="3"), None),
+                            ),
+                            rx.hstack(
+                                rx.text("Toggle Sky View: ",
+                                        size="4",
+                                        weight="medium",
+                                        align="center",
+                                        color_scheme="purple"
+                                        ),
+                                rx.switch(on_change=State.toggle_sky,
+                                        checked=State.sky_on,
+                                        size="3",
+                                        color_scheme="iris",
+                                        high_contrast=True,
+                                        radius="full",
+                                        variant="surface"
+                                        ),
+                            ),
+                            rx.hstack(
+                                rx.text("Coverage: ",
+                                        size="4",
+                                        weight="medium",
+                                        align="center",
+                                        color_scheme="purple"
+                                        ),
+                                rx.select(list(COVERAGE_MODES),
+                                        value=State.coverage_mode,
+                                        on_change=State.set_coverage_mode,
+                                        size="2",
+                                        color_scheme="iris",
+                                        ),
+                                rx.cond(State.averaging, rx.spinner(size="3"), None),
+                            ),
+                            rx.hstack(
+                                rx.text(f"Toggle Ground Track (±{TRACK_ORBITS} orbits): ",
+                                        size="4",
+                                        weight="medium",
+                                        align="center",
+                                        color_scheme="purple"
+                                        ),
+                                rx.switch(on_change=State.toggle_tracks,
+                                        checked=State.show_tracks,
+                                        size="3",
+                                        color_scheme="iris",
+                                        high_contrast=True,
+                                        radius="full",
+                                        variant="surface"
+                                        ),
+                            ),
                         align_items = "center",
                         padding="0 0 0 300px"
                         ),
@@ -609,6 +1276,296 @@ def index() -> rx.Component:
                                 max_width="450px"
                             ),
                         ),
+                        rx.dialog.root(
+                            rx.dialog.trigger(
+                                rx.button(
+                                    rx.icon("upload", size=20),
+                                    rx.text("Import Satellites",
+                                            size="4"),
+                                    color_scheme="violet"
+                                ),
+                            ),
+                            rx.dialog.content(
+                                rx.dialog.title("Import Satellites",
+                                                align="center"),
+                                rx.dialog.description("Load custom satellites from TLE, OMM CSV, OMM JSON or OMM XML files",
+                                                    align="center"),
+                                rx.flex(
+                                    rx.upload(
+                                        rx.text("Drop element files here or click to select",
+                                                align="center"),
+                                        id="custom_upload",
+                                        multiple=True,
+                                        accept={
+                                            "text/plain": [".tle", ".txt", ".3le", ".2le"],
+                                            "text/csv": [".csv"],
+                                            "application/json": [".json"],
+                                            "application/xml": [".xml"],
+                                        },
+                                        border="1px dashed",
+                                        padding="2em",
+                                    ),
+                                    rx.foreach(
+                                        rx.selected_files("custom_upload"),
+                                        lambda name: rx.text(name, size="2", color_scheme="gray"),
+                                    ),
+                                    rx.flex(
+                                        rx.dialog.close(
+                                            rx.button(
+                                                "Close",
+                                                variant="soft",
+                                                color_scheme="gray"
+                                            )
+                                        ),
+                                        rx.dialog.close(
+                                            rx.button(
+                                                "Import",
+                                                color_scheme="violet",
+                                                on_click=State.handle_upload(rx.upload_files(upload_id="custom_upload")),
+                                            )
+                                        ),
+                                        spacing="3",
+                                        justify="end"
+                                    ),
+                                    direction="column",
+                                    spacing="4",
+                                ),
+                                max_width="450px"
+                            ),
+                        ),
+                        rx.dialog.root(
+                            rx.dialog.trigger(
+                                rx.button(
+                                    rx.icon("filter", size=20),
+                                    rx.text("Filters",
+                                            size="4"),
+                                    color_scheme="violet"
+                                ),
+                            ),
+                            rx.dialog.content(
+                                rx.dialog.title("Filter Objects",
+                                                align="center"),
+                                rx.dialog.description("Leave a section empty to show everything in it",
+                                                    align="center"),
+                                rx.form(
+                                    rx.flex(
+                                        rx.text("Orbital regime", size="2", weight="medium"),
+                                        rx.flex(
+                                            *[rx.checkbox(regime, name=f"regime:{regime}") for regime in REGIMES],
+                                            spacing="3",
+                                            wrap="wrap"
+                                        ),
+                                        rx.text("Inclination", size="2", weight="medium"),
+                                        rx.flex(
+                                            *[rx.checkbox(band, name=f"band:{band}") for band in BANDS],
+                                            spacing="3",
+                                            wrap="wrap"
+                                        ),
+                                        rx.text("Launch year", size="2", weight="medium"),
+                                        rx.flex(
+                                            rx.input(type="number", placeholder="from", name="year_from"),
+                                            rx.input(type="number", placeholder="to", name="year_to"),
+                                            spacing="3"
+                                        ),
+                                        rx.text("Constellation", size="2", weight="medium"),
+                                        rx.select(State.constellation_options,
+                                                placeholder="Any",
+                                                name="constellation"
+                                                ),
+                                        rx.text("Custom satellites", size="2", weight="medium"),
+                                        rx.select(State.custom_groups,
+                                                placeholder="All imports",
+                                                name="group"
+                                                ),
+                                        rx.flex(
+                                            rx.dialog.close(
+                                                rx.button(
+                                                    "Clear",
+                                                    variant="soft",
+                                                    color_scheme="gray",
+                                                    type="button",
+                                                    on_click=State.clear_filters
+                                                )
+                                            ),
+                                            rx.dialog.close(
+                                                rx.button(
+                                                    "Apply",
+                                                    color_scheme="violet",
+                                                    type="submit"
+                                                )
+                                            ),
+                                            spacing="3",
+                                            justify="end"
+                                        ),
+                                        direction="column",
+                                        spacing="2",
+                                    ),
+                                    on_submit=State.apply_filters,
+                                    reset_on_submit=False,
+                                ),
+                                max_width="450px"
+                            ),
+                        ),
+                        rx.cond(
+                            State.filter_summary != "",
+                            rx.text(State.filter_summary,
+                                    size="3",
+                                    color_scheme="purple"
+                                    ),
+                            None,
+                        ),
+                        rx.cond(
+                            State.coverage_summary != "",
+                            rx.text(State.coverage_summary,
+                                    size="3",
+                                    color_scheme="purple"
+                                    ),
+                            None,
+                        ),
+                        rx.dialog.root(
+                            rx.dialog.trigger(
+                                rx.button(
+                                    rx.icon("play", size=20),
+                                    rx.text("Playback",
+                                            size="4"),
+                                    color_scheme="violet"
+                                ),
+                            ),
+                            rx.dialog.content(
+                                rx.dialog.title("Play a Time Window",
+                                                align="center"),
+                                rx.dialog.description("Animate the shown objects between two UTC times",
+                                                    align="center"),
+                                rx.form(
+                                    rx.flex(
+                                        rx.text("Start (UTC)", size="2"),
+                                        rx.input(type="datetime-local",
+                                                name="start",
+                                                required=True,
+                                                ),
+                                        rx.text("End (UTC)", size="2"),
+                                        rx.input(type="datetime-local",
+                                                name="end",
+                                                required=True,
+                                                ),
+                                        rx.text("Speed (times real time)", size="2"),
+                                        rx.input(type="number",
+                                                name="speed",
+                                                default_value="60",
+                                                min="0",
+                                                step="any",
+                                                ),
+                                        rx.flex(
+                                            rx.dialog.close(
+                                                rx.button(
+                                                    "Close",
+                                                    variant="soft",
+                                                    color_scheme="gray"
+                                                )
+                                            ),
+                                            rx.dialog.close(
+                                                rx.button(
+                                                    "Play",
+                                                    color_scheme="violet",
+                                                    type="submit"
+                                                )
+                                            ),
+                                            spacing="3",
+                                            justify="end"
+                                        ),
+                                        direction="column",
+                                        spacing="2",
+                                    ),
+                                    on_submit=State.start_playback,
+                                ),
+                                max_width="450px"
+                            ),
+                        ),
+                        rx.dialog.root(
+                            rx.dialog.trigger(
+                                rx.button(
+                                    rx.icon("history", size=20),
+                                    rx.text("History",
+                                            size="4"),
+                                    color_scheme="violet"
+                                ),
+                            ),
+                            rx.dialog.content(
+                                rx.dialog.title("Look Back in Time",
+                                                align="center"),
+                                rx.dialog.description("Show every object where it was at a past UTC time, from the archived element sets",
+                                                    align="center"),
+                                rx.form(
+                                    rx.flex(
+                                        rx.text("Time (UTC)", size="2"),
+                                        rx.input(type="datetime-local",
+                                                name="time",
+                                                required=True,
+                                                ),
+                                        rx.flex(
+                                            rx.dialog.close(
+                                                rx.button(
+                                                    "Close",
+                                                    variant="soft",
+                                                    color_scheme="gray"
+                                                )
+                                            ),
+                                            rx.dialog.close(
+                                                rx.button(
+                                                    "Show",
+                                                    color_scheme="violet",
+                                                    type="submit"
+                                                )
+                                            ),
+                                            spacing="3",
+                                            justify="end"
+                                        ),
+                                        direction="column",
+                                        spacing="2",
+                                    ),
+                                    on_submit=State.show_history,
+                                ),
+                                max_width="450px"
+                            ),
+                        ),
+                        rx.cond(
+                            State.history_time != "",
+                            rx.hstack(
+                                rx.text(State.history_time,
+                                        size="4",
+                                        weight="medium",
+                                        color_scheme="purple"
+                                        ),
+                                rx.button(
+                                    rx.icon("radio", size=16),
+                                    "Live",
+                                    color_scheme="violet",
+                                    variant="soft",
+                                    on_click=State.show_live,
+                                ),
+                                align="center",
+                            ),
+                            None,
+                        ),
+                        rx.cond(
+                            State.playing,
+                            rx.hstack(
+                                rx.text(State.playback_time,
+                                        size="4",
+                                        weight="medium",
+                                        color_scheme="purple"
+                                        ),
+                                rx.button(
+                                    rx.icon("square", size=16),
+                                    "Stop",
+                                    color_scheme="violet",
+                                    variant="soft",
+                                    on_click=State.stop_playback,
+                                ),
+                                align="center",
+                            ),
+                            None,
+                        ),
                         rx.box(
                             rx.image("/www2.gif")
                         ),
@@ -619,14 +1576,43 @@ def index() -> rx.Component:
                     ),
                 rx.flex(
                     rx.box(),
-                    rx.plotly(data=State.fig,
-                            on_after_plot=State.create_map,
-                            on_relayout=State.create_map,
+                    globe(data=State.fig,
+                            coords=State.coords,
+                            on_after_plot=State.request_redraw,
+                            on_relayout=State.set_viewport,
                             on_relayouting=State.toggle_relayout,
                             on_click=State.handle_click,
                             use_resize_handler=True,
                             config={"displayModeBar":False,
                                     "doubleClick": False}),
+                    rx.cond(
+                        State.sky_on,
+                        rx.vstack(
+                            rx.text(State.sky_summary,
+                                    size="3",
+                                    color_scheme="purple"
+                                    ),
+                            rx.hstack(
+                                rx.button(
+                                    rx.icon("calendar-clock", size=16),
+                                    "Next passes",
+                                    color_scheme="violet",
+                                    variant="soft",
+                                    on_click=State.show_passes,
+                                ),
+                                rx.cond(State.predicting, rx.spinner(size="3"), None),
+                                align="center",
+                            ),
+                            globe(data=State.sky_fig,
+                                    coords=State.sky_coords,
+                                    on_after_plot=State.request_sky,
+                                    on_click=State.handle_click,
+                                    config={"displayModeBar":False,
+                                            "doubleClick": False}),
+                            align="center",
+                        ),
+                        None,
+                    ),
                     width="100%",
                     height="90vh",
                     direction="row",
@@ -641,6 +1627,10 @@ def index() -> rx.Component:
             )
         )
 
-    # Bootstrap the Reflex app and register the main page
-app = rx.App()
-app.add_page(index)
\ No newline at end of file
+    # Bootstrap the Reflex app and register the main page; /metrics is served in front of it
+app = rx.App(api_transformer=metrics.api)
+app.add_page(index)
+    # Propagate the shared catalog in the background for every session
+app.register_lifespan_task(ticker.run)
+    # Conditionally re-fetch the CelesTrak groups and swap in the changed element sets
+app.register_lifespan_task(refresh.run, store=store_catalog)
\ No newline at end of file
@@ -0,0 +1,126 @@
+import asyncio
+import collections
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+from skyfield.api import load
+
+from .catalog import get_catalog
+from .ephemeris import ephemeris
+from .sharded import propagator_for
+
+# Seconds between background propagations of the shared catalog (SKYNET_TICK_INTERVAL overrides)
+TICK_INTERVAL = float(os.environ.get("SKYNET_TICK_INTERVAL", "1.0"))
+# Number of past snapshots kept in the ring buffer
+HISTORY = 8
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Positions of every object of one catalog version at one instant."""
+    catalog: object
+    t: object
+    lat: np.ndarray
+    lon: np.ndarray
+    alt: np.ndarray
+
+    @property
+    def version(self):
+        return self.catalog.version
+
+# =============================
+# PropagationTicker: propagates the shared catalog once per tick for the whole process.
+# Sessions read the newest snapshot instead of running SGP4 themselves.
+# =============================
+class PropagationTicker:
+    """Background propagation of the shared catalog into a ring buffer of snapshots."""
+
+    def __init__(self, interval=TICK_INTERVAL, history=HISTORY):
+        self.interval = interval
+        self.timescale = load.timescale()
+        self.ticks = 0
+        self._snapshots = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._tick_lock = threading.Lock()
+
+    # Propagate the current catalog at time t (default: now) and publish the snapshot
+    def tick(self, t=None):
+        with self._tick_lock:
+            return self._tick(t)
+
+    def _tick(self, t=None):
+        catalog = get_catalog()
+        if catalog is None:
+            return None
+        t = self.timescale.now() if t is None else t
+        # Interpolate from the precomputed ephemeris when it covers t, otherwise solve SGP4
+        # directly (across the worker pool for large catalogs)
+        geodetic = ephemeris.geodetic_at(catalog, t)
+        if geodetic is None:
+            with propagator_for(catalog) as propagator:
+                geodetic = propagator.geodetic_at(t)
+        return self._publish(catalog, t, geodetic)
+
+    # Same as tick(), awaitable: the event loop stays free while SGP4 runs
+    async def tick_async(self, t=None):
+        catalog = get_catalog()
+        if catalog is None:
+            return None
+        t = self.timescale.now() if t is None else t
+        geodetic = await asyncio.to_thread(ephemeris.geodetic_at, catalog, t)
+        if geodetic is None:
+            with propagator_for(catalog) as propagator:
+                geodetic = await propagator.geodetic_at_async(t)
+        return self._publish(catalog, t, geodetic)
+
+    def _publish(self, catalog, t, geodetic):
+        lat, lon, alt = geodetic
+        snapshot = Snapshot(catalog=catalog, t=t, lat=lat, lon=lon, alt=alt)
+        with self._lock:
+            self._snapshots.append(snapshot)
+            self.ticks += 1
+        return snapshot
+
+    # Newest snapshot, or None before the first tick
+    def latest(self):
+        with self._lock:
+            return self._snapshots[-1] if self._snapshots else None
+
+    # Snapshots in the ring buffer, oldest first
+    def history(self):
+        with self._lock:
+            return list(self._snapshots)
+
+    # Newest snapshot of the current catalog version. Propagates on the spot only when the
+    # ticker has not caught up with a freshly loaded catalog yet; concurrent callers share that work
+    def current(self):
+        catalog = get_catalog()
+        snapshot = self.latest()
+        if catalog is None or (snapshot is not None and snapshot.version == catalog.version):
+            return snapshot
+        with self._tick_lock:
+            snapshot = self.latest()
+            if snapshot is not None and snapshot.version == catalog.version:
+                return snapshot
+            return self._tick()
+
+    # Same as current(), awaitable from async event handlers
+    async def current_async(self):
+        catalog = get_catalog()
+        snapshot = self.latest()
+        if catalog is None or (snapshot is not None and snapshot.version == catalog.version):
+            return snapshot
+        return await self.tick_async()
+
+    # Lifespan task: tick on a fixed cadence, off the event loop thread, while the ephemeris
+    # window is built and rolled forward in the background
+    async def run(self):
+        extending = None
+        while True:
+            snapshot = await self.tick_async()
+            if snapshot is not None and (extending is None or extending.done()):
+                extending = asyncio.create_task(ephemeris.extend_async(snapshot.catalog, snapshot.t))
+            await asyncio.sleep(self.interval)
+
+ticker = PropagationTicker()
@@ -0,0 +1,144 @@
+import collections
+import math
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from .propagation import DAY_S, CatalogPropagator, WindowClock, itrs_to_geodetic, teme_to_itrs
+
+# Orbits drawn before and after the current time (SKYNET_TRACK_ORBITS overrides)
+TRACK_ORBITS = int(os.environ.get("SKYNET_TRACK_ORBITS", "1"))
+# Seconds between track samples
+TRACK_STEP = 30.0
+# Track windows start on multiples of this many seconds, so re-clicks within it share a cache entry
+TRACK_WINDOW = 600.0
+# Memory budget for cached tracks (SKYNET_TRACK_CACHE_MB overrides)
+MEMORY_BUDGET = int(float(os.environ.get("SKYNET_TRACK_CACHE_MB", "64")) * 1024 * 1024)
+# Most points per drawn track; longer tracks are decimated
+DISPLAY_POINTS = 1500
+
+@dataclass(frozen=True)
+class Track:
+    """Ground track and TEME orbit path of one object over one window."""
+    norad_id: int
+    elnum: int
+    tt: np.ndarray
+    # TEME positions (m, 3) in km: the 3-D orbit path
+    teme: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    alt: np.ndarray
+
+    def __len__(self):
+        return len(self.tt)
+
+    @property
+    def nbytes(self):
+        return self.tt.nbytes + self.teme.nbytes + self.lat.nbytes + self.lon.nbytes + self.alt.nbytes
+
+    # At most `points` evenly spaced samples, always keeping both ends
+    def decimated(self, points=DISPLAY_POINTS):
+        if len(self) <= points:
+            return self.lat, self.lon
+        keep = np.unique(np.linspace(0, len(self) - 1, points).round().astype(int))
+        return self.lat[keep], self.lon[keep]
+
+# Orbital period of a Satrec in seconds
+def _period(satrec):
+    return 2.0 * np.pi / satrec.no_kozai * 60.0
+
+# Window of `orbits` periods either side of t, snapped outward to TRACK_WINDOW multiples of TT
+# seconds. Returns (first, count) in TRACK_WINDOW units
+def _window(satrec, t, orbits):
+    now = float(t.tt) * DAY_S
+    reach = orbits * _period(satrec)
+    first = math.floor((now - reach) / TRACK_WINDOW)
+    last = math.ceil((now + reach) / TRACK_WINDOW)
+    return first, last - first
+
+# =============================
+# TrackCache: LRU of computed tracks under a memory budget, keyed by
+# (NORAD id, element set number, window, resolution). Only misses are propagated; misses
+# sharing a window go through SGP4 in one vectorized call.
+# =============================
+class TrackCache:
+    """Cached ground tracks of catalog objects."""
+
+    def __init__(self, budget=MEMORY_BUDGET):
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self._tracks = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(track.nbytes for track in self._tracks.values())
+
+    def _put(self, key, track):
+        with self._lock:
+            self._tracks[key] = track
+            self._tracks.move_to_end(key)
+            total = sum(cached.nbytes for cached in self._tracks.values())
+            while total > self.budget and len(self._tracks) > 1:
+                _, evicted = self._tracks.popitem(last=False)
+                total -= evicted.nbytes
+
+    def ground_tracks(self, catalog, rows, t, orbits=TRACK_ORBITS, step=TRACK_STEP):
+        """Tracks of catalog rows over `orbits` periods either side of Skyfield Time t, one per row."""
+        satrecs = catalog.propagator.satrecs
+        keys = []
+        found = {}
+        missing = collections.defaultdict(dict)
+        with self._lock:
+            for row in rows:
+                satrec = satrecs[row]
+                key = (int(catalog.ids[row]), int(satrec.elnum), _window(satrec, t, orbits), step)
+                keys.append(key)
+                if key in self._tracks:
+                    self._tracks.move_to_end(key)
+                    found[key] = self._tracks[key]
+                    self.hits += 1
+                elif key not in found:
+                    missing[key[2]][key] = row
+                    self.misses += 1
+
+        for (first, count), entries in missing.items():
+            computed = _propagate(catalog, list(entries.values()), t, first, count, step)
+            for key, track in zip(entries, computed):
+                found[key] = track
+                self._put(key, track)
+        return [found[key] for key in keys]
+
+    def ground_track(self, catalog, row, t, orbits=TRACK_ORBITS, step=TRACK_STEP):
+        """Track of one catalog row; see ground_tracks()."""
+        return self.ground_tracks(catalog, [row], t, orbits, step)[0]
+
+# Objects `rows` over one window, in one SGP4 call
+def _propagate(catalog, rows, t, first, count, step):
+    start = t.ts.tt_jd(first * TRACK_WINDOW / DAY_S)
+    clock = WindowClock(start)
+    seconds = np.arange(0.0, count * TRACK_WINDOW + step / 2, step)
+    jd, fr_utc, fr_ut1 = clock.args(seconds)
+    propagator = CatalogPropagator(catalog.propagator.satrecs[row] for row in rows)
+    e, r, _ = propagator.propagate_teme(jd, fr_utc)
+    r[e != 0] = np.nan
+    lat, lon, alt = itrs_to_geodetic(teme_to_itrs(r, jd, fr_ut1))
+    tt = clock.tt_jd(seconds)
+    return [
+        Track(
+            norad_id=int(catalog.ids[row]),
+            elnum=int(catalog.propagator.satrecs[row].elnum),
+            tt=tt,
+            teme=r[k].astype(np.float32),
+            lat=lat[k].astype(np.float32),
+            lon=lon[k].astype(np.float32),
+            alt=alt[k].astype(np.float32),
+        )
+        for k, row in enumerate(rows)
+    ]
+
+tracks = TrackCache()
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# Half-diagonal of the 1300x900 plot over its half-height: at projection scale 1 the globe
+# fills the plot height, so only zoom beyond this ratio pushes parts of the disk off-screen
+VIEW_MARGIN = np.hypot(1300, 900) / 900
+# Below this zoom, dense cells of satellites are drawn as single cluster markers
+LOD_MAX_SCALE = 4.0
+# Cluster cell size in degrees at projection scale 1; cells shrink as the user zooms in
+CELL_DEGREES = 4.0
+# A cell is clustered when it holds at least this many satellites
+CLUSTER_MIN_COUNT = 8
+
+@dataclass(frozen=True)
+class Viewport:
+    """Center and zoom of the orthographic globe, as reported by Plotly relayout events."""
+    lon: float = 0.0
+    lat: float = 0.0
+    scale: float = 1.0
+
+    # Apply a relayout payload. Plotly sends either flat keys ("geo.projection.rotation.lon")
+    # or nested dicts ({"geo": {"projection": {...}}}); anything else keeps the current value
+    def update(self, payload):
+        if not isinstance(payload, dict):
+            return self
+        nested = payload.get("geo", {}) or {}
+        projection = nested.get("projection", {}) or {}
+        rotation = projection.get("rotation", {}) or {}
+        flat_rotation = payload.get("geo.projection.rotation", {}) or {}
+
+        def pick(*values, default):
+            for value in values:
+                if isinstance(value, (int, float)):
+                    return float(value)
+            return default
+
+        return Viewport(
+            lon=pick(payload.get("geo.projection.rotation.lon"), flat_rotation.get("lon"), rotation.get("lon"), default=self.lon),
+            lat=pick(payload.get("geo.projection.rotation.lat"), flat_rotation.get("lat"), rotation.get("lat"), default=self.lat),
+            scale=pick(payload.get("geo.projection.scale"), projection.get("scale"), default=self.scale),
+        )
+
+    # Largest angular distance (degrees) from the view center that is on screen
+    @property
+    def radius(self):
+        return float(np.degrees(np.arcsin(min(1.0, VIEW_MARGIN / max(self.scale, 1e-9)))))
+
+# Points (degrees) on the visible hemisphere and inside the zoomed view
+def visible_mask(viewport, lat, lon):
+    lat0 = np.radians(viewport.lat)
+    lat = np.radians(lat)
+    dlon = np.radians(lon - viewport.lon)
+    cos_angle = np.sin(lat0) * np.sin(lat) + np.cos(lat0) * np.cos(lat) * np.cos(dlon)
+    with np.errstate(invalid="ignore"):
+        return cos_angle > np.cos(np.radians(viewport.radius))
+
+# =============================
+# Level of detail: at low zoom, bin the shown points into lat/lon cells and replace every
+# dense cell with one cluster marker at the cell's mean position.
+# Returns the mask of points still drawn individually and the clusters' lat, lon and counts.
+# =============================
+def cluster(viewport, lat, lon, shown):
+    if viewport.scale >= LOD_MAX_SCALE or not shown.any():
+        return shown, np.empty(0), np.empty(0), np.empty(0, dtype=int)
+    cell = CELL_DEGREES / viewport.scale
+    rows = np.flatnonzero(shown)
+    ilat = np.floor((lat[rows] + 90.0) / cell).astype(np.int64)
+    ilon = np.floor((lon[rows] + 180.0) / cell).astype(np.int64)
+    cells, inverse, counts = np.unique(ilat * 1_000_000 + ilon, return_inverse=True, return_counts=True)
+    dense = counts >= CLUSTER_MIN_COUNT
+    individual = shown.copy()
+    individual[rows[dense[inverse]]] = False
+    sum_lat = np.bincount(inverse, weights=lat[rows], minlength=len(cells))
+    sum_lon = np.bincount(inverse, weights=lon[rows], minlength=len(cells))
+    return individual, sum_lat[dense] / counts[dense], sum_lon[dense] / counts[dense], counts[dense]
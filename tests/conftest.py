@@ -0,0 +1,39 @@
+import importlib
+import pathlib
+import sys
+
+import pandas as pd
+import pytest
+from skyfield.api import load
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+# Checked-in element sets the tests run on, with no network access
+DATABASE = ROOT / "databases"
+FILES = {
+    "Satellite": "active_satellites.csv",
+    "Station": "stations.csv",
+}
+
+sys.path.insert(0, str(ROOT))
+
+# The app package has a dash in its name, so its modules are imported by path
+def skynet(module):
+    return importlib.import_module(f"skynet-web.{module}")
+
+@pytest.fixture(scope="session")
+def ts():
+    return load.timescale()
+
+@pytest.fixture(scope="session")
+def frames():
+    return {typ: pd.read_csv(DATABASE / name) for typ, name in FILES.items()}
+
+@pytest.fixture(scope="session")
+def catalog(frames):
+    return skynet("catalog").build_catalog(frames, 1)
+
+# The newest epoch of the checked-in catalog, so results do not depend on the day of the run
+@pytest.fixture(scope="session")
+def epoch(ts, catalog):
+    newest = pd.to_datetime(catalog.elements["EPOCH"], format="ISO8601").max()
+    return ts.from_datetime(newest.tz_localize("UTC").to_pydatetime())
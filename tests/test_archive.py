@@ -0,0 +1,26 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from conftest import skynet
+
+# Catalog rows archived in these tests
+OBJECTS = 500
+
+def test_snapshots_are_shared_and_rebuilt_once_evicted(frames, epoch, tmp_path, monkeypatch):
+    archive = skynet("archive")
+    monkeypatch.setattr(archive, "SNAPSHOTS_KEPT", 2)
+    store = archive.ElementArchive(tmp_path / "archive.sqlite")
+    elements = frames["Satellite"].iloc[:OBJECTS].assign(type="Satellite")
+    elements["EPOCH"] = pd.to_datetime(elements["EPOCH"], format="ISO8601")
+    store.append(elements)
+
+    when = epoch.utc_datetime().replace(microsecond=0)
+    first = store.snapshot(when)
+    assert store.snapshot(when) is first
+    for hours in range(1, archive.SNAPSHOTS_KEPT + 1):
+        store.snapshot(when + datetime.timedelta(hours=hours))
+    rebuilt = store.snapshot(when)
+    assert rebuilt is not first and rebuilt.version != first.version
+    assert np.array_equal(rebuilt.lat, first.lat, equal_nan=True)
@@ -0,0 +1,23 @@
+import numpy as np
+
+from conftest import skynet
+
+# Sessions keep element rows; the propagator rebuilt from them is the one the import made
+def test_custom_sets_are_rebuilt_from_rows(frames, epoch):
+    custom = skynet("custom")
+    elements, rejected = custom.validate(frames["Station"])
+    satrecs = custom.satrecs_from_elements(elements)
+    rows = elements.to_dict("records")
+    groups = ["upload"] * len(rows)
+    digest = custom.elements_digest(rows, groups)
+
+    found = custom.custom_set("session", digest, rows, groups)
+    assert custom.custom_set("session", digest, rows, groups) is found
+    expected = skynet("propagation").CatalogPropagator(satrecs).geodetic_at(epoch)[0]
+    assert np.array_equal(found.propagator.geodetic_at(epoch)[0], expected, equal_nan=True)
+    assert found.index.types == ["upload"] and found.ids.tolist() == elements["NORAD_CAT_ID"].tolist()
+
+    # A changed set replaces the session's earlier one
+    more = custom.custom_set("session", custom.elements_digest(rows * 2, groups * 2), rows * 2, groups * 2)
+    assert len(more.names) == 2 * len(rows)
+    assert ("session", digest) not in custom._sets
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+# Prints the structure and wire keys of a small figure
+KEY_SCRIPT = """
+import importlib, sys
+import numpy as np
+sys.path.insert(0, sys.argv[1])
+figure = importlib.import_module("skynet-web.figure")
+coverage = importlib.import_module("skynet-web.coverage")
+groups = [("Satellite", np.array(["A", "B"], dtype=object), np.array([25544, 20580]), np.zeros(2), np.zeros(2))]
+key = figure.structure_key(7, groups, [("ISS", np.linspace(-50.0, 50.0, 9), np.zeros(9))], coverage.GRID)
+print(key, figure.wire_key(key))
+"""
+
+# Session state carries these keys between server processes, whose hash() seeds differ
+def test_keys_are_stable_across_processes():
+    keys = [
+        subprocess.run(
+            [sys.executable, "-c", KEY_SCRIPT, str(ROOT)],
+            env={**os.environ, "PYTHONHASHSEED": seed}, capture_output=True, text=True, check=True,
+        ).stdout
+        for seed in ("1", "2")
+    ]
+    assert keys[0] == keys[1]
@@ -0,0 +1,12 @@
+import dataclasses
+
+from conftest import skynet
+
+# A live catalog in use keeps its index while more than VERSIONS_KEPT archive views come and go
+def test_live_index_outlasts_archive_views(catalog, monkeypatch):
+    filters = skynet("filters")
+    monkeypatch.setattr(filters, "_indexes", type(filters._indexes)())
+    live = filters.filters_for(catalog)
+    for version in range(1, filters.VERSIONS_KEPT + 2):
+        filters.filters_for(dataclasses.replace(catalog, version=-version))
+        assert filters.filters_for(catalog) is live
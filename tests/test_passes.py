@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from skyfield.api import EarthSatellite, wgs84
+
+from conftest import skynet
+
+# Catalog objects compared with Skyfield, observer and window
+SAMPLE_OBJECTS = 25
+OBSERVER = (51.4769, -0.0005, 46.0)
+WINDOW_DAYS = 1.0
+MIN_ELEVATION = 10.0
+# Event times have to agree within this (s); root refinement stops at passes.TOLERANCE, and
+# Skyfield's find_events() refines to about the same. Elevations within this (degrees), which
+# leaves room for the ~3e-6 the two frame rotations differ by
+TOLERANCE_S = 1.0
+TOLERANCE_DEGREES = 1e-5
+
+@pytest.fixture(scope="module")
+def sample(catalog):
+    return np.sort(np.random.default_rng(0).choice(len(catalog), SAMPLE_OBJECTS, replace=False))
+
+@pytest.fixture(scope="module")
+def window(ts, epoch):
+    return epoch, ts.tt_jd(epoch.tt + WINDOW_DAYS)
+
+@pytest.fixture(scope="module")
+def found(catalog, sample, window):
+    passes = skynet("passes")
+    return passes.predict_passes(catalog, passes.Observer(*OBSERVER), *window, MIN_ELEVATION, rows=sample)
+
+def test_events_match_find_events(ts, catalog, sample, window, found):
+    topos = wgs84.latlon(*OBSERVER[:2], elevation_m=OBSERVER[2])
+    total = 0
+    for row in sample.tolist():
+        satellite = EarthSatellite.from_omm(ts, catalog.elements.iloc[row].to_dict())
+        times, events = satellite.find_events(topos, *window, altitude_degrees=MIN_ELEVATION)
+        mine = found.rows == row
+        assert found.events[mine].tolist() == events.tolist()
+        assert np.abs(found.tt[mine] - times.tt).max(initial=0.0) * 86400.0 < TOLERANCE_S
+        if len(times):
+            elevation = (satellite - topos).at(found.times(ts)[mine]).altaz()[0].degrees
+            assert np.abs(found.elevation[mine] - elevation).max() < TOLERANCE_DEGREES
+        total += len(events)
+    # The sample has to exercise the comparison
+    assert total > 100
+
+def test_passes_group_events(found):
+    passes = skynet("passes")
+    grouped = found.passes()
+    assert sorted(k for events in grouped for k in events if k >= 0) == list(range(len(found)))
+    for rise, peak, set_ in grouped:
+        present = [k for k in (rise, peak, set_) if k >= 0]
+        assert len(set(found.rows[present].tolist())) == 1
+        assert found.tt[present].tolist() == sorted(found.tt[present].tolist())
+        if rise >= 0:
+            assert found.events[rise] == passes.RISE
+        if set_ >= 0:
+            assert found.events[set_] == passes.SET
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from skyfield.api import EarthSatellite, wgs84
+
+# Catalog objects and offsets from the newest epoch (days) compared with Skyfield
+SAMPLE_OBJECTS = 200
+OFFSETS = (-1.0, 0.0, 0.37, 2.5)
+# Largest accepted difference in degrees and kilometers; the two paths agree to ~1e-12
+TOLERANCE_DEGREES = 1e-9
+TOLERANCE_KM = 1e-6
+
+@pytest.fixture(scope="module")
+def sample(catalog):
+    return np.sort(np.random.default_rng(0).choice(len(catalog), SAMPLE_OBJECTS, replace=False))
+
+# The per-object path the vectorized engine replaced: EarthSatellite.at() and wgs84
+def skyfield_geodetic(ts, catalog, rows, t):
+    lat, lon, alt = [], [], []
+    for row in rows.tolist():
+        satellite = EarthSatellite.from_omm(ts, catalog.elements.iloc[row].to_dict())
+        position = satellite.at(t)
+        point = wgs84.latlon_of(position)
+        lat.append(point[0].degrees)
+        lon.append(point[1].degrees)
+        alt.append(wgs84.height_of(position).km)
+    return np.array(lat), np.array(lon), np.array(alt)
+
+def assert_close(actual, expected):
+    lat, lon, alt = actual
+    lat_ref, lon_ref, alt_ref = expected
+    finite = np.isfinite(alt_ref)
+    assert np.array_equal(finite, np.isfinite(alt))
+    assert np.abs(lat[finite] - lat_ref[finite]).max() < TOLERANCE_DEGREES
+    assert np.abs((lon[finite] - lon_ref[finite] + 180.0) % 360.0 - 180.0).max() < TOLERANCE_DEGREES
+    assert np.abs(alt[finite] - alt_ref[finite]).max() < TOLERANCE_KM
+
+@pytest.mark.parametrize("offset", OFFSETS)
+def test_geodetic_matches_skyfield(ts, catalog, epoch, sample, offset):
+    t = ts.tt_jd(epoch.tt + offset)
+    lat, lon, alt = catalog.propagator.geodetic_at(t)
+    assert lat.shape == (len(catalog),)
+    assert_close((lat[sample], lon[sample], alt[sample]), skyfield_geodetic(ts, catalog, sample, t))
+
+# A Time array propagates every object at every time in the same call
+def test_geodetic_over_time_array(ts, catalog, epoch, sample):
+    t = ts.tt_jd(epoch.tt + np.array(OFFSETS))
+    lat, lon, alt = catalog.propagator.geodetic_at(t)
+    assert lat.shape == (len(catalog), len(OFFSETS))
+    for k, offset in enumerate(OFFSETS):
+        expected = skyfield_geodetic(ts, catalog, sample, ts.tt_jd(epoch.tt + offset))
+        assert_close((lat[sample, k], lon[sample, k], alt[sample, k]), expected)
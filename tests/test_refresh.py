@@ -0,0 +1,96 @@
+import shutil
+import types
+
+import pandas as pd
+import pytest
+
+from conftest import DATABASE, FILES, skynet
+
+# Object whose element set changes upstream in these tests
+CHANGED_ROW = 0
+
+class Upstream:
+    """Stands in for CelesTrak: fetch_if_changed() writing the new Satellite file and failing
+    for the groups in `failing`."""
+
+    def __init__(self, changed):
+        self.changed = changed
+        self.failing = set()
+
+    def __call__(self, url, path):
+        group = url.split("GROUP=")[1].split("&")[0]
+        if group in self.failing:
+            raise OSError(f"{group} unreachable")
+        if path.name != FILES["Satellite"] or path.read_bytes() == self.changed:
+            return False
+        path.write_bytes(self.changed)
+        return True
+
+@pytest.fixture
+def refresh(tmp_path, monkeypatch):
+    refresh = skynet("refresh")
+    for name in FILES.values():
+        shutil.copy(DATABASE / name, tmp_path / name)
+    monkeypatch.setattr(refresh, "DATABASE", tmp_path)
+    monkeypatch.setattr(refresh, "_applied", None)
+    monkeypatch.setattr(refresh, "archive", types.SimpleNamespace(record=lambda catalog: None))
+    monkeypatch.setattr(skynet("catalog"), "_current", None)
+    return refresh
+
+@pytest.fixture
+def upstream(refresh, tmp_path, monkeypatch):
+    frame = pd.read_csv(tmp_path / FILES["Satellite"])
+    frame.loc[CHANGED_ROW, "MEAN_ANOMALY"] = (frame.loc[CHANGED_ROW, "MEAN_ANOMALY"] + 90.0) % 360.0
+    frame.loc[CHANGED_ROW, "ELEMENT_SET_NO"] += 1
+    fake = Upstream(frame.to_csv(index=False).encode())
+    monkeypatch.setattr(refresh, "fetch_if_changed", fake)
+    return fake
+
+# Every store call as (rows, removed ids)
+@pytest.fixture
+def stores():
+    return []
+
+def load(refresh, stores):
+    return skynet("catalog").ensure_catalog(lambda: refresh.load_frames(lambda elements, removed=None: stores.append((elements, removed))))
+
+def changed_anomaly(catalog):
+    rows = catalog.elements[catalog.elements["type"] == "Satellite"]
+    return rows["MEAN_ANOMALY"].iloc[CHANGED_ROW]
+
+def test_unchanged_files_do_not_rebuild(refresh, upstream, stores):
+    upstream.changed = (refresh.DATABASE / FILES["Satellite"]).read_bytes()
+    load(refresh, stores)
+    assert refresh.refresh_catalog(lambda *args: None, 0) is None
+
+# The Satellite file is written, then the Station fetch fails: the next round fetches
+# nothing new but still publishes the change on disk
+def test_failed_fetch_is_published_next_round(refresh, upstream, stores):
+    loaded = load(refresh, stores)
+    upstream.failing = {"stations"}
+    with pytest.raises(OSError):
+        refresh.refresh_catalog(lambda *args: None, 0)
+    upstream.failing = set()
+    catalog = refresh.refresh_catalog(lambda elements, removed=None: stores.append((elements, removed)), 0)
+    assert catalog is not None and catalog.version > loaded.version
+    assert changed_anomaly(catalog) != changed_anomaly(loaded)
+    assert catalog.diff.changed == 1
+    assert refresh.refresh_catalog(lambda *args: None, 0) is None
+
+# The catalog is published but the database write fails: the next round stores it in full
+def test_failed_store_is_stored_next_round(refresh, upstream, stores):
+    loaded = load(refresh, stores)
+
+    def failing_store(elements, removed=None):
+        raise OSError("database unavailable")
+
+    with pytest.raises(OSError):
+        refresh.refresh_catalog(failing_store, 0)
+    published = skynet("catalog").get_catalog()
+    assert changed_anomaly(published) != changed_anomaly(loaded)
+
+    catalog = refresh.refresh_catalog(lambda elements, removed=None: stores.append((elements, removed)), 0)
+    assert catalog is not None
+    elements, removed = stores[-1]
+    assert removed is None and len(elements) == len(catalog)
+    assert refresh.refresh_catalog(lambda *args: None, 0) is None
@@ -0,0 +1,78 @@
+import dataclasses
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from conftest import skynet
+
+# Catalog rows propagated by the two-worker pool in these tests
+OBJECTS = 2000
+
+@pytest.fixture
+def sharded(monkeypatch):
+    sharded = skynet("sharded")
+    pool = sharded.ShardPool(2)
+    monkeypatch.setattr(sharded, "pool", pool)
+    monkeypatch.setattr(sharded, "_propagators", type(sharded._propagators)())
+    yield sharded
+    pool.shutdown()
+
+@pytest.fixture(scope="module")
+def small(frames):
+    return skynet("catalog").build_catalog({"Satellite": frames["Satellite"].iloc[:OBJECTS]}, 1)
+
+def unlinked(name):
+    try:
+        shared_memory.SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return True
+    return False
+
+# A propagator evicted by newer versions while in use keeps working, and its shared element
+# sets go away when its last user is done
+def test_evicted_propagator_outlives_its_users(sharded, small, epoch):
+    versions = [dataclasses.replace(small, version=version) for version in range(1, sharded.VERSIONS_KEPT + 3)]
+    with sharded.propagator_for(versions[0], min_objects=0) as first:
+        for catalog in versions[1:]:
+            with sharded.propagator_for(catalog, min_objects=0) as propagator:
+                propagator.geodetic_at(epoch)
+        assert versions[0].version not in sharded._propagators
+        lat, lon, alt = first.geodetic_at(epoch)
+        assert not unlinked(first._elements.name)
+    assert np.array_equal(lat, small.propagator.geodetic_at(epoch)[0], equal_nan=True)
+    assert unlinked(first._elements.name)
+
+def test_archive_catalogs_stay_out_of_the_cache(sharded, small, epoch):
+    live = dataclasses.replace(small, version=1)
+    with sharded.propagator_for(live, min_objects=0):
+        pass
+    with sharded.propagator_for(dataclasses.replace(small, version=-1), min_objects=0) as propagator:
+        propagator.geodetic_at(epoch)
+    assert list(sharded._propagators) == [live.version]
+    assert unlinked(propagator._elements.name)
+
+# Window the pool tests below search, and the observer of the pass search
+WINDOW_DAYS = 0.1
+OBSERVER = (51.4769, -0.0005, 46.0)
+
+def on_shards(monkeypatch, module, sharded):
+    monkeypatch.setattr(module, "propagator_for", lambda catalog: sharded.propagator_for(catalog, min_objects=0))
+
+def test_passes_run_on_shards(sharded, small, epoch, monkeypatch):
+    passes = skynet("passes")
+    end = epoch.ts.tt_jd(epoch.tt + WINDOW_DAYS)
+    local = passes.predict_passes(small, passes.Observer(*OBSERVER), epoch, end, 10.0)
+    on_shards(monkeypatch, passes, sharded)
+    found = passes.predict_passes(small, passes.Observer(*OBSERVER), epoch, end, 10.0)
+    assert len(local) and np.array_equal(found.rows, local.rows) and np.array_equal(found.events, local.events)
+    assert np.allclose(found.tt, local.tt, rtol=0, atol=1e-9)
+
+def test_conjunctions_run_on_shards(sharded, small, epoch, monkeypatch):
+    conjunctions = skynet("conjunctions")
+    end = epoch.ts.tt_jd(epoch.tt + WINDOW_DAYS)
+    local = conjunctions.screen_conjunctions(small, epoch, end, 50.0)
+    on_shards(monkeypatch, conjunctions, sharded)
+    found = conjunctions.screen_conjunctions(small, epoch, end, 50.0)
+    assert len(local) and np.array_equal(found.rows_a, local.rows_a) and np.array_equal(found.rows_b, local.rows_b)
+    assert np.allclose(found.tt, local.tt, rtol=0, atol=1e-9)